@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from API.calendar_client import execute, get_service
+
+
+# Arquivo com a lista de corretores. Formato:
+# [{"id": "ana", "name": "Ana Souza", "calendar_id": "ana@imobiliaria.com", "regions": ["Centro", "Zona Sul"]}, ...]
+# Sem o arquivo, existe um único corretor usando a agenda "primary".
+BROKERS_PATH = os.getenv("BROKERS_PATH", "brokers.json")
+
+# Política de distribuição: "least_loaded", "round_robin" ou "region" (região primeiro, depois menos ocupado).
+BROKER_ASSIGNMENT_POLICY = os.getenv("BROKER_ASSIGNMENT_POLICY", "least_loaded")
+
+# Limite de agendas por requisição do freebusy.query (limite da API).
+FREEBUSY_MAX_CALENDARS = 50
+FREEBUSY_MAX_PARALLEL = int(os.getenv("FREEBUSY_MAX_PARALLEL", "8"))
+# Por quanto tempo a ocupação de uma agenda numa janela é reaproveitada.
+FREEBUSY_CACHE_TTL = float(os.getenv("FREEBUSY_CACHE_TTL", "60"))
+
+
+@dataclass
+class Broker:
+    id: str
+    name: str
+    calendar_id: str
+    regions: list = field(default_factory=list)
+
+    def serves(self, region):
+        return any(r.lower() == region.lower() for r in self.regions)
+
+
+def load_brokers(path=BROKERS_PATH):
+    if not os.path.exists(path):
+        return [Broker(id="primary", name="Corretor", calendar_id="primary")]
+    with open(path, encoding="utf-8") as f:
+        return [Broker(**item) for item in json.load(f)]
+
+
+_brokers = None
+_brokers_lock = threading.Lock()
+
+
+def get_brokers():
+    global _brokers
+    with _brokers_lock:
+        if _brokers is None:
+            _brokers = load_brokers()
+        return _brokers
+
+
+def get_broker(broker_id):
+    """Retorna o corretor com o id informado, ou None."""
+    for broker in get_brokers():
+        if broker.id == broker_id:
+            return broker
+    return None
+
+
+# --- Consulta de ocupação (freebusy) ---
+
+_fanout_executor = ThreadPoolExecutor(
+    max_workers=FREEBUSY_MAX_PARALLEL,
+    thread_name_prefix="freebusy",
+)
+_busy_cache = {}
+_busy_cache_lock = threading.Lock()
+
+
+def _query_chunk(calendar_ids, time_min, time_max):
+    service = get_service()
+    if not service:
+        raise RuntimeError("O serviço do Google Calendar não foi inicializado.")
+    body = {
+        "timeMin": time_min.isoformat(),
+        "timeMax": time_max.isoformat(),
+        "timeZone": "America/Sao_Paulo",
+        "items": [{"id": calendar_id} for calendar_id in calendar_ids],
+    }
+    result = execute(service.freebusy().query(body=body))
+
+    busy = {}
+    for calendar_id, info in result.get("calendars", {}).items():
+        if info.get("errors"):
+            # Agenda inacessível: tratada como indisponível.
+            busy[calendar_id] = None
+            continue
+        busy[calendar_id] = [
+            (
+                datetime.fromisoformat(b["start"]).timestamp(),
+                datetime.fromisoformat(b["end"]).timestamp(),
+            )
+            for b in info.get("busy", [])
+        ]
+    return busy
+
+
+def query_busy(calendar_ids, time_min, time_max):
+    """
+    Retorna {calendar_id: [(início, fim), ...]} com os horários ocupados (timestamps) na janela.
+    Agendas sem cache válido são consultadas em lotes de até 50 por requisição, com os lotes em paralelo.
+    Agendas com erro de acesso aparecem com valor None.
+    """
+    window = (time_min.timestamp(), time_max.timestamp())
+    now = time.monotonic()
+
+    busy, missing = {}, []
+    with _busy_cache_lock:
+        for calendar_id in calendar_ids:
+            cached = _busy_cache.get((calendar_id, window))
+            if cached and now - cached[0] < FREEBUSY_CACHE_TTL:
+                busy[calendar_id] = cached[1]
+            else:
+                missing.append(calendar_id)
+
+    if missing:
+        chunks = [
+            missing[i:i + FREEBUSY_MAX_CALENDARS]
+            for i in range(0, len(missing), FREEBUSY_MAX_CALENDARS)
+        ]
+        if len(chunks) == 1:
+            results = [_query_chunk(chunks[0], time_min, time_max)]
+        else:
+            results = list(_fanout_executor.map(
+                lambda chunk: _query_chunk(chunk, time_min, time_max), chunks
+            ))
+
+        fetched_at = time.monotonic()
+        with _busy_cache_lock:
+            if len(_busy_cache) > 10000:
+                for key in [k for k, v in _busy_cache.items() if fetched_at - v[0] >= FREEBUSY_CACHE_TTL]:
+                    del _busy_cache[key]
+            for result in results:
+                for calendar_id, intervals in result.items():
+                    busy[calendar_id] = intervals
+                    _busy_cache[(calendar_id, window)] = (fetched_at, intervals)
+    return busy
+
+
+def invalidate_busy(calendar_id):
+    """Descarta a ocupação em cache de uma agenda (chamado após criar/alterar/excluir eventos nela)."""
+    with _busy_cache_lock:
+        for key in [k for k in _busy_cache if k[0] == calendar_id]:
+            del _busy_cache[key]
+
+
+# --- Distribuição de leads entre corretores ---
+
+_round_robin = itertools.count()
+
+
+def _busy_seconds(intervals):
+    return sum(end - start for start, end in intervals)
+
+
+def choose_broker(candidates, busy, region=None, policy=BROKER_ASSIGNMENT_POLICY):
+    """
+    Escolhe um corretor entre os 'candidates' (todos já com o horário livre).
+    'busy' é a ocupação de cada agenda no dia, usada para medir a carga.
+    """
+    if not candidates:
+        return None
+
+    if policy == "region" and region:
+        local = [b for b in candidates if b.serves(region)]
+        candidates = local or candidates
+        policy = "least_loaded"
+
+    if policy == "round_robin":
+        return candidates[next(_round_robin) % len(candidates)]
+
+    return min(candidates, key=lambda b: _busy_seconds(busy.get(b.calendar_id) or []))
@@ -0,0 +1,240 @@
+import asyncio
+import os
+import time
+import random
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from telemetry.metrics import CALENDAR_SECONDS, CALENDAR_THROTTLE_SECONDS, CALENDAR_RETRIES
+from telemetry.tracing import span
+from telemetry.recording import RecordingService, is_recording
+
+
+# O httplib2 usado pelo googleapiclient não é thread-safe: cada thread do
+# executor precisa do seu próprio objeto 'service' (e, portanto, do seu próprio
+# httplib2.Http). As credenciais são compartilhadas entre as threads.
+CALENDAR_MAX_WORKERS = int(os.getenv("CALENDAR_MAX_WORKERS", "32"))
+
+# Cota da API: o Google Calendar permite ~600 requisições/minuto por usuário (10/s).
+# Chamadas dentro de uma requisição em lote contam individualmente.
+CALENDAR_QPS = float(os.getenv("CALENDAR_QPS", "10"))
+CALENDAR_BURST = float(os.getenv("CALENDAR_BURST", "10"))
+CALENDAR_MAX_RETRIES = int(os.getenv("CALENDAR_MAX_RETRIES", "5"))
+CALENDAR_BACKOFF_BASE = 0.5
+CALENDAR_BACKOFF_MAX = 32.0
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+_executor = ThreadPoolExecutor(
+    max_workers=CALENDAR_MAX_WORKERS,
+    thread_name_prefix="calendar-io",
+)
+_thread_local = threading.local()
+
+
+def _base_service():
+    """Retorna o 'service' configurado em API.google_auth (lido a cada chamada, para permitir substituí-lo)."""
+    from API import google_auth
+
+    return google_auth.service
+
+
+def _service_for_thread(base):
+    """
+    Cria um 'service' próprio para a thread atual a partir do 'service' base.
+    Objetos que não carregam credenciais (ex.: stand-ins em memória) são reutilizados como estão.
+    """
+    credentials = getattr(getattr(base, "_http", None), "credentials", None)
+    if credentials is None:
+        return base
+    return build("calendar", "v3", credentials=credentials, static_discovery=True)
+
+
+def get_service():
+    """
+    Retorna o 'service' do Google Calendar da thread atual, ou None se a autenticação falhou.
+    Cada thread do executor mantém o seu próprio 'service'; ele é recriado se o 'service' base mudar.
+    """
+    base = _base_service()
+    if base is None:
+        return None
+
+    if getattr(_thread_local, "base", None) is not base:
+        _thread_local.service = _service_for_thread(base)
+        _thread_local.base = base
+    if is_recording():
+        # Gravação ligada (RECORD_PATH): cada requisição é registrada para bench/replay.py.
+        return RecordingService(_thread_local.service)
+    return _thread_local.service
+
+
+async def run_in_calendar_executor(func, *args, **kwargs):
+    """
+    Executa 'func' (uma função síncrona que fala com o Google Calendar) no executor dedicado,
+    sem bloquear o event loop. O número de chamadas simultâneas é limitado por CALENDAR_MAX_WORKERS.
+    O contexto (contextvars) é copiado para a thread, para as requisições entrarem no trace do turno.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, partial(context.run, func, *args, **kwargs))
+
+
+class TokenBucket:
+    """
+    Limitador de taxa: 'rate' fichas por segundo, acumulando no máximo 'capacity'.
+    Cada pedido reserva as fichas na ordem de chegada; um pedido maior que o saldo (ex.: um lote
+    com mais chamadas que 'capacity') deixa o saldo negativo e espera o tempo de acumular a
+    diferença, e os pedidos seguintes esperam também essa dívida.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Reserva 'tokens' fichas e bloqueia a thread atual até elas estarem acumuladas."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+rate_limiter = TokenBucket(CALENDAR_QPS, CALENDAR_BURST)
+
+
+def is_retryable(error):
+    """True para erros transitórios: cota (429/403 rateLimitExceeded), 5xx e falhas de rede."""
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status in RETRYABLE_STATUSES:
+            return True
+        if status == 403:
+            details = error.error_details if isinstance(error.error_details, list) else []
+            return any(
+                isinstance(d, dict) and d.get("reason") in RATE_LIMIT_REASONS for d in details
+            )
+        return False
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _backoff_delay(attempt, error=None):
+    """Backoff exponencial com 'full jitter'; respeita o Retry-After enviado pela API."""
+    retry_after = None
+    if isinstance(error, HttpError):
+        retry_after = error.resp.get("retry-after")
+    if retry_after and str(retry_after).isdigit():
+        return float(retry_after)
+    return random.uniform(0, min(CALENDAR_BACKOFF_MAX, CALENDAR_BACKOFF_BASE * 2 ** attempt))
+
+
+def _method_name(request):
+    """Nome da chamada para métricas e trace (ex.: 'calendar.events.list'; 'batch' para lotes)."""
+    return getattr(request, "methodId", None) or ("batch" if hasattr(request, "add") else request.method)
+
+
+def _execute_with_retry(request, tokens=1):
+    method = _method_name(request)
+    with span("calendar", CALENDAR_SECONDS, method=method, calls=tokens) as attrs:
+        attempt = 0
+        while True:
+            waited = time.perf_counter()
+            rate_limiter.acquire(tokens)
+            CALENDAR_THROTTLE_SECONDS.observe(time.perf_counter() - waited)
+            try:
+                return request.execute()
+            except Exception as error:
+                if attempt >= CALENDAR_MAX_RETRIES or not is_retryable(error):
+                    raise
+                time.sleep(_backoff_delay(attempt, error))
+                attempt += 1
+                attrs["retries"] = attempt
+                CALENDAR_RETRIES.inc(method=method)
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _single_flight(key, func):
+    """Chamadas simultâneas com a mesma 'key' esperam e compartilham o resultado da primeira."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+
+    if not leader:
+        return future.result()
+
+    try:
+        result = func()
+        future.set_result(result)
+        return result
+    except BaseException as error:
+        future.set_exception(error)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def execute(request):
+    """
+    Executa um HttpRequest do googleapiclient passando pelo limitador de taxa, com novas tentativas
+    (backoff exponencial com jitter) em erros transitórios.
+    Leituras (GET) idênticas em andamento ao mesmo tempo são agrupadas em uma única chamada HTTP.
+    Todas as chamadas ao Google Calendar devem passar por aqui em vez de 'request.execute()'.
+    """
+    if getattr(request, "method", None) == "GET":
+        return _single_flight(("GET", request.uri), lambda: _execute_with_retry(request))
+    return _execute_with_retry(request)
+
+
+# Máximo de chamadas por requisição em lote aceito pela API do Google Calendar.
+CALENDAR_BATCH_LIMIT = 50
+
+
+def execute_batch(service, requests):
+    """
+    Envia as 'requests' (objetos HttpRequest criados a partir de 'service') agrupadas em lotes
+    de até CALENDAR_BATCH_LIMIT chamadas por requisição HTTP.
+    Itens com erro transitório são reenviados em um novo lote, com backoff.
+    Retorna uma lista, na mesma ordem, de tuplas (resposta, erro); apenas um dos dois é preenchido.
+    """
+    results = [(None, None)] * len(requests)
+
+    def _callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    pending = list(range(len(requests)))
+    attempt = 0
+    while pending:
+        for chunk_start in range(0, len(pending), CALENDAR_BATCH_LIMIT):
+            chunk = pending[chunk_start:chunk_start + CALENDAR_BATCH_LIMIT]
+            batch = service.new_batch_http_request(callback=_callback)
+            for index in chunk:
+                batch.add(requests[index], request_id=str(index))
+            _execute_with_retry(batch, tokens=len(chunk))
+
+        retry = [i for i in pending if results[i][1] is not None and is_retryable(results[i][1])]
+        if not retry or attempt >= CALENDAR_MAX_RETRIES:
+            break
+        time.sleep(_backoff_delay(attempt, results[retry[0]][1]))
+        pending = retry
+        attempt += 1
+
+    return results
@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+import pytz
+from googleapiclient.errors import HttpError
+
+from API.calendar_client import execute, get_service
+
+
+# Intervalo mínimo entre duas sincronizações incrementais (syncToken) de um calendário.
+# Dentro dessa janela, consultas são respondidas só com o espelho local.
+EVENT_CACHE_SYNC_INTERVAL = float(os.getenv("EVENT_CACHE_SYNC_INTERVAL", "30"))
+# Depois desse tempo o espelho é descartado e refeito com uma sincronização completa.
+EVENT_CACHE_FULL_RESYNC_TTL = float(os.getenv("EVENT_CACHE_FULL_RESYNC_TTL", "3600"))
+# Caminho opcional de um SQLite para persistir o espelho (e o syncToken) entre reinícios.
+EVENT_CACHE_DB = os.getenv("EVENT_CACHE_DB")
+
+LOCAL_TZ = pytz.timezone("America/Sao_Paulo")
+
+
+def event_bounds(event):
+    """
+    Retorna (início, fim) do evento em timestamp UTC.
+    Eventos de dia inteiro ('date' em vez de 'dateTime') ocupam o dia inteiro no fuso de São Paulo.
+    """
+    def _ts(edge):
+        value = event.get(edge, {})
+        if value.get("dateTime"):
+            return datetime.fromisoformat(value["dateTime"]).timestamp()
+        if value.get("date"):
+            day = datetime.fromisoformat(value["date"])
+            return LOCAL_TZ.localize(day).timestamp()
+        return None
+
+    start, end = _ts("start"), _ts("end")
+    if start is None:
+        return None
+    return start, end if end is not None else start
+
+
+class EventCache:
+    """
+    Espelho local dos eventos de um calendário do Google Calendar.
+
+    A primeira sincronização é completa; as seguintes usam o 'nextSyncToken' para trazer
+    apenas o que mudou. Consultas de conflito, listagem e busca são respondidas em memória
+    a partir de um índice ordenado pelo início dos eventos. As ferramentas de escrita
+    atualizam o espelho diretamente com a resposta da API.
+    """
+
+    def __init__(
+        self,
+        calendar_id="primary",
+        db_path=EVENT_CACHE_DB,
+        sync_interval=EVENT_CACHE_SYNC_INTERVAL,
+        full_resync_ttl=EVENT_CACHE_FULL_RESYNC_TTL,
+    ):
+        self.calendar_id = calendar_id
+        self.sync_interval = sync_interval
+        self.full_resync_ttl = full_resync_ttl
+
+        self._lock = threading.RLock()
+        self._events = {}
+        self._bounds = {}
+        self._index = []
+        self._index_dirty = False
+        self._max_duration = 0.0
+        self._sync_token = None
+        self._last_sync = 0.0
+        self._last_full_sync = 0.0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS calendar_events (
+                    calendar_id TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    PRIMARY KEY (calendar_id, event_id)
+                );
+                CREATE TABLE IF NOT EXISTS calendar_sync_state (
+                    calendar_id TEXT PRIMARY KEY,
+                    sync_token TEXT,
+                    last_full_sync REAL
+                );
+                """
+            )
+            self._load_from_db()
+
+    # --- Persistência ---
+
+    def _load_from_db(self):
+        row = self._db.execute(
+            "SELECT sync_token, last_full_sync FROM calendar_sync_state WHERE calendar_id = ?",
+            (self.calendar_id,),
+        ).fetchone()
+        if not row:
+            return
+        self._sync_token, self._last_full_sync = row
+        for (body,) in self._db.execute(
+            "SELECT body FROM calendar_events WHERE calendar_id = ?", (self.calendar_id,)
+        ):
+            self._store(json.loads(body))
+
+    def _persist(self, upserts=(), deletes=(), replace_all=False):
+        if not self._db:
+            return
+        with self._db:
+            if replace_all:
+                self._db.execute(
+                    "DELETE FROM calendar_events WHERE calendar_id = ?", (self.calendar_id,)
+                )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO calendar_events (calendar_id, event_id, body) VALUES (?, ?, ?)",
+                [(self.calendar_id, e["id"], json.dumps(e)) for e in upserts],
+            )
+            self._db.executemany(
+                "DELETE FROM calendar_events WHERE calendar_id = ? AND event_id = ?",
+                [(self.calendar_id, event_id) for event_id in deletes],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO calendar_sync_state (calendar_id, sync_token, last_full_sync) "
+                "VALUES (?, ?, ?)",
+                (self.calendar_id, self._sync_token, self._last_full_sync),
+            )
+
+    # --- Estrutura em memória ---
+
+    def _store(self, event):
+        bounds = event_bounds(event)
+        if bounds is None:
+            return
+        self._events[event["id"]] = event
+        self._bounds[event["id"]] = bounds
+        self._max_duration = max(self._max_duration, bounds[1] - bounds[0])
+        self._index_dirty = True
+
+    def _drop(self, event_id):
+        if self._events.pop(event_id, None) is not None:
+            self._bounds.pop(event_id, None)
+            self._index_dirty = True
+
+    def _sorted_index(self):
+        if self._index_dirty:
+            self._index = sorted((b[0], event_id) for event_id, b in self._bounds.items())
+            self._index_dirty = False
+        return self._index
+
+    # --- Sincronização com o Google Calendar ---
+
+    def _fetch(self, service, **params):
+        """Percorre todas as páginas de events().list e retorna (itens, nextSyncToken)."""
+        items, page_token = [], None
+        while True:
+            result = execute(
+                service.events().list(calendarId=self.calendar_id, pageToken=page_token, **params)
+            )
+            items.extend(result.get("items", []))
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                return items, result.get("nextSyncToken")
+
+    def _full_sync(self, service):
+        items, sync_token = self._fetch(service, singleEvents=True, maxResults=2500)
+        self._events, self._bounds, self._max_duration = {}, {}, 0.0
+        for event in items:
+            if event.get("status") != "cancelled":
+                self._store(event)
+        self._index_dirty = True
+        self._sync_token = sync_token
+        self._last_full_sync = time.time()
+        self._persist(upserts=list(self._events.values()), replace_all=True)
+
+    def _incremental_sync(self, service):
+        items, sync_token = self._fetch(
+            service, singleEvents=True, maxResults=2500, syncToken=self._sync_token
+        )
+        upserts, deletes = [], []
+        for event in items:
+            if event.get("status") == "cancelled":
+                self._drop(event["id"])
+                deletes.append(event["id"])
+            else:
+                self._store(event)
+                upserts.append(event)
+        self._sync_token = sync_token or self._sync_token
+        self._persist(upserts=upserts, deletes=deletes)
+
+    def refresh(self, force=False):
+        """
+        Garante que o espelho está atualizado.
+        Usa sincronização incremental quando há syncToken válido e completa quando o TTL expira
+        ou o Google invalida o token (HTTP 410).
+        """
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_sync < self.sync_interval:
+                return
+
+            service = get_service()
+            if not service:
+                raise RuntimeError("O serviço do Google Calendar não foi inicializado.")
+
+            if self._sync_token and now - self._last_full_sync < self.full_resync_ttl:
+                try:
+                    self._incremental_sync(service)
+                except HttpError as error:
+                    if error.resp.status != 410:
+                        raise
+                    self._full_sync(service)
+            else:
+                self._full_sync(service)
+            self._last_sync = time.time()
+
+    def invalidate(self):
+        """Força uma nova sincronização na próxima consulta."""
+        with self._lock:
+            self._last_sync = 0.0
+
+    # --- Atualização pelas ferramentas de escrita ---
+
+    def apply(self, event):
+        """Insere/atualiza um evento devolvido pela API (insert/update/patch)."""
+        with self._lock:
+            if event.get("status") == "cancelled":
+                self.remove(event["id"])
+                return
+            self._store(event)
+            self._persist(upserts=[event])
+
+    def remove(self, event_id):
+        with self._lock:
+            self._drop(event_id)
+            self._persist(deletes=[event_id])
+
+    # --- Consultas ---
+
+    def events_between(self, time_min, time_max, limit=None):
+        """
+        Eventos que se sobrepõem ao intervalo [time_min, time_max), ordenados pelo início
+        (mesma semântica de timeMin/timeMax do events().list).
+        """
+        self.refresh()
+        with self._lock:
+            found = []
+            for event_id in self._overlapping(time_min.timestamp(), time_max.timestamp()):
+                found.append(self._events[event_id])
+                if limit and len(found) >= limit:
+                    break
+            return found
+
+    def busy_intervals(self, time_min, time_max):
+        """(início, fim) em timestamp de cada evento que se sobrepõe a [time_min, time_max)."""
+        self.refresh()
+        with self._lock:
+            return [
+                self._bounds[event_id]
+                for event_id in self._overlapping(time_min.timestamp(), time_max.timestamp())
+            ]
+
+    def _overlapping(self, lo, hi):
+        index = self._sorted_index()
+        first = bisect_left(index, (lo - self._max_duration,))
+        last = bisect_left(index, (hi,))
+        for _, event_id in index[first:last]:
+            if self._bounds[event_id][1] > lo:
+                yield event_id
+
+    def upcoming(self, max_results=10, query=None, now=None):
+        """Próximos eventos (que ainda não terminaram), opcionalmente filtrados por texto."""
+        self.refresh()
+        now_ts = (now or datetime.now(timezone.utc)).timestamp()
+        needle = query.lower() if query else None
+        with self._lock:
+            index = self._sorted_index()
+            first = bisect_right(index, (now_ts - self._max_duration,))
+            found = []
+            for _, event_id in index[first:]:
+                if self._bounds[event_id][1] <= now_ts:
+                    continue
+                event = self._events[event_id]
+                if needle and needle not in _searchable_text(event):
+                    continue
+                found.append(event)
+                if len(found) >= max_results:
+                    break
+            return found
+
+
+def _searchable_text(event):
+    """Campos usados na busca textual local, equivalentes aos que o parâmetro 'q' da API consulta."""
+    parts = [
+        event.get("summary"),
+        event.get("description"),
+        event.get("location"),
+    ]
+    parts.extend(a.get("email") for a in event.get("attendees") or [])
+    return " ".join(p for p in parts if p).lower()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_event_cache(calendar_id="primary"):
+    """Retorna o espelho local (compartilhado pelo processo) do calendário informado."""
+    with _caches_lock:
+        cache = _caches.get(calendar_id)
+        if cache is None:
+            cache = EventCache(calendar_id)
+            _caches[calendar_id] = cache
+        return cache
@@ -1,56 +1,172 @@
 import os.path
+import time
 import datetime
-from google.auth.transport.requests import Request
+import threading
+from contextlib import contextmanager
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
-CREDS_PATH = "Token/client_secret.json" 
+CREDS_PATH = "Token/client_secret.json"
 TOKEN_PATH = "Token/token.json"
+TOKEN_LOCK_PATH = "Token/token.json.lock"
 
+# O token é renovado em segundo plano com essa antecedência antes de expirar.
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
 
-def get_calendar_service():
+# Depois de uma falha ao criar o serviço, novas tentativas só depois desse intervalo (segundos).
+SERVICE_RETRY_AFTER = float(os.getenv("GOOGLE_AUTH_RETRY_AFTER", "60"))
+
+
+@contextmanager
+def token_file_lock():
    """
-   Autentica com a API do Google Calendar e retorna o objeto 'service'.
-   Lida com o fluxo OAuth2, criando/atualizando token.json.
+   Trava exclusiva entre processos para ler/renovar/gravar o token.json.
+   Evita que vários workers renovem o mesmo token ao mesmo tempo e sobrescrevam o arquivo uns dos outros.
    """
-   creds = None
-   
-   if os.path.exists(TOKEN_PATH):
-       try:
-           creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
-       except Exception as e:
-           print(f"Erro ao carregar token.json: {e}. Re-autenticando...")
-           creds = None
-           
-   if not creds or not creds.valid:
-       if creds and creds.expired and creds.refresh_token:
+   os.makedirs(os.path.dirname(TOKEN_LOCK_PATH), exist_ok=True)
+   with open(TOKEN_LOCK_PATH, "a+") as lock_file:
+       if os.name == "nt":
+           import msvcrt
+           lock_file.seek(0)
+           msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+           try:
+               yield
+           finally:
+               lock_file.seek(0)
+               msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+       else:
+           import fcntl
+           fcntl.flock(lock_file, fcntl.LOCK_EX)
+           try:
+               yield
+           finally:
+               fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_credentials():
+   """
+   Carrega as credenciais do token.json, renovando ou refazendo o fluxo OAuth2 se necessário.
+   Todo o processo roda com o token.json travado entre processos.
+   O fluxo interativo (navegador) só roda na thread principal; fora dela, sem token válido, levanta RuntimeError.
+   """
+   with token_file_lock():
+       creds = None
+
+       if os.path.exists(TOKEN_PATH):
            try:
-               creds.refresh(Request())
+               creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
            except Exception as e:
-               print(f"Erro ao atualizar token: {e}")
-               print("Token revogado ou inválido. Por favor, autorize novamente.")
-               if os.path.exists(TOKEN_PATH):
-                   os.remove(TOKEN_PATH) 
+               print(f"Erro ao carregar token.json: {e}. Re-autenticando...")
                creds = None
-       
-       if not creds:
-           if not os.path.exists(CREDS_PATH):
-               raise FileNotFoundError(
-                   f"Arquivo de credenciais não encontrado: {CREDS_PATH}. "
-                   "Faça o download do JSON no Google Cloud Console e renomeie-o."
-               )
-           flow = InstalledAppFlow.from_client_secrets_file(CREDS_PATH, SCOPES)
-           creds = flow.run_local_server(port=0)
-           
+
+       if not creds or not creds.valid:
+           if creds and creds.expired and creds.refresh_token:
+               # Importado só quando necessário: carregar 'requests' custa dezenas de ms na inicialização.
+               from google.auth.transport.requests import Request
+               try:
+                   creds.refresh(Request())
+               except Exception as e:
+                   print(f"Erro ao atualizar token: {e}")
+                   print("Token revogado ou inválido. Por favor, autorize novamente.")
+                   if os.path.exists(TOKEN_PATH):
+                       os.remove(TOKEN_PATH)
+                   creds = None
+
+           if not creds:
+               if not os.path.exists(CREDS_PATH):
+                   raise FileNotFoundError(
+                       f"Arquivo de credenciais não encontrado: {CREDS_PATH}. "
+                       "Faça o download do JSON no Google Cloud Console e renomeie-o."
+                   )
+               if threading.current_thread() is not threading.main_thread():
+                   raise RuntimeError(
+                       "Autorização do Google Calendar necessária e o fluxo interativo não roda fora da "
+                       "thread principal. Rode 'python -m API.google_auth' para gerar o token.json."
+                   )
+               from google_auth_oauthlib.flow import InstalledAppFlow
+               flow = InstalledAppFlow.from_client_secrets_file(CREDS_PATH, SCOPES)
+               creds = flow.run_local_server(port=0)
+
+           with open(TOKEN_PATH, "w") as token:
+               token.write(creds.to_json())
+
+       return creds
+
+
+def refresh_credentials(creds):
+   """
+   Renova 'creds' no lugar. Se outro processo já renovou o token.json, reaproveita o token dele
+   em vez de fazer uma nova chamada de renovação.
+   """
+   from google.auth.transport.requests import Request
+
+   with token_file_lock():
+       if os.path.exists(TOKEN_PATH):
+           stored = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+           if stored.expiry and (not creds.expiry or stored.expiry > creds.expiry) and not _expires_soon(stored):
+               creds.token = stored.token
+               creds.expiry = stored.expiry
+               return
+
+       creds.refresh(Request())
        with open(TOKEN_PATH, "w") as token:
            token.write(creds.to_json())
 
+
+def _expires_soon(creds):
+   if not creds.expiry:
+       return False
+   now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+   return creds.expiry - now <= TOKEN_REFRESH_MARGIN
+
+
+def _refresh_loop(creds, stop):
+   """Renova o token pouco antes de expirar, para que nenhuma chamada à API pague o custo da renovação."""
+   while not stop.is_set():
+       if creds.expiry:
+           now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+           wait = (creds.expiry - TOKEN_REFRESH_MARGIN - now).total_seconds()
+       else:
+           wait = TOKEN_REFRESH_MARGIN.total_seconds()
+
+       if stop.wait(max(wait, 30)):
+           return
+       if not creds.refresh_token:
+           return
+       try:
+           refresh_credentials(creds)
+       except Exception as e:
+           print(f"Erro ao renovar o token em segundo plano: {e}")
+
+
+_refresher_stop = threading.Event()
+
+
+def start_token_refresher(creds):
+   thread = threading.Thread(
+       target=_refresh_loop,
+       args=(creds, _refresher_stop),
+       name="google-token-refresh",
+       daemon=True,
+   )
+   thread.start()
+   return thread
+
+
+def get_calendar_service():
+   """
+   Autentica com a API do Google Calendar e retorna o objeto 'service'.
+   Lida com o fluxo OAuth2, criando/atualizando token.json.
+   O documento de descoberta da API é o que vem empacotado no googleapiclient (sem acesso à rede).
+   """
+   creds = get_credentials()
+
    try:
-       service = build("calendar", "v3", credentials=creds)
+       service = build("calendar", "v3", credentials=creds, static_discovery=True)
+       start_token_refresher(creds)
        print("Serviço do Google Calendar criado com sucesso!")
        return service
    except HttpError as error:
@@ -60,4 +176,44 @@ def get_calendar_service():
        print(f"Um erro inesperado ocorreu: {e}")
        return None
 
-service = get_calendar_service()
\ No newline at end of file
+
+_service_lock = threading.Lock()
+# Instante (time.monotonic) antes do qual não se tenta criar o serviço de novo, após uma falha.
+_retry_at = 0.0
+
+
+def _lazy_service():
+   global service, _retry_at
+   if time.monotonic() < _retry_at:
+       return None
+   with _service_lock:
+       if "service" in globals():
+           return globals()["service"]
+       if time.monotonic() < _retry_at:
+           return None
+       try:
+           created = get_calendar_service()
+       except Exception as e:
+           print(f"Erro ao inicializar o serviço do Google Calendar: {e}")
+           created = None
+       if created is None:
+           # Sem isso, cada chamada de ferramenta refaria a autenticação (e o fluxo OAuth2) em sequência.
+           _retry_at = time.monotonic() + SERVICE_RETRY_AFTER
+           print(f"Google Calendar indisponível; nova tentativa em {SERVICE_RETRY_AFTER:.0f} s.")
+           return None
+       service = created
+       return created
+
+
+def __getattr__(name):
+   # 'service' só é criado no primeiro acesso (import sem I/O nem rede).
+   # Atribuir API.google_auth.service = ... substitui o serviço real (ex.: stand-ins em memória).
+   if name == "service":
+       return _lazy_service()
+   raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+   # Autorização inicial (ou após revogação): abre o navegador e grava o token.json.
+   get_credentials()
+   print(f"Token salvo em {TOKEN_PATH}.")
@@ -0,0 +1,246 @@
+import os
+import csv
+import time
+import sqlite3
+import threading
+import unicodedata
+
+import numpy as np
+
+try:
+    import pyarrow.parquet as parquet
+except ImportError:
+    parquet = None
+
+
+# Arquivo com o estoque de imóveis: CSV, Parquet (precisa do pacote pyarrow) ou SQLite (tabela 'properties').
+# Colunas: id, title, neighborhood, transaction ("sale"/"rent", ou "venda"/"aluguel"), price, bedrooms,
+# area_m2 e pet_friendly (1/0, true/false, sim/não). Sem o arquivo, a busca responde que não há estoque.
+PROPERTIES_PATH = os.getenv("PROPERTIES_PATH", "properties.csv")
+# De quantos em quantos segundos a busca confere se o arquivo mudou (mtime/tamanho) para recarregá-lo.
+INVENTORY_RELOAD_INTERVAL = float(os.getenv("INVENTORY_RELOAD_INTERVAL", "5"))
+
+COLUMNS = ("id", "title", "neighborhood", "transaction", "price", "bedrooms", "area_m2", "pet_friendly")
+
+SALE, RENT = 0, 1
+TRANSACTIONS = {"sale": SALE, "venda": SALE, "compra": SALE, "rent": RENT, "aluguel": RENT, "locacao": RENT}
+TRANSACTION_NAMES = {SALE: "venda", RENT: "aluguel"}
+
+_TRUE = {"1", "true", "sim", "yes", "s", "y"}
+
+
+def normalize(text):
+    """'São João ' -> 'sao joao': chave de comparação de bairros e tipos de negócio."""
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode()
+    return " ".join(text.lower().split())
+
+
+def _read_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    return {name: [row.get(name) for row in rows] for name in COLUMNS}
+
+
+def _read_sqlite(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        # Nomes entre aspas: 'transaction' é palavra reservada do SQLite.
+        rows = conn.execute(f"SELECT {', '.join(f'[{name}]' for name in COLUMNS)} FROM properties").fetchall()
+    finally:
+        conn.close()
+    return {name: [row[i] for row in rows] for i, name in enumerate(COLUMNS)}
+
+
+def _read_parquet(path):
+    if parquet is None:
+        raise RuntimeError("Leitura de Parquet precisa do pacote pyarrow.")
+    return parquet.read_table(path, columns=list(COLUMNS)).to_pydict()
+
+
+def read_columns(path):
+    """Lê o arquivo de estoque e retorna {coluna: [valores]} com as colunas de COLUMNS."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        return _read_parquet(path)
+    if extension in (".sqlite", ".sqlite3", ".db"):
+        return _read_sqlite(path)
+    return _read_csv(path)
+
+
+class PropertyIndex:
+    """
+    Estoque de imóveis em arrays colunares (um array do numpy por atributo), para filtrar e ordenar
+    100 mil+ imóveis com operações vetorizadas em poucos milissegundos.
+    Bairros e tipo de negócio viram códigos inteiros; o texto original fica só para a saída.
+    """
+
+    def __init__(self, columns):
+        self.ids = np.array([str(v) for v in columns["id"]], dtype=object)
+        self.titles = np.array([v or "" for v in columns["title"]], dtype=object)
+
+        # Bairros: código por nome normalizado, e o nome como aparece no arquivo para exibir.
+        self.neighborhood_codes = {}
+        self.neighborhood_names = []
+        codes = np.empty(len(self.ids), dtype=np.int32)
+        for i, name in enumerate(columns["neighborhood"]):
+            key = normalize(name)
+            code = self.neighborhood_codes.get(key)
+            if code is None:
+                code = self.neighborhood_codes[key] = len(self.neighborhood_names)
+                self.neighborhood_names.append((name or "").strip())
+            codes[i] = code
+        self.neighborhood = codes
+
+        self.transaction = np.array(
+            [TRANSACTIONS.get(normalize(v), SALE) for v in columns["transaction"]], dtype=np.int8
+        )
+        self.price = np.array([float(v or 0) for v in columns["price"]], dtype=np.float64)
+        self.bedrooms = np.array([int(float(v or 0)) for v in columns["bedrooms"]], dtype=np.int16)
+        self.area = np.array([float(v or 0) for v in columns["area_m2"]], dtype=np.float32)
+        self.pet_friendly = np.array(
+            [v is True or (v not in (None, False) and normalize(v) in _TRUE) for v in columns["pet_friendly"]],
+            dtype=bool,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def neighborhood_code(self, name):
+        """Código do bairro (sem diferenciar acentos e maiúsculas), ou None se não existe no estoque."""
+        return self.neighborhood_codes.get(normalize(name))
+
+    def search(
+        self,
+        neighborhoods=None,
+        transaction=None,
+        min_price=None,
+        max_price=None,
+        min_bedrooms=None,
+        pet_friendly=None,
+        top_k=5,
+    ):
+        """
+        Retorna (total de imóveis que passam nos filtros, [linha, ...] dos 'top_k' melhores).
+        'neighborhoods' é uma lista de códigos de bairro; 'transaction' é SALE ou RENT.
+        Ordenação: com orçamento, os mais próximos do teto (ou do meio da faixa) primeiro, e a cada quarto
+        além do pedido o imóvel perde posições; sem orçamento, do mais barato ao mais caro.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if neighborhoods:
+            # Tabela bairro -> aceito: um acesso indexado por imóvel, sem comparar com cada bairro pedido.
+            wanted = np.zeros(len(self.neighborhood_names), dtype=bool)
+            wanted[neighborhoods] = True
+            mask &= wanted[self.neighborhood]
+        if transaction is not None:
+            mask &= self.transaction == transaction
+        if min_price is not None:
+            mask &= self.price >= min_price
+        if max_price is not None:
+            mask &= self.price <= max_price
+        if min_bedrooms is not None:
+            mask &= self.bedrooms >= min_bedrooms
+        if pet_friendly:
+            mask &= self.pet_friendly
+
+        matches = np.flatnonzero(mask)
+        if not len(matches):
+            return 0, []
+
+        prices = self.price[matches]
+        if max_price is not None or min_price is not None:
+            target = max_price if min_price is None else (min_price + (max_price or min_price)) / 2
+            score = np.abs(prices - target) / max(target, 1.0)
+        else:
+            score = prices / max(float(prices.max()), 1.0)
+        if min_bedrooms is not None:
+            score = score + 0.1 * (self.bedrooms[matches] - min_bedrooms)
+
+        # argpartition separa os top_k sem ordenar o resto; só eles são ordenados.
+        k = min(top_k, len(matches))
+        best = np.argpartition(score, k - 1)[:k] if k < len(matches) else np.arange(len(matches))
+        best = best[np.argsort(score[best], kind="stable")]
+        return len(matches), [self.row(int(i)) for i in matches[best]]
+
+    def row(self, i):
+        return {
+            "id": self.ids[i],
+            "title": self.titles[i],
+            "neighborhood": self.neighborhood_names[self.neighborhood[i]],
+            "transaction": TRANSACTION_NAMES[int(self.transaction[i])],
+            "price": float(self.price[i]),
+            "bedrooms": int(self.bedrooms[i]),
+            "area_m2": float(self.area[i]),
+            "pet_friendly": bool(self.pet_friendly[i]),
+        }
+
+
+class PropertyInventory:
+    """
+    Mantém o PropertyIndex do arquivo de estoque e o recarrega quando o arquivo muda, sem reiniciar.
+    A conferência (os.stat) acontece no máximo a cada 'reload_interval' segundos. A recarga roda numa
+    thread em segundo plano: as buscas continuam no índice anterior até o novo ficar pronto, e se o
+    arquivo novo falhar o anterior é mantido. Para trocar o estoque, grave um arquivo temporário e
+    renomeie-o por cima (os.replace), assim a recarga nunca lê um arquivo pela metade.
+    """
+
+    def __init__(self, path=PROPERTIES_PATH, reload_interval=INVENTORY_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._index = None
+        self._signature = None
+        self._checked_at = float("-inf")
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload(self, signature):
+        started = time.perf_counter()
+        try:
+            index = PropertyIndex(read_columns(self.path))
+        except Exception as e:
+            print(f"Erro ao carregar o estoque de imóveis '{self.path}': {e}")
+            return
+        finally:
+            self._reloading = False
+        self._index, self._signature = index, signature
+        print(f"Estoque de imóveis carregado: {len(index)} imóveis em {time.perf_counter() - started:.2f} s.")
+
+    def get(self):
+        """Índice atual, ou None se não há arquivo de estoque. Dispara a recarga se o arquivo mudou."""
+        if self._reloading or time.monotonic() - self._checked_at < self.reload_interval:
+            return self._index
+
+        with self._lock:
+            if self._reloading or time.monotonic() - self._checked_at < self.reload_interval:
+                return self._index
+            self._checked_at = time.monotonic()
+            signature = self._file_signature()
+            if signature is None or signature == self._signature:
+                return self._index
+            self._reloading = True
+            if self._index is None:
+                # Primeira carga: não há índice anterior para responder enquanto isso.
+                self._reload(signature)
+            else:
+                threading.Thread(
+                    target=self._reload, args=(signature,), name="inventory-reload", daemon=True,
+                ).start()
+        return self._index
+
+
+_inventory = None
+_inventory_lock = threading.Lock()
+
+
+def get_inventory():
+    global _inventory
+    with _inventory_lock:
+        if _inventory is None:
+            _inventory = PropertyInventory()
+        return _inventory
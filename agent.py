@@ -1,3 +1,4 @@
+import os
 import asyncio
 
 from datetime import datetime, timezone, timedelta
@@ -9,28 +10,161 @@ load_dotenv()
 from langchain.agents import create_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
 
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langchain_core.messages import HumanMessage
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langgraph.types import Command
 
-from langchain.agents.middleware import PIIMiddleware, HumanInTheLoopMiddleware
+from langchain.agents.middleware import HumanInTheLoopMiddleware
 
-from Tools.calendar_tools import (
+from tools.calendar_tools import (
     list_upcoming_events,
     create_calendar_event,
     search_calendar_events,
     update_calendar_event,
     delete_calendar_event,
+    find_available_slots,
+    assign_broker,
+    bulk_create_calendar_events,
+    bulk_update_calendar_events,
+    bulk_delete_calendar_events,
 )
-
-
-async def main():
-
-    model = ChatGoogleGenerativeAI(
+from tools.property_tools import search_properties
+from API import google_auth
+from storage.checkpointer import open_checkpointer
+from storage.lead_state import LeadStateStore
+from middleware.content_scanner import ContentScannerMiddleware
+from middleware.context_window import ContextWindowMiddleware
+from middleware.lead_state import LeadStateMiddleware
+from middleware.turn_context import TurnContextMiddleware
+from middleware.tool_scheduler import ToolSchedulerMiddleware
+from middleware.router import TurnRouterMiddleware
+from middleware.prompt_cache import PromptCacheMiddleware, gemini_context_cache
+from streaming.events import agent_events
+from streaming.sinks import SinkGroup, StdoutSink
+from telemetry.metrics import APPROVAL_WAIT_SECONDS
+from telemetry.tracing import TRACE_CALLBACKS, span, turn_span
+
+
+# Requisições por segundo ao Gemini, somando todas as conversas do processo (ex.: a cota por minuto
+# do projeto dividida por 60). 0 desliga o limitador.
+GEMINI_RPS = float(os.getenv("GEMINI_RPS", "0"))
+GEMINI_BURST = float(os.getenv("GEMINI_BURST", "5"))
+# Modelo menor (sem ferramentas) para cumprimentos e agradecimentos desviados pelo roteador
+# (middleware/router.py), ex.: gemini-2.5-flash-lite. Vazio: respostas prontas.
+ROUTER_LIGHT_MODEL = os.getenv("ROUTER_LIGHT_MODEL", "")
+
+
+def model_rate_limiter(rps=GEMINI_RPS, burst=GEMINI_BURST):
+    """Limitador de taxa das chamadas ao modelo (o do LangChain, que espera sem bloquear o event loop), ou None."""
+    if rps <= 0:
+        return None
+    return InMemoryRateLimiter(requests_per_second=rps, check_every_n_seconds=0.01, max_bucket_size=burst)
+
+
+def build_model():
+    return ChatGoogleGenerativeAI(
         model='gemini-2.5-flash',
+        rate_limiter=model_rate_limiter(),
     )
 
-    async with AsyncSqliteSaver.from_conn_string("db.sqlite") as memory:
 
+def build_light_model(name=ROUTER_LIGHT_MODEL):
+    """Modelo do caminho rápido do roteador, ou None (respostas prontas)."""
+    if not name:
+        return None
+    return ChatGoogleGenerativeAI(model=name, rate_limiter=model_rate_limiter())
+
+
+# Parte fixa do prompt de sistema. Não coloque aqui nada que mude entre turnos ou leads
+# (data/hora, dados do lead): ela é o prefixo guardado no cache de contexto do Gemini.
+# O que muda a cada turno vai em build_turn_context().
+SYSTEM_PROMPT = """
+    [PERFIL]
+    Você um a Assistente de Oportunidades. Você não é um robô, mas uma especialista em entender as necessidades dos clientes para encontrar o imóvel dos sonhos.
+
+    [DIRETIVA_PRINCIPAL]
+    Sua missão é realizar a "Qualificação de Leads". Você deve conversar com o usuário para entender profundamente suas necessidades e determinar se ele é um "Lead Curioso" (apenas pesquisando) ou um "Lead Qualificado" (pronto para comprar ou alugar). Seu objetivo final é, para Leads Qualificados, agendar uma conversa ou visita com um Corretor Especialista.
+
+    [CONTEXTO_OPERACIONAL]
+    - Você tem acesso às ferramentas de calendário (como 'create_calendar_event' e 'list_upcoming_events') para agendar horários para os corretores.
+    - Use 'find_available_slots' para descobrir, em uma única consulta, os horários livres que já respeitam as regras de agendamento.
+    - Depois que o cliente escolher o horário, use 'assign_broker' para escolher o corretor e passe o 'broker_id' retornado para 'create_calendar_event'.
+    - Você tem acesso ao estoque de imóveis (via 'search_properties'), com filtros de bairro, faixa de preço, quartos, venda ou aluguel e pet-friendly. Só apresente imóveis retornados por essa ferramenta.
+    - Você NUNCA deve agendar um evento sem antes confirmar a disponibilidade na agenda E o horário com o cliente.
+    - A data e a hora atuais (horário de Brasília, America/Sao_Paulo) e os dados do lead chegam a cada turno no bloco [CONTEXTO_DO_TURNO]. Sempre considere este horário atual ao interpretar pedidos do usuário.
+
+    [REGRAS_PARA_AGENDAMENTO]
+    Ao criar um evento na agenda ('create_calendar_event'), você DEVE seguir estritamente estes formatos:
+    
+    1. **Título (summary):** Deve ser "[Nome do Cliente] - [Palavras-chave do que procura]". 
+       *Exemplo: "Maria Silva - Ap 2 quartos Centro"*
+       
+    2. **Descrição (description):** Deve conter detalhadamente:
+       * **Nome do Cliente:** [Nome]
+       * **O que procura:** [Descrição exata da necessidade]
+       * **E-mail:** [Email do cliente]
+       * **Informações Adicionais:** [Outros detalhes relevantes para o atendente]
+       
+    3. **Horários Permitidos:**
+       * **Dias:** Apenas de Segunda a Sexta-feira (proibido sábados e domingos).
+       * **Horário:** Apenas entre 08:00 e 18:00.
+       * Se o usuário pedir fora desses horários, explique polidamente que os corretores atendem apenas em horário comercial durante a semana.
+
+    [PROCESSO_DE_QUALIFICAÇÃO (O Funil)]
+    Guie a conversa de forma natural, mas seu objetivo é obter respostas para os 4 Pilares da Qualificação (conhecido como "BANT" adaptado):
+
+        1.  **B - Budget (Orçamento):**
+            * Qual é a faixa de valor que você está considerando?
+            * Você pretende usar financiamento? Já tem uma carta de crédito pré-aprovada?
+            * (Seja sutil, não pareça invasivo. Ex: "Para eu filtrar as melhores opções, qual valor de investimento você tem em mente?")
+
+        2.  **A - Authority (Autoridade):**
+            * Quem tomará a decisão final da compra/aluguel?
+            * (Geralmente implícito, mas importante se a pessoa está "vendo para um amigo".)
+
+        3.  **N - Need (Necessidade):**
+            * O que é *essencial* no imóvel? (Ex: N° de quartos, bairro, segurança, pet-friendly).
+            * Qual é a *motivação* por trás da busca? (Ex: Mudar para perto do trabalho, família aumentando, investimento).
+
+        4.  **T - Timeline (Prazo):**
+            * Qual é a sua urgência? (Ex: "Estou me mudando mês que vem", "Estou planejando para os próximos 6 meses", "Estou só dando uma olhada").
+            * **ESTE É O PRINCIPAL FILTRO.**
+
+    [FLUXOS_DE_DECISÃO (Curioso vs. Qualificado)]
+
+    **Fluxo 1: Lead Curioso (Frio)**
+    * **Gatilho:** Respostas vagas no "Prazo" (Ex: "só olhando", "sem pressa", "ano que vem") E/OU respostas    vagas no "Orçamento".
+    * **Ação:**
+    1.  Seja extremamente prestativo e simpático.
+    2.  Responda todas as perguntas.
+    3.  **NÃO** tente forçar um agendamento com o corretor.
+    4.  **Objetivo de Conversão:** Oferecer a inscrição em uma newsletter ou um alerta de imóveis.
+    5.  *Exemplo de Fechamento:* "Entendo perfeitamente que você está na fase de pesquisa. É um ótimo planejamento! Posso pegar seu e-mail para te enviar as melhores oportunidades que surgirem nesse perfil, sem compromisso. O que acha?"
+
+    **Fluxo 2: Lead Qualificado (Quente)**
+    * **Gatilho:** "Prazo" definido (Ex: "nos próximos 3 meses", "para ontem", "até o fim do ano") E "Orçamento" definido E "Necessidade" clara.
+    * **Ação:**
+        1.  Valide o entendimento: "Perfeito, então você busca um apartamento de 2 quartos, na região central, até R$ 500.000, para se mudar nos próximos 3 meses. Correto?"
+        2.  **Objetivo de Conversão:** AGENDAR O PRÓXIMO PASSO (Usar a ferramenta de calendário).
+        3.  *Exemplo de Fechamento:* "Temos algumas opções que se encaixam perfeitamente nisso. O próximo passo ideal seria conversar por 15 minutos com nosso especialista em imóveis na região central. Ele pode te apresentar opções que nem subiram para o site ainda. Você teria um horário disponível amanhã à tarde ou prefere na quarta de manhã?"
+
+    [TOM_E_ESTILO]
+    * **Profissional, mas Empático:** Comprar um imóvel é uma grande decisão. Demonstre empatia.
+    * **Proativo:** Não dê respostas passivas. Sempre termine sua mensagem com uma pergunta ou uma sugestão de   próximo passo.
+    * **Claro e Conciso:** Evite jargões imobiliários.
+    * **Orientado para Soluções:** Foque em resolver o problema do cliente.
+
+    [RESTRIÇÕES (HARD-GUARDS)]
+    * NUNCA prometa um imóvel que não existe.
+    * NUNCA dê opiniões pessoais sobre um bairro ou imóvel.
+    * NUNCA forneça informações financeiras ou legais (ex: "com certeza seu financiamento será aprovado").
+    * NUNCA encerre a conversa sem um "call-to-action" (seja agendar ou se inscrever na newsletter).
+    """
+
+
+def build_turn_context(current_datetime=None, lead=None):
+    """Monta a parte do contexto que muda a cada turno: data/hora atual de Brasília e dados do lead."""
+    if current_datetime is None:
         try:
             tzinfo = ZoneInfo("America/Sao_Paulo")
         except ZoneInfoNotFoundError:
@@ -38,136 +172,169 @@ async def main():
             tzinfo = timezone(timedelta(hours=-3))
 
         current_datetime = datetime.now(tzinfo)
-        current_date_iso = current_datetime.strftime("%Y-%m-%d")
-        current_date_pt = current_datetime.strftime("%d/%m/%Y %H:%M")
 
-        prompt = f"""
-        [PERFIL]
-        Você um a Assistente de Oportunidades. Você não é um robô, mas uma especialista em entender as necessidades dos clientes para encontrar o imóvel dos sonhos.
+    current_date_pt = current_datetime.strftime("%d/%m/%Y %H:%M")
+
+    lines = [
+        "[CONTEXTO_DO_TURNO] (informação do sistema, não é mensagem do cliente)",
+        f"Agora são {current_date_pt} (horário de Brasília, America/Sao_Paulo).",
+    ]
+    for key, value in (lead or {}).items():
+        lines.append(f"{key}: {value}")
+    return "\n".join(lines)
+
+
+# Ferramentas que alteram a agenda e precisam da aprovação de um operador antes de rodar.
+APPROVAL_REQUIRED = {
+    "create_calendar_event": {
+        "allowed_decisions": ["approve", "edit", "reject"],
+        "description": "Criar evento no Google Calendar",
+    },
+    "update_calendar_event": {
+        "allowed_decisions": ["approve", "edit", "reject"],
+        "description": "Alterar evento no Google Calendar",
+    },
+    "delete_calendar_event": {
+        "allowed_decisions": ["approve", "edit", "reject"],
+        "description": "Excluir evento do Google Calendar",
+    },
+    "bulk_create_calendar_events": {
+        "allowed_decisions": ["approve", "reject"],
+        "description": "Criar vários eventos no Google Calendar",
+    },
+    "bulk_update_calendar_events": {
+        "allowed_decisions": ["approve", "reject"],
+        "description": "Alterar vários eventos no Google Calendar",
+    },
+    "bulk_delete_calendar_events": {
+        "allowed_decisions": ["approve", "reject"],
+        "description": "Excluir vários eventos do Google Calendar",
+    },
+}
+
+
+def build_agent(
+    checkpointer, model=None, system_prompt=None, cache_factory=gemini_context_cache, lead_states=None,
+    router=True, light_model=None,
+):
+    """
+    Compila o grafo do agente (modelo, ferramentas, middlewares e checkpointer).
+    O grafo compilado não guarda estado de conversa e pode ser compartilhado por várias sessões;
+    cada lead é separado pelo 'thread_id' da config.
+    'cache_factory' cria o cache de contexto do prompt (ver middleware/prompt_cache.py).
+    'lead_states' (storage/lead_state.py), se informado, recebe a ficha BANT de cada lead a cada turno.
+    'router' liga o roteador de mensagens triviais; 'light_model' é o modelo do caminho rápido
+    (padrão: build_light_model()).
+    """
+    tools = [
+        list_upcoming_events,
+        create_calendar_event,
+        search_calendar_events,
+        update_calendar_event,
+        delete_calendar_event,
+        find_available_slots,
+        assign_broker,
+        bulk_create_calendar_events,
+        bulk_update_calendar_events,
+        bulk_delete_calendar_events,
+        search_properties,
+        ]
 
-        [DIRETIVA_PRINCIPAL]
-        Sua missão é realizar a "Qualificação de Leads". Você deve conversar com o usuário para entender profundamente suas necessidades e determinar se ele é um "Lead Curioso" (apenas pesquisando) ou um "Lead Qualificado" (pronto para comprar ou alugar). Seu objetivo final é, para Leads Qualificados, agendar uma conversa ou visita com um Corretor Especialista.
+    model = model or build_model()
+
+    middleware = [
+        # Bloqueia código perigoso na entrada e oculta e-mail, URL, CPF/CNPJ e telefone nas respostas,
+        # tudo em uma passada por mensagem.
+        ContentScannerMiddleware(),
+    ]
+    if router:
+        # Cumprimentos, agradecimentos e horário de atendimento respondidos sem o modelo principal,
+        # o prompt completo e as ferramentas; o resto segue pelos middlewares abaixo.
+        middleware.append(TurnRouterMiddleware(light_model=light_model or build_light_model()))
+    middleware += [
+        # Resume o histórico antigo para o prompt não crescer a cada turno.
+        ContextWindowMiddleware(model),
+
+        # Data/hora e dados do lead entram a cada turno, fora do prompt de sistema.
+        TurnContextMiddleware(build_turn_context),
+
+        # Criar/alterar eventos pausa a conversa (interrupt salvo no checkpoint) até um operador
+        # aprovar ou rejeitar; as outras conversas continuam rodando.
+        HumanInTheLoopMiddleware( 
+            interrupt_on=APPROVAL_REQUIRED,
+            description_prefix="Ação do agente aguardando aprovação",
+        ),
+
+        # Leituras da agenda em paralelo no mesmo passo; criar/alterar/apagar, uma de cada vez e na ordem.
+        ToolSchedulerMiddleware(),
+
+        # Por último: guarda o prompt de sistema e as ferramentas no cache de contexto do Gemini.
+        PromptCacheMiddleware(cache_factory),
+    ]
+    if lead_states is not None:
+        # Ao fim de cada execução: atualiza a ficha de qualificação só com as mensagens novas.
+        middleware.append(LeadStateMiddleware(lead_states))
+    
+    
+    return create_agent(
+        model=model,
+        tools=tools,
+        system_prompt=system_prompt or SYSTEM_PROMPT,
+        checkpointer=checkpointer,
+        middleware=middleware,
+    )
 
-        [CONTEXTO_OPERACIONAL]
-        - Você tem acesso às ferramentas de calendário (como 'create_calendar_event' e 'list_upcoming_events') para agendar horários para os corretores.
-        - Você tem acesso a um banco de dados de imóveis (via 'search_properties') para consultas rápidas.
-        - Você NUNCA deve agendar um evento sem antes confirmar a disponibilidade na agenda E o horário com o cliente.
-        Informação de contexto: Agora são {current_date_pt} (horário de Brasília, America/Sao_Paulo). Sempre considere este horário atual ao interpretar pedidos do usuário.
 
-        [REGRAS_PARA_AGENDAMENTO]
-        Ao criar um evento na agenda ('create_calendar_event'), você DEVE seguir estritamente estes formatos:
-        
-        1. **Título (summary):** Deve ser "[Nome do Cliente] - [Palavras-chave do que procura]". 
-           *Exemplo: "Maria Silva - Ap 2 quartos Centro"*
-           
-        2. **Descrição (description):** Deve conter detalhadamente:
-           * **Nome do Cliente:** [Nome]
-           * **O que procura:** [Descrição exata da necessidade]
-           * **E-mail:** [Email do cliente]
-           * **Informações Adicionais:** [Outros detalhes relevantes para o atendente]
-           
-        3. **Horários Permitidos:**
-           * **Dias:** Apenas de Segunda a Sexta-feira (proibido sábados e domingos).
-           * **Horário:** Apenas entre 08:00 e 18:00.
-           * Se o usuário pedir fora desses horários, explique polidamente que os corretores atendem apenas em horário comercial durante a semana.
-
-        [PROCESSO_DE_QUALIFICAÇÃO (O Funil)]
-        Guie a conversa de forma natural, mas seu objetivo é obter respostas para os 4 Pilares da Qualificação (conhecido como "BANT" adaptado):
-
-            1.  **B - Budget (Orçamento):**
-                * Qual é a faixa de valor que você está considerando?
-                * Você pretende usar financiamento? Já tem uma carta de crédito pré-aprovada?
-                * (Seja sutil, não pareça invasivo. Ex: "Para eu filtrar as melhores opções, qual valor de investimento você tem em mente?")
-
-            2.  **A - Authority (Autoridade):**
-                * Quem tomará a decisão final da compra/aluguel?
-                * (Geralmente implícito, mas importante se a pessoa está "vendo para um amigo".)
-
-            3.  **N - Need (Necessidade):**
-                * O que é *essencial* no imóvel? (Ex: N° de quartos, bairro, segurança, pet-friendly).
-                * Qual é a *motivação* por trás da busca? (Ex: Mudar para perto do trabalho, família aumentando, investimento).
-
-            4.  **T - Timeline (Prazo):**
-                * Qual é a sua urgência? (Ex: "Estou me mudando mês que vem", "Estou planejando para os próximos 6 meses", "Estou só dando uma olhada").
-                * **ESTE É O PRINCIPAL FILTRO.**
-
-        [FLUXOS_DE_DECISÃO (Curioso vs. Qualificado)]
-
-        **Fluxo 1: Lead Curioso (Frio)**
-        * **Gatilho:** Respostas vagas no "Prazo" (Ex: "só olhando", "sem pressa", "ano que vem") E/OU respostas    vagas no "Orçamento".
-        * **Ação:**
-        1.  Seja extremamente prestativo e simpático.
-        2.  Responda todas as perguntas.
-        3.  **NÃO** tente forçar um agendamento com o corretor.
-        4.  **Objetivo de Conversão:** Oferecer a inscrição em uma newsletter ou um alerta de imóveis.
-        5.  *Exemplo de Fechamento:* "Entendo perfeitamente que você está na fase de pesquisa. É um ótimo planejamento! Posso pegar seu e-mail para te enviar as melhores oportunidades que surgirem nesse perfil, sem compromisso. O que acha?"
-
-        **Fluxo 2: Lead Qualificado (Quente)**
-        * **Gatilho:** "Prazo" definido (Ex: "nos próximos 3 meses", "para ontem", "até o fim do ano") E "Orçamento" definido E "Necessidade" clara.
-        * **Ação:**
-            1.  Valide o entendimento: "Perfeito, então você busca um apartamento de 2 quartos, na região central, até R$ 500.000, para se mudar nos próximos 3 meses. Correto?"
-            2.  **Objetivo de Conversão:** AGENDAR O PRÓXIMO PASSO (Usar a ferramenta de calendário).
-            3.  *Exemplo de Fechamento:* "Temos algumas opções que se encaixam perfeitamente nisso. O próximo passo ideal seria conversar por 15 minutos com nosso especialista em imóveis na região central. Ele pode te apresentar opções que nem subiram para o site ainda. Você teria um horário disponível amanhã à tarde ou prefere na quarta de manhã?"
-
-        [TOM_E_ESTILO]
-        * **Profissional, mas Empático:** Comprar um imóvel é uma grande decisão. Demonstre empatia.
-        * **Proativo:** Não dê respostas passivas. Sempre termine sua mensagem com uma pergunta ou uma sugestão de   próximo passo.
-        * **Claro e Conciso:** Evite jargões imobiliários.
-        * **Orientado para Soluções:** Foque em resolver o problema do cliente.
-
-        [RESTRIÇÕES (HARD-GUARDS)]
-        * NUNCA prometa um imóvel que não existe.
-        * NUNCA dê opiniões pessoais sobre um bairro ou imóvel.
-        * NUNCA forneça informações financeiras ou legais (ex: "com certeza seu financiamento será aprovado").
-        * NUNCA encerre a conversa sem um "call-to-action" (seja agendar ou se inscrever na newsletter).
-        """
-
-        tools = [
-            list_upcoming_events,
-            create_calendar_event,
-            search_calendar_events,
-            update_calendar_event,
-            delete_calendar_event
-            ]
-        
-        middleware = [
-            PIIMiddleware(
-                "dangerous_code",
-                detector=r"(rm\s+-rf\s+/|<script>|powershell\.exe|curl\s+http|DROP\s+TABLE|chmod\s+\+x)",
-                strategy="block",
-                apply_to_input=True,
-                apply_to_output=False,
-            ),
-            # PIIMiddleware(
-            #     "email",
-            #     strategy="redact",
-            #     apply_to_input=False,
-            #     apply_to_output=True,
-            # ),
-            # PIIMiddleware(
-            #     "url",
-            #     strategy="redact",
-            #     apply_to_input=False,
-            #     apply_to_output=True,
-            # ),
-
-            HumanInTheLoopMiddleware( 
-                interrupt_on={
-                    "write_file": True,
-                }
-            ),
-        ]
-        
-        
-        agent_executor = create_agent(
-            model=model,
-            tools=tools,
-            system_prompt=prompt,
-            checkpointer=memory,
-            middleware=middleware,
+def message_text(content):
+    """Extrai o texto de um conteúdo de mensagem (string ou lista de partes)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "")
+            for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
         )
-        
-        config = {'configurable': {'thread_id': '1'}}
+    return ""
+
+
+async def ask_approval(request):
+    """Pergunta no terminal, sem bloquear o event loop, se as ações pendentes podem rodar."""
+    decisions = []
+    for action in request["action_requests"]:
+        print(f"\n[HITL] {action.get('description', action['name'])}:")
+        for key, value in action["args"].items():
+            print(f"  {key}: {value}")
+        resp = (await asyncio.to_thread(input, "[HITL] Confirmar? (s/N): ")).strip().lower()
+        if resp in ("s", "sim", "y", "yes"):
+            decisions.append({"type": "approve"})
+        else:
+            print("[HITL] Ação CANCELADA pelo humano.")
+            decisions.append({"type": "reject", "message": "Ação cancelada por intervenção humana."})
+    return decisions
+
+
+async def _print_stream(agent_executor, payload, config):
+    """Executa o agente mostrando no terminal o texto gerado (já ocultado) e as chamadas de ferramenta."""
+    async with SinkGroup([StdoutSink()]) as sinks:
+        async for event in agent_events(agent_executor, payload, config, sinks.kinds):
+            await sinks.put(event)
+
+
+async def main():
+
+    # Autentica aqui, na thread principal: as ferramentas rodam em threads do executor, onde o
+    # fluxo OAuth2 interativo (primeira execução) não é iniciado.
+    if google_auth.service is None:
+        print("Aviso: agente iniciado sem o Google Calendar; as ferramentas de agenda vão retornar erro.")
+
+    async with open_checkpointer() as memory:
+
+        lead_states = LeadStateStore(memory)
+        await lead_states.setup()
+        agent_executor = build_agent(memory, lead_states=lead_states)
+
+        config = {'configurable': {'thread_id': '1'}, 'callbacks': TRACE_CALLBACKS}
 
         print("Agente de Calendário pronto.")
         
@@ -177,32 +344,23 @@ async def main():
                 break
                 
             input_message = HumanMessage(content=input_text)
+            payload = {'messages': [input_message]}
             
             try:
                 print("---")
-                async for event in agent_executor.astream_events(
-                    {'messages': [input_message]}, config, stream_mode='values', version="v1"
-                ):
-                    kind = event["event"]
-                    
-                    if kind == "on_chat_model_stream":
-                        chunk = event["data"]["chunk"]
-                        content = chunk.content
-                        
-                        if content:
-                            if isinstance(content, str):
-                                print(content, end="", flush=True)
-                            elif isinstance(content, list):
-                                for part in content:
-                                    if isinstance(part, dict) and part.get("type") == "text":
-                                        print(part.get("text", ""), end="", flush=True)
-                    
-                    elif kind == "on_tool_call":
-                        tool_call = event["data"]
-                        print(f"\n[Chamando ferramenta: {tool_call['name']} com args {tool_call['args']}]", flush=True)
-                    elif kind == "on_tool_end":
-                        tool_output = event['data']['output']
-                        print(f"\n[Resultado da ferramenta: {str(tool_output)[:200]}...]", flush=True)
+                kind = "message"
+                while payload is not None:
+                    with turn_span("1", kind):
+                        await _print_stream(agent_executor, payload, config)
+
+                    # Ferramentas de escrita param o grafo em um interrupt até a aprovação.
+                    state = await agent_executor.aget_state(config)
+                    payload = None
+                    if state.interrupts:
+                        with span("approval_wait", APPROVAL_WAIT_SECONDS):
+                            decisions = await ask_approval(state.interrupts[0].value)
+                        payload = Command(resume={"decisions": decisions})
+                        kind = "resume"
 
                 print("\n---\n")
 
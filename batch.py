@@ -0,0 +1,203 @@
+"""
+Primeiro contato em lote com listas de leads de formulário (CSV ou JSONL vindos do marketing).
+
+Cada lead vira uma conversa própria (thread_id) no mesmo checkpointer do servidor e passa por um turno
+do agente compilado, com no máximo '--concurrency' turnos ao mesmo tempo. As chamadas ao Gemini
+respeitam GEMINI_RPS e as do Google Calendar o limitador de API/calendar_client.py.
+O arquivo de leads é lido aos poucos e cada resultado é gravado (uma linha JSON por lead) assim que
+termina; o próprio arquivo de resultados é o registro de progresso: rodar de novo o mesmo comando
+pula os leads já processados e termina os turnos que ficaram pela metade.
+
+Uso:
+    python batch.py leads.csv --output resultados.jsonl --concurrency 20
+"""
+import os
+import csv
+import json
+import time
+import asyncio
+import argparse
+
+from langchain_core.messages import AIMessage
+
+from agent import build_agent, message_text
+from server import LeadSessions
+from storage.approvals import ApprovalQueue
+from storage.checkpointer import open_checkpointer
+from storage.lead_state import LeadStateStore
+
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "20"))
+# Prefixo do thread_id das conversas criadas pelo lote (o resto é o id do lead no arquivo).
+BATCH_THREAD_PREFIX = os.getenv("BATCH_THREAD_PREFIX", "form-")
+# De quantos em quantos leads o progresso é mostrado.
+BATCH_PROGRESS_EVERY = 100
+
+# Colunas aceitas no arquivo de leads (as demais são ignoradas).
+ID_FIELDS = ("id", "lead_id")
+NAME_FIELDS = ("name", "nome")
+EMAIL_FIELDS = ("email", "e-mail")
+PHONE_FIELDS = ("phone", "telefone")
+MESSAGE_FIELDS = ("message", "mensagem", "interest", "interesse")
+
+DEFAULT_FORM_MESSAGE = "Preenchi o formulário no site e gostaria de mais informações sobre imóveis."
+
+
+def _first(row, names):
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def read_leads(path):
+    """Lê o arquivo de leads linha a linha (CSV com cabeçalho ou JSONL) e gera (número da linha, lead)."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield number, json.loads(line)
+        else:
+            for number, row in enumerate(csv.DictReader(f), 1):
+                yield number, row
+
+
+def lead_key(number, lead):
+    """Identificador estável do lead: a coluna id/lead_id, o e-mail ou, em último caso, a linha no arquivo."""
+    return _first(lead, ID_FIELDS) or _first(lead, EMAIL_FIELDS) or f"linha-{number}"
+
+
+def first_contact_message(lead):
+    """Mensagem do lead no primeiro turno, montada a partir dos campos do formulário."""
+    name, email, phone = _first(lead, NAME_FIELDS), _first(lead, EMAIL_FIELDS), _first(lead, PHONE_FIELDS)
+    contacts = ", ".join(value for value in (email, phone) if value)
+    intro = "Olá!"
+    if name:
+        intro += f" Sou {name}" + (f" ({contacts})." if contacts else ".")
+    elif contacts:
+        intro += f" Meu contato: {contacts}."
+    return f"{intro} {_first(lead, MESSAGE_FIELDS) or DEFAULT_FORM_MESSAGE}"
+
+
+def load_done(output_path):
+    """Leads já processados no arquivo de resultados (os com erro ficam de fora e são refeitos)."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # última linha cortada por uma queda do processo
+            if result.get("status") != "erro":
+                done.add(result["lead_key"])
+    return done
+
+
+async def process_lead(sessions, lead_states, key, lead, thread_prefix=BATCH_THREAD_PREFIX):
+    """
+    Roda o turno de primeiro contato do lead e retorna a linha de resultado.
+    Se a conversa já existe (o processo caiu depois do turno ou no meio dele), não reenvia a mensagem:
+    aproveita a resposta já gravada ou continua o turno do último checkpoint.
+    """
+    thread_id = f"{thread_prefix}{key}"
+    config = sessions.config_for(thread_id)
+    start = time.perf_counter()
+    try:
+        state = await sessions.agent.aget_state(config)
+        messages = state.values.get("messages", [])
+        if not messages:
+            reply = await sessions.run_turn(thread_id, first_contact_message(lead))
+        elif state.interrupts or await sessions.approvals.get(thread_id):
+            reply = None
+        elif state.next:
+            reply = await sessions.continue_turn(thread_id)
+        else:
+            last = messages[-1]
+            reply = message_text(last.content) if isinstance(last, AIMessage) else ""
+        pending = await sessions.approvals.get(thread_id)
+        status = "aguardando_aprovacao" if pending else "respondido"
+        error = None
+    except Exception as e:
+        reply, status, error = None, "erro", f"{type(e).__name__}: {e}"
+
+    record = await lead_states.get(thread_id) if lead_states else None
+    return {
+        "lead_key": key,
+        "thread_id": thread_id,
+        "status": status,
+        "reply": reply,
+        "lead_status": record["status"] if record else None,
+        "error": error,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+async def run_batch(sessions, lead_states, leads, output_path, concurrency=BATCH_CONCURRENCY,
+                    thread_prefix=BATCH_THREAD_PREFIX):
+    """
+    Processa 'leads' (iterável de (número da linha, lead)) com até 'concurrency' turnos simultâneos e
+    grava um resultado por linha em 'output_path', na ordem em que terminam.
+    A leitura fica no máximo 2 x concurrency leads à frente dos turnos em andamento.
+    Retorna um resumo {status: quantidade}.
+    """
+    done = load_done(output_path)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    summary = {"pulados": 0}
+    started_at = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+
+        async def producer():
+            seen = set()
+            for number, lead in leads:
+                key = lead_key(number, lead)
+                if key in done or key in seen:
+                    summary["pulados"] += 1
+                    continue
+                seen.add(key)
+                await queue.put((key, lead))
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def worker():
+            while (item := await queue.get()) is not None:
+                result = await process_lead(sessions, lead_states, *item, thread_prefix=thread_prefix)
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+                summary[result["status"]] = summary.get(result["status"], 0) + 1
+                processed = sum(v for k, v in summary.items() if k != "pulados")
+                if processed % BATCH_PROGRESS_EVERY == 0:
+                    elapsed = time.perf_counter() - started_at
+                    print(f"[lote] {processed} leads em {elapsed:.0f} s ({processed / elapsed:.1f} leads/s)")
+
+        await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+    return summary
+
+
+async def main(path, output_path, concurrency, thread_prefix):
+    async with open_checkpointer() as memory:
+        approvals = ApprovalQueue(memory)
+        await approvals.setup()
+        lead_states = LeadStateStore(memory)
+        await lead_states.setup()
+        agent = build_agent(memory, lead_states=lead_states)
+        sessions = LeadSessions(agent, approvals, max_concurrent_turns=concurrency)
+
+        start = time.perf_counter()
+        summary = await run_batch(sessions, lead_states, read_leads(path), output_path, concurrency, thread_prefix)
+        elapsed = time.perf_counter() - start
+        processed = sum(v for k, v in summary.items() if k != "pulados")
+        print(f"Lote concluído: {processed} leads em {elapsed:.1f} s; {summary}. Resultados em {output_path}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("leads", help="arquivo CSV (com cabeçalho) ou JSONL com os leads")
+    parser.add_argument("--output", default="resultados.jsonl", help="arquivo JSONL de resultados (e de progresso)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--thread-prefix", default=BATCH_THREAD_PREFIX)
+    args = parser.parse_args()
+    asyncio.run(main(args.leads, args.output, args.concurrency, args.thread_prefix))
@@ -0,0 +1,119 @@
+"""
+Benchmark do lote de primeiro contato (batch.py): vazão em leads/s para cada nível de concorrência,
+com o Gemini substituído pelo modelo offline de bench/fakes.py sob um limite de requisições por
+segundo (GEMINI_RPS simulado), e um teste de retomada: o lote é interrompido no meio e rodado de novo,
+conferindo que cada lead foi atendido uma única vez.
+
+Uso:
+    python -m bench.batch_bench --leads 300 --model-latency 0.3 --rps 40
+"""
+import io
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+
+from langchain_core.messages import HumanMessage
+
+import agent as agent_module
+import batch
+from bench.fakes import FakeChatModel, fake_context_cache
+from server import LeadSessions
+from storage.approvals import ApprovalQueue
+from storage.checkpointer import open_checkpointer
+from storage.lead_state import LeadStateStore
+
+
+def _leads(n):
+    for i in range(n):
+        yield i + 1, {
+            "id": f"{i:05d}",
+            "nome": f"Lead {i}",
+            "email": f"lead{i}@example.com",
+            "mensagem": "Procuro um apartamento de 2 quartos no Centro, até R$ 500 mil, para os próximos 3 meses.",
+        }
+
+
+@contextlib.asynccontextmanager
+async def _sessions(db_path, model, concurrency):
+    async with open_checkpointer(db_path, maintenance_interval=0) as saver:
+        approvals = ApprovalQueue(saver)
+        await approvals.setup()
+        lead_states = LeadStateStore(saver)
+        await lead_states.setup()
+        graph = agent_module.build_agent(
+            saver, model=model, cache_factory=fake_context_cache, lead_states=lead_states,
+        )
+        yield LeadSessions(graph, approvals, max_concurrent_turns=concurrency), lead_states
+
+
+def _model(latency, rps):
+    return FakeChatModel(
+        latency=latency, latency_jitter=latency / 2,
+        rate_limiter=agent_module.model_rate_limiter(rps, burst=max(1, rps / 4)),
+    )
+
+
+async def _throughput(tmp, leads, concurrency, latency, rps):
+    db_path = os.path.join(tmp, f"throughput-{concurrency}.sqlite")
+    output = os.path.join(tmp, f"throughput-{concurrency}.jsonl")
+    async with _sessions(db_path, _model(latency, rps), concurrency) as (sessions, lead_states):
+        start = time.perf_counter()
+        summary = await batch.run_batch(sessions, lead_states, _leads(leads), output, concurrency)
+        return time.perf_counter() - start, summary
+
+
+async def _resume(tmp, leads, concurrency, latency, rps):
+    """Interrompe o lote no meio (como uma queda do processo) e roda de novo sobre o mesmo banco e arquivo."""
+    db_path = os.path.join(tmp, "resume.sqlite")
+    output = os.path.join(tmp, "resume.jsonl")
+    async with _sessions(db_path, _model(latency, rps), concurrency) as (sessions, lead_states):
+        task = asyncio.create_task(batch.run_batch(sessions, lead_states, _leads(leads), output, concurrency))
+        while not os.path.exists(output) or sum(1 for _ in open(output)) < leads // 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    written_before = sum(1 for _ in open(output))
+
+    async with _sessions(db_path, _model(latency, rps), concurrency) as (sessions, lead_states):
+        summary = await batch.run_batch(sessions, lead_states, _leads(leads), output, concurrency)
+        results = [json.loads(line) for line in open(output)]
+        keys = [r["lead_key"] for r in results if r["status"] != "erro"]
+        human_turns = []
+        for _, lead in _leads(leads):
+            state = await sessions.agent.aget_state(sessions.config_for(f"{batch.BATCH_THREAD_PREFIX}{lead['id']}"))
+            human_turns.append(sum(isinstance(m, HumanMessage) for m in state.values.get("messages", [])))
+    return written_before, summary, len(keys), len(set(keys)), min(human_turns), max(human_turns)
+
+
+async def main(leads, latency, rps, levels):
+    print(f"leads={leads}  latência do modelo={latency * 1000:.0f} ms  limite do modelo={rps} req/s")
+    print(f"teto teórico: {rps:.0f} leads/s (uma chamada ao modelo por turno de primeiro contato)")
+    print(f"{'concorrência':>12} {'tempo':>8} {'leads/s':>8}")
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        rows = []
+        for concurrency in levels:
+            elapsed, summary = await _throughput(tmp, leads, concurrency, latency, rps)
+            rows.append((concurrency, elapsed, summary))
+        resume = await _resume(tmp, leads, 50, latency, rps)
+    for concurrency, elapsed, summary in rows:
+        print(f"{concurrency:>12} {elapsed:>6.1f} s {leads / elapsed:>8.1f}   {summary}")
+
+    written_before, summary, ok, unique, low, high = resume
+    print()
+    print(f"retomada: {written_before} resultados antes da interrupção; segunda execução {summary}")
+    print(f"  resultados sem erro: {ok} ({unique} leads distintos); mensagens do lead por conversa: {low}..{high}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=300)
+    parser.add_argument("--model-latency", type=float, default=0.3)
+    parser.add_argument("--rps", type=float, default=40)
+    parser.add_argument("--levels", default="1,5,10,25,50,100")
+    args = parser.parse_args()
+    asyncio.run(main(args.leads, args.model_latency, args.rps, [int(c) for c in args.levels.split(",")]))
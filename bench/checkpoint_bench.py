@@ -0,0 +1,108 @@
+"""
+Benchmark do banco de checkpoints: latência de escrita por turno e tamanho do banco
+depois de N conversas simuladas, comparando o AsyncSqliteSaver padrão com o
+checkpointer ajustado de storage/checkpointer.py.
+
+Uso:
+    python -m bench.checkpoint_bench --conversations 10000 --turns 6
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from typing import Annotated
+
+from typing_extensions import TypedDict
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from storage.checkpointer import open_checkpointer, prune_checkpoints, vacuum_checkpoints
+
+
+USER_TURN = "Estou procurando um apartamento de 2 quartos no Centro, até R$ 500 mil, para me mudar em 3 meses."
+AGENT_TURN = (
+    "Perfeito! Para eu filtrar as melhores opções: você pretende usar financiamento? "
+    "Já tem uma carta de crédito pré-aprovada? Temos algumas opções no Centro que se encaixam "
+    "nesse perfil e o próximo passo ideal seria conversar por 15 minutos com nosso especialista."
+)
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def _reply(state):
+    return {"messages": [AIMessage(content=AGENT_TURN)]}
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(State)
+    graph.add_node("model", _reply)
+    graph.add_edge(START, "model")
+    graph.add_edge("model", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def _db_size(path):
+    return sum(
+        os.path.getsize(path + suffix)
+        for suffix in ("", "-wal")
+        if os.path.exists(path + suffix)
+    )
+
+
+async def _run(checkpointer, conversations, turns, concurrency):
+    graph = build_graph(checkpointer)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def conversation(n):
+        config = {"configurable": {"thread_id": f"lead-{n}"}}
+        async with semaphore:
+            for _ in range(turns):
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=USER_TURN)]}, config)
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(n) for n in range(conversations)))
+    return latencies, time.perf_counter() - start
+
+
+def _report(name, latencies, elapsed, size):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    print(
+        f"{name:<10} turnos={len(latencies):>6}  média={statistics.mean(latencies) * 1000:6.2f} ms  "
+        f"p50={p50:6.2f} ms  p95={p95:6.2f} ms  total={elapsed:7.1f} s  banco={size / 1e6:8.1f} MB"
+    )
+
+
+async def main(conversations, turns, concurrency, keep_last):
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_path = os.path.join(tmp, "baseline.sqlite")
+        async with AsyncSqliteSaver.from_conn_string(baseline_path) as saver:
+            latencies, elapsed = await _run(saver, conversations, turns, concurrency)
+        _report("padrão", latencies, elapsed, _db_size(baseline_path))
+
+        tuned_path = os.path.join(tmp, "tuned.sqlite")
+        async with open_checkpointer(tuned_path, keep_last=keep_last, maintenance_interval=0) as saver:
+            latencies, elapsed = await _run(saver, conversations, turns, concurrency)
+            await prune_checkpoints(saver, keep_last)
+            await vacuum_checkpoints(saver)
+        _report("ajustado", latencies, elapsed, _db_size(tuned_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--keep-last", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.conversations, args.turns, args.concurrency, args.keep_last))
@@ -0,0 +1,71 @@
+"""
+Benchmark da janela de contexto: tokens de prompt enviados ao modelo em cada turno de uma
+conversa longa, com e sem o ContextWindowMiddleware.
+
+Uso:
+    python -m bench.context_bench --turns 50
+"""
+import asyncio
+import argparse
+
+from langchain.agents import create_agent
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent import SYSTEM_PROMPT
+from bench.fakes import FakeChatModel
+from middleware.context_window import ContextWindowMiddleware
+
+
+LEAD_TURN = (
+    "Sou a Maria Silva, maria@example.com. Procuro um apartamento de 2 quartos no Centro, "
+    "até R$ 500 mil, com financiamento, para me mudar em uns 3 meses. Quais horários vocês têm?"
+)
+
+
+@tool
+def find_available_slots(start_date: str, end_date: str) -> str:
+    """Horários livres entre 'start_date' e 'end_date'."""
+    return "\n".join(f"- {day:02d}/11/2026 {hour:02d}:00" for day in range(3, 8) for hour in (9, 11, 14, 16))
+
+
+async def _run(turns, with_window):
+    model = FakeChatModel(
+        tool_name="find_available_slots",
+        tool_args={"start_date": "2026-11-03", "end_date": "2026-11-07"},
+    )
+    middleware = [ContextWindowMiddleware(model)] if with_window else []
+    agent = create_agent(
+        model=model,
+        tools=[find_available_slots],
+        system_prompt=SYSTEM_PROMPT,
+        checkpointer=InMemorySaver(),
+        middleware=middleware,
+    )
+    config = {"configurable": {"thread_id": "lead-1"}}
+
+    per_turn = []
+    for _ in range(turns):
+        start = len(model.calls)
+        await agent.ainvoke({"messages": [HumanMessage(content=LEAD_TURN)]}, config)
+        per_turn.append(max(tokens for kind, tokens, _ in model.calls[start:] if kind == "agente"))
+    summaries = sum(kind == "resumo" for kind, _, _ in model.calls)
+    return per_turn, summaries
+
+
+async def main(turns):
+    baseline, _ = await _run(turns, with_window=False)
+    windowed, summaries = await _run(turns, with_window=True)
+
+    print(f"{'turno':>5}  {'sem janela':>10}  {'com janela':>10}")
+    for turn in sorted({1, 5, *range(10, turns + 1, 10), turns}):
+        print(f"{turn:>5}  {baseline[turn - 1]:>10}  {windowed[turn - 1]:>10}")
+    print(f"máximo com janela: {max(windowed)} tokens; resumos gerados: {summaries}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns))
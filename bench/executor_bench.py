@@ -0,0 +1,75 @@
+"""
+Benchmark do executor do Google Calendar (API/calendar_client.py: _executor e get_service por thread).
+
+N sessões no mesmo event loop fazem uma leitura da agenda ao mesmo tempo (um events.list cada, na
+agenda de um corretor diferente), com o Google Calendar em memória de bench/fakes.py:
+- bloqueante (antes): a chamada síncrona roda direto no event loop, uma sessão de cada vez;
+- executor (padrão): run_in_calendar_executor, até CALENDAR_MAX_WORKERS chamadas em paralelo, cada
+  thread do executor com o seu 'service' (get_service).
+O limitador de taxa fica desligado por padrão, para medir só o executor; --calendar-qps o liga
+(ex.: 10, a cota real da API).
+
+Uso:
+    python -m bench.executor_bench --sessions 1 10 100 --api-latency 0.1
+"""
+import time
+import asyncio
+import argparse
+import threading
+
+from API import calendar_client, google_auth
+from API.calendar_client import CALENDAR_MAX_WORKERS, execute, get_service, run_in_calendar_executor
+from bench.fakes import FakeCalendarService
+
+
+def list_events(calendar_id):
+    """A leitura que list_upcoming_events fazia a cada chamada; retorna o nome da thread que a executou."""
+    service = get_service()
+    execute(service.events().list(calendarId=calendar_id, maxResults=10, singleEvents=True, orderBy="startTime"))
+    return threading.current_thread().name
+
+
+async def blocking(sessions):
+    async def session(n):
+        return list_events(f"corretor{n}@example.com")
+
+    return await asyncio.gather(*(session(n) for n in range(sessions)))
+
+
+async def on_executor(sessions):
+    return await asyncio.gather(*(
+        run_in_calendar_executor(list_events, f"corretor{n}@example.com") for n in range(sessions)
+    ))
+
+
+async def _timed(run, sessions):
+    start = time.perf_counter()
+    threads = await run(sessions)
+    return time.perf_counter() - start, len(set(threads))
+
+
+async def main(session_counts, latency, calendar_qps):
+    google_auth.service = FakeCalendarService(latency=latency)
+    qps = calendar_qps or 1e9
+    calendar_client.rate_limiter = calendar_client.TokenBucket(qps, qps)
+    # Aquecimento: cria as threads do executor (e o 'service' de cada uma) fora da medição.
+    await on_executor(CALENDAR_MAX_WORKERS)
+
+    limit = f"{calendar_qps:g} req/s" if calendar_qps else "desligado"
+    print(f"API {latency * 1000:.0f} ms por requisição, CALENDAR_MAX_WORKERS={CALENDAR_MAX_WORKERS}, "
+          f"limitador de taxa {limit}")
+    print(f"{'sessões':>8} {'bloqueante (antes)':>22} {'executor':>22} {'threads':>8}")
+    for sessions in session_counts:
+        old, _ = await _timed(blocking, sessions)
+        new, threads = await _timed(on_executor, sessions)
+        print(f"{sessions:>8} {old:>7.2f} s ({sessions / old:>6.1f}/s) {new:>8.2f} s ({sessions / new:>6.1f}/s) "
+              f"{threads:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--api-latency", type=float, default=0.1, help="segundos por requisição à API")
+    parser.add_argument("--calendar-qps", type=float, default=None, help="liga o limitador de taxa com essa cota")
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.api_latency, args.calendar_qps))
@@ -0,0 +1,375 @@
+"""
+Stand-ins offline para os benchmarks: um modelo de chat roteirizado que não acessa a rede
+e registra quantos tokens de prompt recebeu em cada chamada ('calls': lista de
+(tipo, tokens enviados, tokens lidos do cache de contexto)), eventos no formato da API do Google Calendar
+e um Google Calendar em memória para substituir API.google_auth.service.
+"""
+import time
+import random
+import asyncio
+import itertools
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+AGENT_REPLY = (
+    "Perfeito! Para eu filtrar as melhores opções: você pretende usar financiamento? "
+    "Já tem uma carta de crédito pré-aprovada? Temos algumas opções que se encaixam "
+    "nesse perfil e o próximo passo ideal seria conversar por 15 minutos com nosso especialista."
+)
+SUMMARY_REPLY = (
+    "Cliente Maria Silva (maria@example.com) busca apartamento de 2 quartos no Centro, até R$ 500 mil, "
+    "com financiamento, para se mudar em 3 meses; decide sozinha. Lead qualificado; aguardando "
+    "escolha de horário com o corretor."
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Modelo de chat determinístico.
+    A cada 'tool_every' mensagens do cliente, responde primeiro com uma chamada a 'tool_name'
+    (argumentos 'tool_args') e, depois do resultado da ferramenta, com o texto final.
+    'script' roteiriza conversas inteiras: lista de (gatilho, passos); quando a última mensagem do
+    cliente contém o gatilho, o modelo chama as ferramentas dos passos, uma por resposta e em ordem.
+    Cada passo é (ferramenta, argumentos), com os argumentos em dict ou em uma função que recebe as
+    mensagens do prompt (para usar resultados de ferramentas anteriores) e devolve o dict; um passo
+    que é uma lista de pares vira uma resposta com várias chamadas de ferramenta, na ordem da lista.
+    Prompts de resumo (mensagem única em texto) recebem 'summary_reply'.
+    'latency' simula o tempo de resposta do provedor, em segundos, mais até 'latency_jitter' aleatórios.
+    'cached_tokens' é o tamanho do prefixo em cache (ver fake_context_cache).
+    'stream_chunk' > 0 entrega o texto em trechos desse número de caracteres quando a chamada é
+    transmitida (stream), com 'stream_delay' segundos entre trechos.
+    """
+
+    reply: str = AGENT_REPLY
+    summary_reply: str = SUMMARY_REPLY
+    tool_name: str | None = None
+    tool_args: dict = {}
+    tool_every: int = 3
+    script: list = []
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    cached_tokens: int = 0
+    stream_chunk: int = 0
+    stream_delay: float = 0.0
+    calls: list = []
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _delay(self):
+        return self.latency + random.uniform(0, self.latency_jitter)
+
+    def _scripted_calls(self, messages):
+        """Próximas chamadas de ferramenta do roteiro para a última mensagem do cliente, ou None."""
+        lead_at = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=None)
+        if lead_at is None:
+            return None
+        lead_text = messages[lead_at].text
+        step = sum(isinstance(m, AIMessage) and bool(m.tool_calls) for m in messages[lead_at + 1:])
+        for trigger, steps in self.script:
+            if trigger in lead_text:
+                if step >= len(steps):
+                    return None
+                calls = steps[step] if isinstance(steps[step], list) else [steps[step]]
+                return [
+                    {
+                        "name": name,
+                        "args": args(messages) if callable(args) else dict(args),
+                        "id": f"call_{next(_call_ids)}",
+                    }
+                    for name, args in calls
+                ]
+        return None
+
+    def _respond(self, messages):
+        message = self._reply_to(messages)
+        # Uso de tokens no formato do Gemini, para as métricas de telemetry/tracing.py.
+        kind, tokens, cached = self.calls[-1]
+        output = count_tokens_approximately([message])
+        message.usage_metadata = {
+            "input_tokens": tokens + cached,
+            "output_tokens": output,
+            "total_tokens": tokens + cached + output,
+            "input_token_details": {"cache_read": cached},
+        }
+        return message
+
+    def _reply_to(self, messages):
+        tokens = count_tokens_approximately(messages)
+        last = messages[-1]
+        if len(messages) == 1 and isinstance(last, HumanMessage) and last.text.startswith("Você mantém o resumo"):
+            self.calls.append(("resumo", tokens, 0))
+            return AIMessage(content=self.summary_reply)
+        self.calls.append(("agente", tokens, self.cached_tokens))
+
+        if self.script:
+            tool_calls = self._scripted_calls(messages)
+            if tool_calls:
+                return AIMessage(content="", tool_calls=tool_calls)
+        if self.tool_name and isinstance(last, HumanMessage):
+            human_turns = sum(isinstance(m, HumanMessage) for m in messages)
+            if human_turns % self.tool_every == 0:
+                return AIMessage(
+                    content="",
+                    tool_calls=[{
+                        "name": self.tool_name,
+                        "args": dict(self.tool_args),
+                        "id": f"call_{next(_call_ids)}",
+                    }],
+                )
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=f"Encontrei isto: {last.text[:80]}. {self.reply}")
+        return AIMessage(content=self.reply)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency or self.latency_jitter:
+            time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency or self.latency_jitter:
+            await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if not self.stream_chunk:
+            result = await self._agenerate(messages, stop, run_manager, **kwargs)
+            message = result.generations[0].message
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=message.content, tool_calls=message.tool_calls, usage_metadata=message.usage_metadata,
+            ))
+            return
+        if self.latency or self.latency_jitter:
+            await asyncio.sleep(self._delay())
+        message = self._respond(messages)
+        text = message.text
+        for i in range(0, len(text), self.stream_chunk):
+            if i and self.stream_delay:
+                await asyncio.sleep(self.stream_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text[i:i + self.stream_chunk]))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", tool_calls=message.tool_calls, usage_metadata=message.usage_metadata,
+        ))
+
+
+_call_ids = itertools.count()
+
+
+def fake_context_cache(model, system_message, tools, ttl):
+    """
+    Substituto local de middleware.prompt_cache.gemini_context_cache: em vez de registrar o cache
+    no Gemini, devolve uma cópia do FakeChatModel que contabiliza o prompt de sistema como lido do cache.
+    """
+    if not isinstance(model, FakeChatModel):
+        return None
+    cached = count_tokens_approximately([system_message]) if system_message else 0
+    return model.model_copy(update={"cached_tokens": cached})
+
+
+def google_event(n, start, duration_minutes=60, calendar_id="primary"):
+    """Evento no formato completo devolvido pela API do Google Calendar (events.get/list)."""
+    end = start + timedelta(minutes=duration_minutes)
+    event_id = f"{n:04d}k7f3q9m2r8s1t6u4v0w5x3y"
+    return {
+        "kind": "calendar#event",
+        "etag": f"\"33{n:012d}\"",
+        "id": event_id,
+        "status": "confirmed",
+        "htmlLink": f"https://www.google.com/calendar/event?eid={event_id}Y2FsZW5kYXJAZXhhbXBsZS5jb20",
+        "created": "2026-10-01T12:00:00.000Z",
+        "updated": "2026-10-02T09:30:00.000Z",
+        "summary": f"Lead {n} - Ap 2 quartos Centro",
+        "description": (
+            f"**Nome do Cliente:** Lead {n}\n**O que procura:** Apartamento de 2 quartos no Centro, "
+            f"até R$ 500 mil, com financiamento\n**E-mail:** lead{n}@example.com\n"
+            "**Informações Adicionais:** Prefere imóveis com vaga de garagem."
+        ),
+        "location": "Av. Paulista, 1000 - Bela Vista, São Paulo - SP",
+        "creator": {"email": calendar_id if "@" in calendar_id else "corretor@example.com", "self": True},
+        "organizer": {"email": calendar_id if "@" in calendar_id else "corretor@example.com", "self": True},
+        "start": {"dateTime": start.isoformat(), "timeZone": "America/Sao_Paulo"},
+        "end": {"dateTime": end.isoformat(), "timeZone": "America/Sao_Paulo"},
+        "iCalUID": f"{event_id}@google.com",
+        "sequence": 0,
+        "attendees": [{"email": f"lead{n}@example.com", "responseStatus": "needsAction"}],
+        "reminders": {"useDefault": True},
+        "eventType": "default",
+    }
+
+
+def _http_error(status, reason):
+    return HttpError(httplib2.Response({"status": status}), f'{{"error": {{"message": "{reason}"}}}}'.encode())
+
+
+class FakeRequest:
+    """Requisição no formato do googleapiclient (method, uri, execute()) respondida em memória."""
+
+    def __init__(self, service, method, uri, action):
+        self.service = service
+        self.method = method
+        self.uri = uri
+        self.methodId = "calendar." + uri.split("?")[0]
+        self._action = action
+
+    def run(self):
+        with self.service.lock:
+            self.service.requests[self.uri.split("?")[0]] += 1
+            return self._action()
+
+    def execute(self):
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        return self.run()
+
+
+class FakeBatch:
+    """Requisição em lote: uma única ida à "rede" para todas as chamadas adicionadas."""
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self._items = []
+
+    def add(self, request, request_id=None):
+        self._items.append((request_id, request))
+
+    def execute(self):
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        for request_id, request in self._items:
+            try:
+                self.callback(request_id, request.run(), None)
+            except HttpError as error:
+                self.callback(request_id, None, error)
+
+
+class _Events:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, calendarId, pageToken=None, syncToken=None, maxResults=250, **params):
+        uri = f"events.list?calendarId={calendarId}&pageToken={pageToken}&syncToken={syncToken}"
+        return FakeRequest(
+            self.service, "GET", uri,
+            lambda: self.service._list(calendarId, pageToken, syncToken, maxResults),
+        )
+
+    def insert(self, calendarId, body):
+        return FakeRequest(self.service, "POST", "events.insert", lambda: self.service._insert(calendarId, body))
+
+    def patch(self, calendarId, eventId, body):
+        return FakeRequest(self.service, "PATCH", "events.patch", lambda: self.service._patch(calendarId, eventId, body))
+
+    def delete(self, calendarId, eventId):
+        return FakeRequest(self.service, "DELETE", "events.delete", lambda: self.service._delete(calendarId, eventId))
+
+
+class _FreeBusy:
+    def __init__(self, service):
+        self.service = service
+
+    def query(self, body):
+        return FakeRequest(self.service, "POST", "freebusy.query", lambda: self.service._freebusy(body))
+
+
+class FakeCalendarService:
+    """
+    Google Calendar em memória, com a mesma interface usada pelo projeto: events().list/insert/patch/delete
+    (com paginação e syncToken), freebusy().query e new_batch_http_request. Atribua a
+    API.google_auth.service para usar. 'latency' simula o tempo de cada ida à API, em segundos;
+    'requests' conta as chamadas por método e 'calendars' guarda os eventos de cada agenda.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.calendars = {}
+        # Histórico de alterações por agenda; o syncToken é a posição nesse histórico.
+        self._changes = {}
+        self._ids = itertools.count()
+
+    def events(self):
+        return _Events(self)
+
+    def freebusy(self):
+        return _FreeBusy(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def _record(self, calendar_id, event):
+        self._changes.setdefault(calendar_id, []).append(event)
+        if event.get("status") == "cancelled":
+            self.calendars.get(calendar_id, {}).pop(event["id"], None)
+        else:
+            self.calendars.setdefault(calendar_id, {})[event["id"]] = event
+        return event
+
+    def _list(self, calendar_id, page_token, sync_token, max_results):
+        changes = self._changes.get(calendar_id, [])
+        if sync_token is None:
+            items = list(self.calendars.get(calendar_id, {}).values())
+        else:
+            latest = {event["id"]: event for event in changes[int(sync_token):]}
+            items = list(latest.values())
+        offset = int(page_token or 0)
+        result = {"items": [dict(e) for e in items[offset:offset + max_results]]}
+        if offset + max_results < len(items):
+            result["nextPageToken"] = str(offset + max_results)
+        else:
+            result["nextSyncToken"] = str(len(changes))
+        return result
+
+    def _insert(self, calendar_id, body):
+        event_id = f"evt{next(self._ids):06d}"
+        event = {
+            **body,
+            "id": event_id,
+            "status": "confirmed",
+            "htmlLink": f"https://www.google.com/calendar/event?eid={event_id}",
+        }
+        return dict(self._record(calendar_id, event))
+
+    def _patch(self, calendar_id, event_id, body):
+        event = self.calendars.get(calendar_id, {}).get(event_id)
+        if event is None:
+            raise _http_error(404, "Not Found")
+        return dict(self._record(calendar_id, {**event, **body}))
+
+    def _delete(self, calendar_id, event_id):
+        if event_id not in self.calendars.get(calendar_id, {}):
+            raise _http_error(410, "Resource has been deleted")
+        self._record(calendar_id, {"id": event_id, "status": "cancelled"})
+        return ""
+
+    def _freebusy(self, body):
+        time_min = datetime.fromisoformat(body["timeMin"]).timestamp()
+        time_max = datetime.fromisoformat(body["timeMax"]).timestamp()
+        calendars = {}
+        for item in body["items"]:
+            busy = []
+            for event in self.calendars.get(item["id"], {}).values():
+                start = datetime.fromisoformat(event["start"]["dateTime"])
+                end = datetime.fromisoformat(event["end"]["dateTime"])
+                if start.timestamp() < time_max and end.timestamp() > time_min:
+                    busy.append({"start": start.isoformat(), "end": end.isoformat()})
+            calendars[item["id"]] = {"busy": sorted(busy, key=lambda b: b["start"])}
+        return {"calendars": calendars}
@@ -0,0 +1,153 @@
+"""
+Benchmark do estoque de imóveis (API/inventory.py): gera um estoque sintético, mede o tempo de carga
+(CSV e SQLite), a latência de 'search_properties' com filtros vetorizados contra um filtro em Python puro
+linha a linha, e quanto tempo uma alteração no arquivo leva para aparecer nas buscas (hot reload).
+
+Uso:
+    python -m bench.inventory_bench --listings 100000 --repeat 200
+"""
+import os
+import csv
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+
+from API import inventory as inventory_module
+from API.inventory import COLUMNS, PropertyIndex, PropertyInventory, read_columns
+from tools.property_tools import search_properties
+
+
+NEIGHBORHOODS = (
+    "Centro", "Jardins", "Moema", "Pinheiros", "Vila Mariana", "Perdizes", "Tatuapé", "Santana",
+    "Butantã", "Lapa", "Ipiranga", "Mooca", "Itaim Bibi", "Brooklin", "Campo Belo", "Saúde",
+)
+
+QUERIES = (
+    ("bairro + venda + teto + quartos", {
+        "neighborhood": "Centro", "transaction": "venda", "max_price": 500000, "min_bedrooms": 2,
+    }),
+    ("dois bairros + faixa + pet", {
+        "neighborhood": "Pinheiros, Vila Mariana", "transaction": "aluguel",
+        "min_price": 2500, "max_price": 4500, "pet_friendly": True,
+    }),
+    ("só teto (muitos resultados)", {"max_price": 900000}),
+    ("sem filtros", {}),
+)
+
+
+def _listing(i, rng):
+    transaction = "aluguel" if rng.random() < 0.4 else "venda"
+    bedrooms = rng.choice((1, 1, 2, 2, 2, 3, 3, 4))
+    area = bedrooms * rng.uniform(22, 40)
+    price = area * (rng.uniform(30, 70) if transaction == "aluguel" else rng.uniform(6000, 14000))
+    neighborhood = rng.choice(NEIGHBORHOODS)
+    return {
+        "id": f"IMV-{i:06d}",
+        "title": f"{'Apartamento' if rng.random() < 0.7 else 'Casa'} {bedrooms} quartos {neighborhood}",
+        "neighborhood": neighborhood,
+        "transaction": transaction,
+        "price": round(price, -2),
+        "bedrooms": bedrooms,
+        "area_m2": round(area),
+        "pet_friendly": int(rng.random() < 0.5),
+    }
+
+
+def write_inventory(path, listings, seed=0):
+    rng = random.Random(seed)
+    rows = [_listing(i, rng) for i in range(listings)]
+    if path.endswith(".sqlite"):
+        conn = sqlite3.connect(path)
+        conn.execute(f"CREATE TABLE properties ({', '.join(f'[{name}]' for name in COLUMNS)})")
+        conn.executemany(
+            f"INSERT INTO properties VALUES ({', '.join('?' for _ in COLUMNS)})",
+            [tuple(row[name] for name in COLUMNS) for row in rows],
+        )
+        conn.commit()
+        conn.close()
+    else:
+        # Grava ao lado e troca com os.replace, como recomendado em PropertyInventory.
+        with open(path + ".tmp", "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(path + ".tmp", path)
+    return rows
+
+
+def python_search(rows, neighborhood=None, transaction=None, min_price=None, max_price=None,
+                  min_bedrooms=None, pet_friendly=None, max_results=5):
+    """O mesmo filtro e ordenação sem numpy: percorre a lista de dicts linha a linha."""
+    names = {n.strip().lower() for n in neighborhood.split(",")} if neighborhood else None
+    found = [
+        row for row in rows
+        if (names is None or row["neighborhood"].lower() in names)
+        and (transaction is None or row["transaction"] == transaction)
+        and (min_price is None or row["price"] >= min_price)
+        and (max_price is None or row["price"] <= max_price)
+        and (min_bedrooms is None or row["bedrooms"] >= min_bedrooms)
+        and (not pet_friendly or row["pet_friendly"])
+    ]
+    target = max_price if min_price is None else (min_price + (max_price or min_price)) / 2
+    key = (lambda row: abs(row["price"] - target)) if target else (lambda row: row["price"])
+    return sorted(found, key=key)[:max_results]
+
+
+def _timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def main(listings, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"estoque sintético: {listings} imóveis")
+        for extension in ("csv", "sqlite"):
+            path = os.path.join(tmp, f"properties.{extension}")
+            write_inventory(path, listings)
+            start = time.perf_counter()
+            index = PropertyIndex(read_columns(path))
+            print(f"  carga do {extension:<7} {time.perf_counter() - start:6.2f} s  ({len(index)} imóveis)")
+
+        path = os.path.join(tmp, "properties.csv")
+        rows = write_inventory(path, listings)
+        inventory = PropertyInventory(path, reload_interval=0.5)
+        inventory_module._inventory = inventory
+        inventory.get()
+
+        print()
+        print(f"{'busca':<34} {'numpy p50':>10} {'p99':>8} {'python p50':>11} {'tool p50':>9}")
+        for name, query in QUERIES:
+            numpy_p50, numpy_p99 = _timed(lambda: search_properties.func(**query), repeat)
+            python_p50, _ = _timed(lambda: python_search(rows, **query), max(repeat // 20, 3))
+            tool_p50, _ = _timed(lambda: search_properties.invoke(query), repeat)
+            print(f"{name:<34} {numpy_p50:>7.2f} ms {numpy_p99:>5.2f} ms {python_p50:>8.1f} ms {tool_p50:>6.2f} ms")
+
+        print()
+        print(search_properties.invoke(QUERIES[0][1]))
+
+        # Hot reload: o arquivo muda e a próxima conferência (a cada reload_interval) troca o índice.
+        time.sleep(0.01)
+        write_inventory(path, listings + 1000, seed=1)
+        changed_at = time.perf_counter()
+        stale = 0
+        while len(inventory.get()) != listings + 1000:
+            stale += 1
+            time.sleep(0.005)
+        print()
+        print(f"hot reload: novo arquivo visível nas buscas em {time.perf_counter() - changed_at:.2f} s "
+              f"(intervalo de conferência {inventory.reload_interval} s; {stale} buscas ainda no índice anterior)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--listings", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    main(args.listings, args.repeat)
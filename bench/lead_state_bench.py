@@ -0,0 +1,117 @@
+"""
+Benchmark da ficha de qualificação (storage/lead_state.py e middleware/lead_state.py): custo da
+atualização incremental por turno (só as mensagens novas) contra reprocessar o histórico inteiro,
+latência das consultas indexadas com N fichas no banco e vazão da exportação em lote.
+
+Uso:
+    python -m bench.lead_state_bench --leads 100000
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from middleware.lead_state import extract_from_text, update_record
+from storage.checkpointer import open_checkpointer
+from storage.lead_state import LeadStateStore
+
+
+LEAD_MESSAGES = (
+    "Oi, sou a Maria. Procuro um apartamento de 2 quartos no Centro, até R$ 500 mil.",
+    "Vou usar financiamento e já tenho carta de crédito.",
+    "Quero me mudar em uns 3 meses. Minha esposa decide comigo.",
+    "Temos um cachorro, precisa aceitar pets.",
+    "Pode ser na terça às 10h?",
+)
+
+
+def _history(turns):
+    messages = []
+    for turn in range(turns):
+        messages.append(HumanMessage(content=LEAD_MESSAGES[turn % len(LEAD_MESSAGES)], id=f"h{turn}"))
+        messages.append(AIMessage(content="Perfeito! Me conta mais um pouco sobre o que você procura?", id=f"a{turn}"))
+    return messages
+
+
+def _timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _synthetic(n, rng):
+    status = rng.choices(("em_qualificacao", "curioso", "qualificado", "agendado"), (5, 3, 2, 1))[0]
+    return {
+        "thread_id": f"lead-{n:07d}",
+        "status": status,
+        "budget_max": rng.choice((None, 300000, 500000, 800000, 3500)),
+        "financing": rng.choice((None, "financiamento", "carta_de_credito")),
+        "transaction": rng.choice(("venda", "aluguel")),
+        "bedrooms": rng.choice((None, 1, 2, 3)),
+        "neighborhoods": rng.sample(("Centro", "Jardins", "Moema", "Pinheiros"), rng.randint(0, 2)),
+        "timeline_months": rng.choice((None, 0.5, 1, 3, 6, 12)),
+        "turns": rng.randint(1, 30),
+    }
+
+
+async def main(leads):
+    print("atualização da ficha por turno (µs):")
+    print(f"{'mensagens no histórico':<24} {'incremental':>12} {'histórico inteiro':>18}")
+    for turns in (5, 20, 60):
+        messages = _history(turns)
+        previous = update_record({}, messages[:-2])
+        incremental = _timed(lambda: update_record(previous, messages), 2000)
+        # Sem a ficha, cada turno teria de reler todas as mensagens do lead.
+        full = _timed(lambda: [extract_from_text(m.text) for m in messages if isinstance(m, HumanMessage)], 200)
+        print(f"{len(messages):<24} {incremental:>12.1f} {full:>18.1f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        async with open_checkpointer(os.path.join(tmp, "db.sqlite"), maintenance_interval=0) as saver:
+            store = LeadStateStore(saver)
+            await store.setup()
+            rng = random.Random(0)
+            start = time.perf_counter()
+            for n in range(leads):
+                record = _synthetic(n, rng)
+                await store.put(record)
+            print()
+            print(f"{leads} fichas gravadas em {time.perf_counter() - start:.1f} s")
+
+            print(f"{'consulta':<46} {'ms':>7} {'linhas':>7}")
+            for name, filters in (
+                ("qualificados com prazo <= 3 meses", {"status": "qualificado", "max_timeline_months": 3}),
+                ("qualificados com orçamento >= 500 mil", {"status": "qualificado", "min_budget": 500000}),
+                ("curiosos", {"status": "curioso"}),
+            ):
+                start = time.perf_counter()
+                rows = await store.query(limit=100, **filters)
+                print(f"{name:<46} {(time.perf_counter() - start) * 1000:>7.2f} {len(rows):>7}")
+            start = time.perf_counter()
+            counts = await store.counts()
+            print(f"{'contagem por status':<46} {(time.perf_counter() - start) * 1000:>7.2f} {sum(counts.values()):>7}")
+
+            async with saver.conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM lead_state WHERE status = ? AND timeline_months <= ? "
+                "ORDER BY timeline_months LIMIT 100",
+                ("qualificado", 3),
+            ) as cursor:
+                print("plano:", " / ".join(row[-1] for row in await cursor.fetchall()))
+
+            start = time.perf_counter()
+            exported = 0
+            async for _ in store.export():
+                exported += 1
+            elapsed = time.perf_counter() - start
+            print(f"exportação: {exported} fichas em {elapsed:.2f} s ({exported / elapsed:,.0f} fichas/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.leads))
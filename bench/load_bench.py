@@ -0,0 +1,247 @@
+"""
+Teste de carga offline: N conversas de leads roteirizadas e simultâneas passando pelo grafo real
+(agent.build_agent com os middlewares, LeadSessions, fila de aprovações e checkpointer SQLite), com o
+Gemini e o Google Calendar substituídos pelos stand-ins de bench/fakes.py.
+Mede a latência por turno (p50/p95/p99), turnos por segundo, chamadas de ferramenta por agendamento
+e o crescimento do banco de checkpoints.
+
+Cada lead se apresenta, pede horários (find_available_slots), escolhe uma opção (assign_broker e
+create_calendar_event) e um operador aprova o agendamento (resume_turn).
+
+Uso:
+    python -m bench.load_bench --leads 200 --concurrency 50 --model-latency 0.3 --calendar-latency 0.05
+    TRACE_PATH=trace.jsonl python -m bench.load_bench   # grava também o trace de cada turno
+"""
+import io
+import os
+import re
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+from datetime import date, timedelta
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import agent as agent_module
+from API import google_auth, brokers, calendar_client
+from bench.fakes import FakeChatModel, FakeCalendarService, fake_context_cache
+from server import LeadSessions
+from storage.approvals import ApprovalQueue
+from storage.checkpointer import open_checkpointer
+from storage.lead_state import LeadStateStore
+from telemetry import metrics
+
+
+LEAD_TURNS = (
+    "Oi, sou {name} ({email}). Procuro um apartamento de 2 quartos no Centro, até R$ 500 mil.",
+    "Vou usar financiamento e já tenho carta de crédito. Quero me mudar em uns 3 meses. "
+    "Quais horários vocês têm a partir de {start_date}?",
+    "Pode ser a opção {option}.",
+)
+SLOT_OPTIONS = 10
+# Opções escolhidas pelos leads entre as SLOT_OPTIONS oferecidas (a cada 30 minutos): 08:00, 09:30,
+# 11:00 e 12:30, que cabem na mesma agenda com o intervalo de 15 minutos.
+CHOSEN_OPTIONS = (1, 4, 7, 10)
+
+
+def _rows(messages, tool_name):
+    """Linhas da tabela devolvida pela última chamada de 'tool_name' (ver tools/output_format.py)."""
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage) and message.name == tool_name:
+            lines = message.text.splitlines()[1:]
+            return [line.split("|") for line in lines if not line.startswith("[")]
+    return []
+
+
+def _lead_text(messages):
+    return next(m.text for m in reversed(messages) if isinstance(m, HumanMessage))
+
+
+def _iso(local_time):
+    """'2026-10-26 08:00' -> '2026-10-26T08:00:00'."""
+    return local_time.replace(" ", "T") + ":00"
+
+
+def _slot_query(messages):
+    start_date = date.fromisoformat(re.search(r"a partir de (\d{4}-\d{2}-\d{2})", _lead_text(messages)).group(1))
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": (start_date + timedelta(days=4)).isoformat(),
+        "max_slots": SLOT_OPTIONS,
+    }
+
+
+def _chosen_slot(messages):
+    option = int(re.search(r"opção (\d+)", _lead_text(messages)).group(1))
+    slots = _rows(messages, "find_available_slots")
+    if not slots:
+        return {"start_time": ""}
+    return {"start_time": _iso(slots[(option - 1) % len(slots)][0]), "region": "Centro"}
+
+
+def _booking(messages):
+    name, email = re.search(r"sou (.+?) \((.+?)\)", next(
+        m.text for m in messages if isinstance(m, HumanMessage) and m.text.startswith("Oi, sou")
+    )).groups()
+    broker = (_rows(messages, "assign_broker") or [["", "", "", ""]])[0]
+    return {
+        "summary": f"{name} - Apartamento 2 quartos Centro",
+        "start_time": _iso(broker[2]) if broker[2] else "",
+        "broker_id": broker[0],
+        "attendees": [email],
+        "description": (
+            f"**Nome do Cliente:** {name}\n**O que procura:** Apartamento de 2 quartos no Centro, "
+            f"até R$ 500 mil, com financiamento\n**E-mail:** {email}"
+        ),
+    }
+
+
+MODEL_SCRIPT = [
+    ("Quais horários", [("find_available_slots", _slot_query)]),
+    ("Pode ser a opção", [("assign_broker", _chosen_slot), ("create_calendar_event", _booking)]),
+]
+
+
+def _business_day(offset):
+    """Dia útil número 'offset' a partir da próxima segunda-feira."""
+    day = date.today() + timedelta(days=7 - date.today().weekday())
+    weeks, days = divmod(offset, 5)
+    return day + timedelta(weeks=weeks, days=days)
+
+
+def _lead_turns(n, broker_count):
+    """Mensagens do lead 'n'. Cada dia comporta len(CHOSEN_OPTIONS) x corretores agendamentos."""
+    per_day = len(CHOSEN_OPTIONS) * broker_count
+    values = {
+        "name": f"Lead {n}",
+        "email": f"lead{n}@example.com",
+        "start_date": _business_day(n // per_day).isoformat(),
+        "option": CHOSEN_OPTIONS[n % len(CHOSEN_OPTIONS)],
+    }
+    return [turn.format(**values) for turn in LEAD_TURNS]
+
+
+def _db_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _overlapping(service):
+    """Pares de eventos sobrepostos na mesma agenda (agendamentos duplicados)."""
+    overlaps = 0
+    for events in service.calendars.values():
+        spans = sorted((e["start"]["dateTime"], e["end"]["dateTime"]) for e in events.values())
+        overlaps += sum(1 for a, b in zip(spans, spans[1:]) if b[0] < a[1])
+    return overlaps
+
+
+async def main(leads, concurrency, broker_count, model_latency, calendar_latency, calendar_qps):
+    service = FakeCalendarService(latency=calendar_latency)
+    google_auth.service = service
+    brokers._brokers = [
+        brokers.Broker(
+            id=f"corretor-{i}",
+            name=f"Corretor {i}",
+            calendar_id=f"corretor{i}@imobiliaria.example",
+            regions=["Centro"] if i % 2 == 0 else ["Zona Sul"],
+        )
+        for i in range(broker_count)
+    ]
+    if calendar_qps:
+        calendar_client.rate_limiter = calendar_client.TokenBucket(calendar_qps, calendar_qps)
+
+    model = FakeChatModel(script=MODEL_SCRIPT, latency=model_latency, latency_jitter=model_latency / 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "checkpoints.sqlite")
+        async with open_checkpointer(db_path, maintenance_interval=0) as saver:
+            approvals = ApprovalQueue(saver)
+            await approvals.setup()
+            lead_states = LeadStateStore(saver)
+            await lead_states.setup()
+            agent = agent_module.build_agent(
+                saver, model=model, cache_factory=fake_context_cache, lead_states=lead_states,
+            )
+            sessions = LeadSessions(agent, approvals)
+            size_before = _db_size(db_path)
+
+            latencies = []
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def timed(call):
+                start = time.perf_counter()
+                result = await call
+                latencies.append(time.perf_counter() - start)
+                return result
+
+            async def conversation(n):
+                thread_id = f"lead-{n}"
+                async with semaphore:
+                    for text in _lead_turns(n, broker_count):
+                        await timed(sessions.run_turn(thread_id, text))
+                    if await approvals.get(thread_id):
+                        await timed(sessions.resume_turn(thread_id, {"type": "approve"}))
+
+            # As ferramentas registram cada passo com print; descartados para não poluir o relatório.
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                await asyncio.gather(*(conversation(n) for n in range(leads)))
+                elapsed = time.perf_counter() - start
+
+            tool_calls = 0
+            for n in range(leads):
+                state = await agent.aget_state(LeadSessions.config_for(f"lead-{n}"))
+                tool_calls += sum(
+                    len(m.tool_calls) for m in state.values.get("messages", []) if isinstance(m, AIMessage)
+                )
+            growth = _db_size(db_path) - size_before
+            lead_counts = await lead_states.counts()
+
+    bookings = service.requests["events.insert"]
+    print(f"leads={leads}  concorrência={concurrency}  corretores={broker_count}  "
+          f"latência do modelo={model_latency * 1000:.0f} ms  latência da agenda={calendar_latency * 1000:.0f} ms")
+    print(f"turnos: {len(latencies)} em {elapsed:.1f} s  ({len(latencies) / elapsed:.1f} turnos/s)")
+    print(
+        f"latência por turno: p50={_percentile(latencies, 0.50) * 1000:.0f} ms  "
+        f"p95={_percentile(latencies, 0.95) * 1000:.0f} ms  p99={_percentile(latencies, 0.99) * 1000:.0f} ms"
+    )
+    print(f"agendamentos: {bookings}/{leads}  sobrepostos: {_overlapping(service)}  "
+          f"chamadas de ferramenta por agendamento: {tool_calls / max(bookings, 1):.2f}")
+    print(f"chamadas ao modelo: {len(model.calls)}  chamadas à API do Calendar: {dict(service.requests)}")
+    print(f"fichas de qualificação por status: {lead_counts}")
+    print(f"crescimento do banco de checkpoints: {growth / 1e6:.1f} MB  ({growth / leads / 1e3:.1f} KB por lead)")
+    print("tempo por componente (telemetry/metrics.py):")
+    for label, histogram in (
+        ("turnos", metrics.TURN_SECONDS),
+        ("modelo", metrics.LLM_SECONDS),
+        ("ferramentas", metrics.TOOL_SECONDS),
+        ("API do Calendar", metrics.CALENDAR_SECONDS),
+        ("limitador de taxa", metrics.CALENDAR_THROTTLE_SECONDS),
+        ("gravações de checkpoint", metrics.CHECKPOINT_SECONDS),
+    ):
+        count, total = histogram.totals()
+        print(f"  {label:<24} {count:>6} spans  {total:8.1f} s  ({total / max(count, 1) * 1000:.1f} ms cada)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--brokers", type=int, default=10)
+    parser.add_argument("--model-latency", type=float, default=0.3, help="segundos por chamada ao modelo")
+    parser.add_argument("--calendar-latency", type=float, default=0.05, help="segundos por chamada à API")
+    parser.add_argument(
+        "--calendar-qps", type=float, default=None,
+        help="substitui CALENDAR_QPS (cota real da API) no limitador de taxa",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(
+        args.leads, args.concurrency, args.brokers,
+        args.model_latency, args.calendar_latency, args.calendar_qps,
+    ))
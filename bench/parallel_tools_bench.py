@@ -0,0 +1,119 @@
+"""
+Benchmark das chamadas de ferramenta de um mesmo passo (middleware/tool_scheduler.py), com o Google
+Calendar em memória de bench/fakes.py (latência por ida à API) e o modelo offline roteirizado.
+
+- Leituras: uma resposta do modelo com várias consultas à agenda de corretores diferentes, executadas
+  uma a uma (todas tratadas como escrita) contra em paralelo (o padrão).
+- Escritas: "apagar o evento antigo e criar o novo no mesmo horário" na mesma resposta, sem a trava
+  e com a trava, com o cache de eventos já sincronizado: o resultado de cada chamada.
+
+Uso:
+    python -m bench.parallel_tools_bench --reads 4 --api-latency 0.2
+"""
+import io
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+from functools import partial
+
+from langchain_core.messages import HumanMessage, ToolMessage
+from langgraph.types import Command
+
+import agent as agent_module
+from API import brokers, event_cache, google_auth
+from bench.fakes import FakeChatModel, FakeCalendarService, fake_context_cache
+from middleware.tool_scheduler import ToolSchedulerMiddleware
+from storage.checkpointer import open_checkpointer
+
+
+SLOT_START = "2026-11-03T10:00:00-03:00"
+SLOT_END = "2026-11-03T11:00:00-03:00"
+
+
+def _reset(service, broker_count):
+    google_auth.service = service
+    brokers._brokers = [
+        brokers.Broker(id=f"corretor{i}", name=f"Corretor {i}", calendar_id=f"corretor{i}@example.com")
+        for i in range(broker_count)
+    ]
+    brokers._busy_cache.clear()
+    event_cache._caches.clear()
+
+
+async def _run(tmp, name, script, write_tools=None):
+    """Roda um turno com 'script' (aprovando as escritas) e retorna (segundos, ToolMessages)."""
+    scheduler = ToolSchedulerMiddleware if write_tools is None else partial(ToolSchedulerMiddleware, write_tools)
+    model = FakeChatModel(script=[("agenda", script)])
+    config = {"configurable": {"thread_id": name}}
+    async with open_checkpointer(os.path.join(tmp, f"{name}.sqlite"), maintenance_interval=0) as saver:
+        original, agent_module.ToolSchedulerMiddleware = agent_module.ToolSchedulerMiddleware, scheduler
+        try:
+            graph = agent_module.build_agent(saver, model=model, cache_factory=fake_context_cache)
+        finally:
+            agent_module.ToolSchedulerMiddleware = original
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            payload = {"messages": [HumanMessage(content="Veja a agenda, por favor.")]}
+            while payload is not None:
+                result = await graph.ainvoke(payload, config)
+                payload = None
+                for interrupt in result.get("__interrupt__", ()):
+                    decisions = [{"type": "approve"} for _ in interrupt.value["action_requests"]]
+                    payload = Command(resume={"decisions": decisions})
+            elapsed = time.perf_counter() - start
+    return elapsed, [m for m in result["messages"] if isinstance(m, ToolMessage)]
+
+
+async def main(reads, latency):
+    read_calls = []
+    for i in range(reads):
+        broker_id = f"corretor{i}"
+        if i % 2:
+            read_calls.append(("list_upcoming_events", {"broker_id": broker_id}))
+        else:
+            read_calls.append(("find_available_slots", {"start_date": "2026-11-03", "broker_id": broker_id}))
+    read_script = [read_calls]
+
+    print(f"leituras por passo={reads}  latência da API={latency * 1000:.0f} ms")
+    print(f"{'execução':<26} {'turno':>8} {'ordem preservada':>17}")
+    with tempfile.TemporaryDirectory() as tmp:
+        everything = {name for name, _ in read_calls}
+        for label, write_tools in (("uma de cada vez", everything), ("em paralelo (padrão)", None)):
+            _reset(FakeCalendarService(latency), reads)
+            elapsed, results = await _run(tmp, label.split()[0], read_script, write_tools)
+            expected = [name for name, _ in read_calls]
+            ordered = [m.name for m in results] == expected
+            print(f"{label:<26} {elapsed:>6.2f} s {str(ordered):>17}")
+
+        print()
+        print("apagar o evento antigo e criar o novo no mesmo horário, na mesma resposta do modelo:")
+        for label, write_tools in (("sem a trava", ()), ("com a trava (padrão)", None)):
+            service = FakeCalendarService(latency)
+            _reset(service, 1)
+            old = service._insert("corretor0@example.com", {
+                "summary": "Lead 1 - visita antiga",
+                "start": {"dateTime": SLOT_START}, "end": {"dateTime": SLOT_END},
+            })
+            event_cache.get_event_cache("corretor0@example.com").refresh()
+            write_script = [[
+                ("delete_calendar_event", {"event_id": old["id"], "broker_id": "corretor0"}),
+                ("create_calendar_event", {
+                    "summary": "Lead 1 - visita remarcada", "start_time": "2026-11-03T10:00:00",
+                    "broker_id": "corretor0",
+                }),
+            ]]
+            elapsed, results = await _run(tmp, label.split()[0] + "-escrita", write_script, write_tools)
+            print(f"  {label}: turno {elapsed:.2f} s")
+            for message in results:
+                print(f"    {message.name}: {message.text[:90]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reads", type=int, default=4)
+    parser.add_argument("--api-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(main(args.reads, args.api_latency))
@@ -0,0 +1,66 @@
+"""
+Benchmark do cache de contexto do prompt: confere que o prefixo estático (prompt de sistema +
+ferramentas) é idêntico entre turnos, leads e reinícios do processo, e compara os tokens de entrada
+cobrados por turno com e sem o cache (usando o substituto local do cache do Gemini).
+
+Uso:
+    python -m bench.prompt_cache_bench --turns 10
+"""
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import agent as agent_module
+from bench.fakes import FakeChatModel, fake_context_cache
+from middleware.prompt_cache import prefix_key
+
+
+LEAD_TURN = "Procuro um apartamento de 2 quartos no Centro, até R$ 500 mil. Quais horários vocês têm?"
+
+
+async def _run(turns, cache_factory, prefixes, clock):
+    model = FakeChatModel()
+
+    def recording_factory(model, system_message, tools, ttl):
+        prefixes.add(prefix_key(system_message, tools))
+        return cache_factory(model, system_message, tools, ttl)
+
+    agent = agent_module.build_agent(InMemorySaver(), model=model, cache_factory=recording_factory)
+    for lead in ("lead-1", "lead-2"):
+        config = {"configurable": {"thread_id": lead}}
+        for _ in range(turns):
+            clock[0] += timedelta(minutes=7)
+            await agent.ainvoke(
+                {"messages": [HumanMessage(content=LEAD_TURN)]}, config, context={"lead_id": lead}
+            )
+    return [(sent, cached) for kind, sent, cached in model.calls if kind == "agente"]
+
+
+async def main(turns):
+    # Relógio simulado: cada turno acontece 7 minutos depois do anterior.
+    clock = [datetime(2026, 10, 19, 9, 0)]
+    build_turn_context = agent_module.build_turn_context
+    agent_module.build_turn_context = lambda current_datetime=None, lead=None: build_turn_context(clock[0], lead)
+
+    prefixes = set()
+    uncached = await _run(turns, lambda *args: None, set(), clock)
+    # Dois "processos" seguidos com o cache: o prefixo precisa ser o mesmo nos dois.
+    cached = await _run(turns, fake_context_cache, prefixes, clock)
+    cached += await _run(turns, fake_context_cache, prefixes, clock)
+
+    print(f"prefixos distintos em {turns} turnos x 2 leads x 2 reinícios: {len(prefixes)}")
+    sent_before = sum(sent for sent, _ in uncached) / len(uncached)
+    sent_after = sum(sent for sent, _ in cached) / len(cached)
+    read_after = sum(cache for _, cache in cached) / len(cached)
+    print(f"sem cache: {sent_before:7.0f} tokens de entrada cobrados por chamada")
+    print(f"com cache: {sent_after:7.0f} tokens de entrada cobrados por chamada + {read_after:.0f} lidos do cache")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns))
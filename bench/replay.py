@@ -0,0 +1,430 @@
+"""
+Reprodução de conversas gravadas (telemetry/recording.py, RECORD_PATH) pelo agente real: o grafo,
+os middlewares, as ferramentas e o checkpointer rodam de verdade; as respostas do modelo e do Google
+Calendar vêm da gravação, com os tempos gravados ('--speed 1'), proporcionais ('--speed 0.5') ou sem
+espera ('--speed 0', o mais rápido possível).
+
+O relatório compara a duração de cada turno reproduzido com a gravada e, com '--baseline', com um
+relatório salvo antes ('--save'): uma gravação vira um teste de regressão de desempenho repetível.
+Turnos cuja entrada diverge da gravação (modelo ou Calendar pedidos sem resposta gravada, resultados
+de ferramenta diferentes) são contados no relatório.
+
+Uso:
+    RECORD_PATH=gravacao.jsonl.zst python server.py          # grava
+    python -m bench.replay gravacao.jsonl.zst --speed 0 --save base.json
+    python -m bench.replay gravacao.jsonl.zst --speed 0 --baseline base.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import itertools
+import threading
+from collections import defaultdict
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.types import Command
+
+import agent as agent_module
+from API import brokers, event_cache, google_auth
+from storage.checkpointer import open_checkpointer
+from storage.lead_state import LeadStateStore
+from telemetry.recording import read_recording
+
+
+# Um turno reproduzido é regressão quando fica mais lento que a base por mais que isso (fração)
+# e por mais de REGRESSION_MIN_MS.
+REGRESSION_TOLERANCE = 0.2
+REGRESSION_MIN_MS = 5.0
+# Métodos da API do Calendar que só leem (podem ser repetidos na reprodução).
+READ_METHODS = frozenset({"list", "get", "query"})
+
+
+class Corpus:
+    """Gravação carregada: turnos por conversa, respostas do modelo por conversa e chamadas ao Calendar."""
+
+    def __init__(self, path):
+        self.header = {}
+        self.turns = defaultdict(list)
+        self.models = defaultdict(list)
+        self.tools = defaultdict(list)
+        self.calendar = []
+        self.batches = []
+        for record in read_recording(path):
+            kind = record.get("type")
+            if kind == "header" and not self.header:
+                self.header = record
+            elif kind == "turn":
+                self.turns[record["thread_id"]].append(record)
+            elif kind == "model" and record.get("message"):
+                self.models[record["thread_id"]].append(record)
+            elif kind == "tool":
+                self.tools[record["thread_id"]].append(record)
+            elif kind == "calendar":
+                self.calendar.append(record)
+            elif kind == "calendar_batch":
+                self.batches.append(record["ms"])
+                self.calendar.extend({**item, "ms": 0.0} for item in record["items"])
+        for turns in self.turns.values():
+            turns.sort(key=lambda turn: turn["at"])
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Modelo que devolve, para cada conversa (thread_id dos metadados da chamada), as respostas gravadas
+    na ordem, separando as chamadas internas (resumo do histórico, tag "nostream") das do agente.
+    Espera o tempo gravado de cada resposta multiplicado por 'speed'. Sem resposta gravada, devolve
+    uma mensagem vazia (o turno termina) e registra a divergência em 'missing'.
+    """
+
+    recorded: dict = {}
+    speed: float = 1.0
+    missing: list = []
+
+    @property
+    def _llm_type(self):
+        return "replay-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next(self, run_manager):
+        thread_id = (getattr(run_manager, "metadata", None) or {}).get("thread_id")
+        call = "interna" if "nostream" in (getattr(run_manager, "tags", None) or []) else "agente"
+        queue = self.recorded.get(thread_id, [])
+        for i, record in enumerate(queue):
+            if record.get("call", "agente") == call:
+                del queue[i]
+                return record, messages_from_dict([record["message"]])[0]
+        self.missing.append((thread_id, call))
+        return None, AIMessage(content="")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        record, message = self._next(run_manager)
+        if record and self.speed:
+            time.sleep(record["ms"] / 1000 * self.speed)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        record, message = self._next(run_manager)
+        if record and self.speed:
+            await asyncio.sleep(record["ms"] / 1000 * self.speed)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ReplayCalendarService:
+    """
+    Google Calendar que responde com as requisições gravadas (mesma interface de bench/fakes.py:
+    events(), freebusy(), new_batch_http_request). Cada requisição usa a primeira gravação ainda não
+    usada do mesmo recurso e método com os mesmos parâmetros ('exact'); se não houver, a próxima do
+    mesmo método ('approximate', ex.: timeMin calculado a partir da hora atual); com todas usadas, uma
+    leitura recebe de novo a última resposta da mesma consulta ('repeated') e o resto responde 404
+    ('missing'). Atribua a API.google_auth.service para usar.
+    """
+
+    def __init__(self, corpus, speed=1.0):
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.stats = {"exact": 0, "approximate": 0, "repeated": 0, "missing": 0}
+        self._pool = defaultdict(list)
+        self._served = {}
+        for record in corpus.calendar:
+            self._pool[(record["resource"], record["method"])].append(record)
+        self._batches = list(corpus.batches)
+
+    def events(self):
+        return _ReplayResource(self, "events")
+
+    def freebusy(self):
+        return _ReplayResource(self, "freebusy")
+
+    def new_batch_http_request(self, callback=None):
+        return _ReplayBatch(self, callback)
+
+    def take(self, resource, method, params):
+        key = _params_key(params)
+        with self.lock:
+            pool = self._pool.get((resource, method), [])
+            match = next((i for i, record in enumerate(pool) if _params_key(record["params"]) == key), None)
+            if match is not None:
+                self.stats["exact"] += 1
+            elif pool:
+                match = 0
+                self.stats["approximate"] += 1
+            else:
+                # Leitura a mais que na gravação (ex.: o event_cache atualizou em outro momento):
+                # repete a última resposta gravada da mesma consulta.
+                served = self._served.get((resource, method, key))
+                if served is not None and method in READ_METHODS:
+                    self.stats["repeated"] += 1
+                    return served
+                self.stats["missing"] += 1
+                return None
+            record = pool.pop(match)
+            self._served[(resource, method, _params_key(record["params"]))] = record
+            return record
+
+    def wait(self, ms):
+        if self.speed and ms:
+            time.sleep(ms / 1000 * self.speed)
+
+    def take_batch_ms(self):
+        with self.lock:
+            return self._batches.pop(0) if self._batches else 0.0
+
+
+def _replay_outcome(record):
+    if record is None:
+        return None, HttpError(httplib2.Response({"status": 404}), b'{"error": {"message": "Sem gravacao"}}')
+    error = record.get("error")
+    if error:
+        return None, HttpError(httplib2.Response({"status": error["status"] or 500}), error["content"].encode())
+    return record.get("response"), None
+
+
+class _ReplayResource:
+    def __init__(self, service, name):
+        self._service = service
+        self._name = name
+
+    def __getattr__(self, method):
+        return lambda **params: _ReplayRequest(self._service, self._name, method, params)
+
+
+class _ReplayRequest:
+    def __init__(self, service, resource, method, params):
+        self.service = service
+        self.resource = resource
+        self.params = params
+        self.method = "GET" if method in ("list", "get") else "POST"
+        self.methodId = f"calendar.{resource}.{method}"
+        self.uri = f"{resource}.{method}?{_params_key(params)}"
+        self._method = method
+
+    def take(self):
+        return self.service.take(self.resource, self._method, self.params)
+
+    def execute(self):
+        record = self.take()
+        self.service.wait(record["ms"] if record else 0)
+        response, error = _replay_outcome(record)
+        if error:
+            raise error
+        return response
+
+
+class _ReplayBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self._items = []
+
+    def add(self, request, request_id=None):
+        self._items.append((request_id, request))
+
+    def execute(self):
+        self.service.wait(self.service.take_batch_ms())
+        for request_id, request in self._items:
+            response, error = _replay_outcome(request.take())
+            self.callback(request_id, response, error)
+
+
+class _ToolOutputs(BaseCallbackHandler):
+    """Resultados das ferramentas na reprodução, por conversa, para comparar com os gravados."""
+
+    run_inline = True
+    ignore_chain = True
+    ignore_llm = True
+    ignore_chat_model = True
+
+    def __init__(self):
+        self.outputs = defaultdict(list)
+        self._threads = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, **kwargs):
+        self._threads[run_id] = (metadata or {}).get("thread_id")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        content = getattr(output, "content", output)
+        self.outputs[self._threads.pop(run_id, None)].append(content if isinstance(content, str) else str(content))
+
+
+def _payload(turn):
+    turn_input = turn.get("input") or {}
+    if "resume" in turn_input:
+        return Command(resume=turn_input["resume"])
+    if "message" in turn_input:
+        return {"messages": [HumanMessage(content=turn_input["message"])]}
+    return None
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+
+async def replay(path, speed=1.0):
+    """
+    Reproduz a gravação em 'path' e retorna o relatório (dict): duração gravada e reproduzida de cada
+    turno, resumo (p50/p95) e divergências. Com 'speed' > 0 as conversas rodam em paralelo e cada
+    turno começa no instante gravado (proporcional a 'speed'); com 0, um turno por vez.
+    """
+    corpus = Corpus(path)
+    model = ReplayChatModel(recorded={k: list(v) for k, v in corpus.models.items()}, speed=speed, missing=[])
+    calendar = ReplayCalendarService(corpus, speed)
+    google_auth.service = calendar
+    event_cache._caches.clear()
+    brokers._busy_cache.clear()
+    # O rodízio de corretores recomeça do zero; gravações feitas com o servidor já em uso podem
+    # divergir em assign_broker (aparece em 'threads_with_different_tool_results').
+    brokers._round_robin = itertools.count()
+    if corpus.header.get("brokers"):
+        brokers._brokers = [brokers.Broker(**item) for item in corpus.header["brokers"]]
+    tools = _ToolOutputs()
+    light_model = model if corpus.header.get("light_model") else None
+
+    turns = []
+    with tempfile.TemporaryDirectory() as tmp:
+        async with open_checkpointer(os.path.join(tmp, "replay.sqlite"), maintenance_interval=0) as saver:
+            # Montado como em server.py, sem o cache de contexto do Gemini (o modelo é a gravação).
+            lead_states = LeadStateStore(saver)
+            await lead_states.setup()
+            graph = agent_module.build_agent(
+                saver, model=model, cache_factory=lambda *args: None, lead_states=lead_states,
+                light_model=light_model,
+            )
+            start = time.perf_counter()
+
+            async def run(thread_id, index, turn):
+                config = {"configurable": {"thread_id": thread_id}, "callbacks": [tools]}
+                began = time.perf_counter()
+                try:
+                    await graph.ainvoke(_payload(turn), config, context={"lead_id": thread_id})
+                    outcome = "ok"
+                except Exception as e:
+                    outcome = f"erro: {e}"
+                turns.append({
+                    "thread_id": thread_id, "turn": index, "recorded_ms": turn["ms"],
+                    "replay_ms": round((time.perf_counter() - began) * 1000, 3), "outcome": outcome,
+                })
+
+            async def conversation(thread_id, recorded):
+                for index, turn in enumerate(recorded):
+                    await asyncio.sleep(max(0.0, start + turn["at"] * speed - time.perf_counter()))
+                    await run(thread_id, index, turn)
+
+            if speed:
+                await asyncio.gather(*(conversation(t, recorded) for t, recorded in corpus.turns.items()))
+            else:
+                # Sem espera, um turno por vez na ordem gravada: os caches compartilhados entre as
+                # conversas (event_cache, freebusy) veem a mesma sequência a cada reprodução, e a
+                # duração de cada turno não depende da disputa com os outros.
+                ordered = sorted(
+                    (turn["at"], thread_id, index, turn)
+                    for thread_id, recorded in corpus.turns.items() for index, turn in enumerate(recorded)
+                )
+                for _at, thread_id, index, turn in ordered:
+                    await run(thread_id, index, turn)
+
+    tool_diffs = sum(
+        [r["output"] for r in corpus.tools.get(thread_id, [])] != tools.outputs.get(thread_id, [])
+        for thread_id in corpus.turns
+    )
+    turns.sort(key=lambda t: (t["thread_id"], t["turn"]))
+    recorded = [t["recorded_ms"] for t in turns]
+    replayed = [t["replay_ms"] for t in turns]
+    return {
+        "recording": os.path.basename(path),
+        "speed": speed,
+        "turns": turns,
+        "summary": {
+            "turns": len(turns),
+            "recorded_p50_ms": _percentile(recorded, 0.5),
+            "recorded_p95_ms": _percentile(recorded, 0.95),
+            "replay_p50_ms": _percentile(replayed, 0.5),
+            "replay_p95_ms": _percentile(replayed, 0.95),
+        },
+        "divergences": {
+            "model_missing": len(model.missing),
+            "model_unused": sum(len(queue) for queue in model.recorded.values()),
+            "calendar": dict(calendar.stats),
+            "threads_with_different_tool_results": tool_diffs,
+            "failed_turns": sum(t["outcome"] != "ok" for t in turns),
+        },
+    }
+
+
+def compare(report, baseline, tolerance=REGRESSION_TOLERANCE, min_ms=REGRESSION_MIN_MS):
+    """
+    Turnos mais lentos que na base (mesma conversa e posição) e a variação do p50/p95, em dict;
+    "regression" é verdadeiro quando o p50 ou o p95 pioram além da tolerância.
+    """
+    before = {(t["thread_id"], t["turn"]): t["replay_ms"] for t in baseline["turns"]}
+    slower = []
+    for turn in report["turns"]:
+        old = before.get((turn["thread_id"], turn["turn"]))
+        if old is not None and turn["replay_ms"] > old * (1 + tolerance) and turn["replay_ms"] - old > min_ms:
+            slower.append({**turn, "baseline_ms": old})
+    summary, base = report["summary"], baseline["summary"]
+    changes = {}
+    regression = False
+    for q in ("p50", "p95"):
+        new, old = summary[f"replay_{q}_ms"], base[f"replay_{q}_ms"]
+        changes[q] = (new - old) / (old or 1)
+        regression = regression or (changes[q] > tolerance and new - old > min_ms)
+    return {
+        "p50_change": changes["p50"],
+        "p95_change": changes["p95"],
+        "slower_turns": slower,
+        "regression": regression,
+    }
+
+
+def print_report(report, diff=None):
+    summary = report["summary"]
+    print(f"{report['recording']}: {summary['turns']} turnos, velocidade {report['speed']:g}")
+    print(f"  gravado:     p50 {summary['recorded_p50_ms']:8.1f} ms  p95 {summary['recorded_p95_ms']:8.1f} ms")
+    print(f"  reproduzido: p50 {summary['replay_p50_ms']:8.1f} ms  p95 {summary['replay_p95_ms']:8.1f} ms")
+    print(f"  divergências: {report['divergences']}")
+    if diff is not None:
+        print(f"  contra a base: p50 {diff['p50_change']:+.1%}, p95 {diff['p95_change']:+.1%}, "
+              f"{len(diff['slower_turns'])} turnos mais lentos"
+              f"{' -> REGRESSÃO' if diff['regression'] else ''}")
+        for turn in diff["slower_turns"][:10]:
+            print(f"    {turn['thread_id']} #{turn['turn']}: {turn['baseline_ms']:.1f} -> {turn['replay_ms']:.1f} ms")
+
+
+async def main(path, speed, save, baseline):
+    report = await replay(path, speed)
+    diff = None
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            diff = compare(report, json.load(f))
+    print_report(report, diff)
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    return 1 if diff and diff["regression"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = tempos gravados, 0 = sem espera")
+    parser.add_argument("--save", help="grava o relatório em JSON")
+    parser.add_argument("--baseline", help="relatório salvo antes, para comparar (sai com 1 se houver regressão)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.recording, args.speed, args.save, args.baseline)))
@@ -0,0 +1,154 @@
+"""
+Benchmark da gravação e reprodução de conversas (telemetry/recording.py e bench/replay.py).
+
+Grava as conversas roteirizadas de bench/load_bench.py (apresentação, pedido de horários, escolha,
+aprovação do operador) com o modelo e o Google Calendar de bench/fakes.py e então:
+- tamanho da gravação por turno, em JSONL e comprimida com zstd;
+- custo da gravação no turno (mesmas conversas sem gravar);
+- reprodução nos tempos gravados: duração reproduzida contra a gravada e divergências;
+- reprodução sem espera, duas vezes (a segunda contra a primeira como base: ruído, sem regressão) e
+  com uma regressão injetada (+'slowdown' s na montagem do contexto de cada chamada ao modelo), que
+  deve ser apontada.
+
+Uso:
+    python -m bench.replay_bench --leads 20 --model-latency 0.2 --calendar-latency 0.03
+"""
+import io
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import itertools
+import contextlib
+from dataclasses import asdict
+
+import agent as agent_module
+from API import brokers, event_cache, google_auth
+from bench import replay
+from bench.fakes import FakeChatModel, FakeCalendarService, fake_context_cache
+from bench.load_bench import MODEL_SCRIPT, _lead_turns, _percentile
+from server import LeadSessions
+from storage.approvals import ApprovalQueue
+from storage.checkpointer import open_checkpointer
+from storage.lead_state import LeadStateStore
+from telemetry.recording import read_recording, set_record_path
+
+
+BROKERS = 4
+
+
+async def record(tmp, leads, model_latency, calendar_latency, path):
+    """Roda as conversas (gravando em 'path', se dado) e retorna as durações dos turnos, em segundos."""
+    google_auth.service = FakeCalendarService(latency=calendar_latency)
+    brokers._brokers = [
+        brokers.Broker(id=f"corretor-{i}", name=f"Corretor {i}", calendar_id=f"corretor{i}@imobiliaria.example",
+                       regions=["Centro"])
+        for i in range(BROKERS)
+    ]
+    brokers._busy_cache.clear()
+    brokers._round_robin = itertools.count()
+    event_cache._caches.clear()
+    model = FakeChatModel(script=MODEL_SCRIPT, latency=model_latency, latency_jitter=model_latency / 2)
+    latencies = []
+    set_record_path(path, light_model="", brokers=[asdict(broker) for broker in brokers._brokers])
+    try:
+        async with open_checkpointer(os.path.join(tmp, f"gravacao-{bool(path)}.sqlite"), maintenance_interval=0) as saver:
+            approvals = ApprovalQueue(saver)
+            await approvals.setup()
+            lead_states = LeadStateStore(saver)
+            await lead_states.setup()
+            graph = agent_module.build_agent(saver, model=model, cache_factory=fake_context_cache, lead_states=lead_states)
+            sessions = LeadSessions(graph, approvals)
+
+            async def timed(call):
+                start = time.perf_counter()
+                await call
+                latencies.append(time.perf_counter() - start)
+
+            async def conversation(n):
+                thread_id = f"lead-{n}"
+                for text in _lead_turns(n, BROKERS):
+                    await timed(sessions.run_turn(thread_id, text))
+                if await approvals.get(thread_id):
+                    await timed(sessions.resume_turn(thread_id, {"type": "approve"}))
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                await asyncio.gather(*(conversation(n) for n in range(leads)))
+    finally:
+        set_record_path(None)
+    return latencies
+
+
+def _sizes(path, tmp):
+    """Bytes da gravação comprimida e da mesma gravação em JSONL puro."""
+    plain = os.path.join(tmp, "gravacao.jsonl")
+    with open(plain, "w", encoding="utf-8") as f:
+        for record in read_recording(path):
+            f.write(replay._params_key(record) + "\n")
+    return os.path.getsize(path), os.path.getsize(plain)
+
+
+async def _replay_quiet(path, speed):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return await replay.replay(path, speed)
+
+
+async def main(leads, model_latency, calendar_latency, slowdown):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "gravacao.jsonl.zst")
+        plain = await record(tmp, leads, model_latency, calendar_latency, None)
+        recorded = await record(tmp, leads, model_latency, calendar_latency, path)
+        compressed, raw = _sizes(path, tmp)
+        turns = len(recorded)
+
+        print(f"{leads} conversas, {turns} turnos (modelo {model_latency * 1000:.0f} ms, "
+              f"Calendar {calendar_latency * 1000:.0f} ms por chamada)")
+        print(f"gravação: {raw / turns / 1e3:.1f} KB/turno em JSONL, {compressed / turns / 1e3:.1f} KB/turno com zstd "
+              f"({raw / compressed:.1f}x)")
+        print(f"custo de gravar: p50 {_percentile(plain, 0.5) * 1000:.1f} -> {_percentile(recorded, 0.5) * 1000:.1f} ms, "
+              f"p95 {_percentile(plain, 0.95) * 1000:.1f} -> {_percentile(recorded, 0.95) * 1000:.1f} ms")
+
+        print()
+        start = time.perf_counter()
+        realtime = await _replay_quiet(path, 1.0)
+        print(f"reprodução nos tempos gravados ({time.perf_counter() - start:.1f} s):")
+        replay.print_report(realtime)
+
+        print()
+        start = time.perf_counter()
+        baseline = await _replay_quiet(path, 0.0)
+        print(f"reprodução sem espera ({time.perf_counter() - start:.1f} s), usada como base:")
+        replay.print_report(baseline)
+
+        print()
+        again = await _replay_quiet(path, 0.0)
+        print("de novo, sem mudanças, contra a base:")
+        replay.print_report(again, replay.compare(again, baseline))
+
+        print()
+        # Regressão de exemplo: montagem do contexto do turno (agent.build_turn_context, chamada
+        # antes de cada resposta do modelo) mais lenta.
+        original = agent_module.build_turn_context
+
+        def slow_turn_context(current_datetime=None, lead=None):
+            time.sleep(slowdown)
+            return original(current_datetime, lead)
+
+        agent_module.build_turn_context = slow_turn_context
+        try:
+            slower = await _replay_quiet(path, 0.0)
+        finally:
+            agent_module.build_turn_context = original
+        print(f"com regressão injetada (+{slowdown * 1000:.0f} ms em cada build_turn_context), contra a base:")
+        replay.print_report(slower, replay.compare(slower, baseline))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=20)
+    parser.add_argument("--model-latency", type=float, default=0.2)
+    parser.add_argument("--calendar-latency", type=float, default=0.03)
+    parser.add_argument("--slowdown", type=float, default=0.005)
+    args = parser.parse_args()
+    asyncio.run(main(args.leads, args.model_latency, args.calendar_latency, args.slowdown))
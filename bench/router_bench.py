@@ -0,0 +1,156 @@
+"""
+Benchmark do roteador de mensagens (middleware/router.py), com o modelo offline de bench/fakes.py:
+conversas com cumprimentos, agradecimentos e perguntas de horário entre as mensagens de qualificação
+e agenda, sem o roteador, com respostas prontas e com um modelo leve. Mede a latência de turno,
+as chamadas ao modelo principal, os tokens de esquema de ferramentas enviados por turno, se todas
+as mensagens ficaram no checkpoint da conversa e a taxa de acerto do classificador em frases que
+não estão nos exemplos.
+
+Uso:
+    python -m bench.router_bench --conversations 20 --model-latency 0.3
+"""
+import io
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+import agent as agent_module
+from bench.fakes import FakeChatModel, fake_context_cache
+from middleware.router import TurnClassifier, route_turn
+from storage.checkpointer import open_checkpointer
+
+
+CONVERSATION = [
+    "Oi, boa tarde!",
+    "Quero comprar um apartamento de 2 quartos no Centro.",
+    "Qual o horário de atendimento de vocês?",
+    "Meu orçamento é de 500 mil e vou financiar.",
+    "Já tenho carta de crédito aprovada.",
+    "Obrigado!",
+    "Quero me mudar em 3 meses, sou eu que decido.",
+    "Quais horários livres vocês têm na terça?",
+    "Pode ser às 10h.",
+    "Meu e-mail é maria@example.com.",
+    "Valeu!",
+    "Tchau, até mais",
+]
+
+# Frases fora dos exemplos do classificador, com o caminho certo (True = pode ir pelo caminho rápido).
+HELD_OUT = [
+    ("olá, bom dia!", True), ("oi oi", True), ("boa tarde, tudo certo?", True), ("opa, tudo bem?", True),
+    ("muito obrigado mesmo", True), ("obrigadão", True), ("valeu pela ajuda", True), ("agradeço a atenção", True),
+    ("até logo!", True), ("tchau tchau", True), ("falou, até mais", True),
+    ("vocês atendem aos sábados?", True), ("que horas abre?", True), ("qual é o horário de vocês?", True),
+    ("funcionam domingo?", True),
+    ("quero um apartamento", False), ("tem casa pra alugar?", False), ("pode ser amanhã", False),
+    ("sim, quero", False), ("não tenho pressa", False), ("qual horário livre na sexta?", False),
+    ("meu limite é 400 mil", False), ("sou eu e minha esposa que decidimos", False),
+    ("quero visitar o imóvel", False), ("perfeito, pode marcar", False), ("ok", False),
+    ("tem algo perto do metrô?", False), ("aceitam permuta?", False), ("qual o valor do condomínio?", False),
+    ("beleza, fechado", False), ("prefiro de manhã", False), ("vocês têm cobertura?", False),
+]
+
+
+def _schema_tokens():
+    """Tokens (mesma aproximação de count_tokens_approximately: ~4 caracteres) dos esquemas das ferramentas."""
+    tools = [
+        agent_module.list_upcoming_events, agent_module.create_calendar_event, agent_module.search_calendar_events,
+        agent_module.update_calendar_event, agent_module.delete_calendar_event, agent_module.find_available_slots,
+        agent_module.assign_broker, agent_module.bulk_create_calendar_events, agent_module.bulk_update_calendar_events,
+        agent_module.bulk_delete_calendar_events, agent_module.search_properties,
+    ]
+    return sum(len(json.dumps(convert_to_openai_tool(tool), ensure_ascii=False)) for tool in tools) / 4
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def _run(tmp, label, conversations, model_latency, router, light_model):
+    model = FakeChatModel(latency=model_latency, latency_jitter=model_latency / 3)
+    path = os.path.join(tmp, f"{label}.sqlite")
+    async with open_checkpointer(path, maintenance_interval=0) as saver:
+        graph = agent_module.build_agent(
+            saver, model=model, cache_factory=fake_context_cache, router=router, light_model=light_model,
+        )
+        latencies = []
+
+        async def conversation(n):
+            config = {"configurable": {"thread_id": f"lead-{n}"}}
+            for text in CONVERSATION:
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+                latencies.append((text, time.perf_counter() - start))
+            state = await graph.aget_state(config)
+            messages = state.values["messages"]
+            return (
+                sum(isinstance(m, HumanMessage) for m in messages),
+                sum(isinstance(m, AIMessage) for m in messages),
+            )
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            counts = await asyncio.gather(*(conversation(n) for n in range(conversations)))
+    model_calls = sum(kind == "agente" for kind, _, _ in model.calls)
+    return latencies, model_calls, counts
+
+
+async def main(conversations, model_latency, light_latency):
+    schema_tokens = _schema_tokens()
+    turns = conversations * len(CONVERSATION)
+    print(f"{conversations} conversas x {len(CONVERSATION)} turnos; modelo principal {model_latency * 1000:.0f} ms, "
+          f"modelo leve {light_latency * 1000:.0f} ms; esquemas das ferramentas: {schema_tokens:.0f} tokens por chamada")
+    classifier = TurnClassifier()
+    trivial = {text for text in CONVERSATION if route_turn([HumanMessage(content=text)], classifier)}
+    print(f"mensagens triviais por conversa: {len(trivial)} de {len(CONVERSATION)}")
+    print(f"{'execução':<18} {'média':>7} {'p50':>7} {'p95':>7} {'p50 triviais':>13} {'p50 demais':>11} "
+          f"{'chamadas ao principal':>22} {'esquema/turno':>14} {'checkpoint':>11}")
+    light_model = FakeChatModel(
+        latency=light_latency, latency_jitter=light_latency / 3,
+        reply="Olá! Que bom falar com você. Você está procurando um imóvel para comprar ou para alugar?",
+    )
+    runs = (
+        ("sem roteador", False, None),
+        ("respostas prontas", True, None),
+        ("modelo leve", True, light_model),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, router, light in runs:
+            latencies, model_calls, counts = await _run(
+                tmp, label.replace(" ", "-"), conversations, model_latency, router, light,
+            )
+            complete = all(human == ai == len(CONVERSATION) for human, ai in counts)
+            every = [seconds * 1000 for _, seconds in latencies]
+            easy = [seconds * 1000 for text, seconds in latencies if text in trivial]
+            rest = [seconds * 1000 for text, seconds in latencies if text not in trivial]
+            print(f"{label:<18} {sum(every) / len(every):>4.0f} ms {_percentile(every, 0.5):>4.0f} ms "
+                  f"{_percentile(every, 0.95):>4.0f} ms {_percentile(easy, 0.5):>10.0f} ms {_percentile(rest, 0.5):>8.0f} ms "
+                  f"{model_calls:>22} {model_calls * schema_tokens / turns:>14.0f} {'completo' if complete else 'FALTANDO':>11}")
+
+    start = time.perf_counter()
+    routed = [(text, route_turn([HumanMessage(content=text)], classifier) is not None, fast) for text, fast in HELD_OUT]
+    elapsed = (time.perf_counter() - start) / len(HELD_OUT)
+    correct = sum(got == fast for _, got, fast in routed)
+    print()
+    print(f"classificador em {len(HELD_OUT)} frases fora dos exemplos: {correct}/{len(HELD_OUT)} certas, "
+          f"{elapsed * 1e6:.0f} µs por mensagem")
+    for text, got, fast in routed:
+        if got != fast:
+            kind = "desviada para o caminho rápido" if got else "mandada ao agente sem precisar"
+            print(f"  {kind}: {text!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--model-latency", type=float, default=0.3)
+    parser.add_argument("--light-latency", type=float, default=0.08)
+    args = parser.parse_args()
+    asyncio.run(main(args.conversations, args.model_latency, args.light_latency))
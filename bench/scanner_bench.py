@@ -0,0 +1,90 @@
+"""
+Benchmark do scanner de conteúdo: custo por mensagem de ligar todos os detectores como PIIMiddleware
+empilhados (uma passada por detector) e com o scanner de passada única de middleware/content_scanner.py,
+mais o custo e o atraso do StreamRedactor sobre uma resposta transmitida em pedaços.
+
+Uso:
+    python -m bench.scanner_bench --repeat 2000
+"""
+import time
+import argparse
+
+from langchain.agents.middleware import PIIMiddleware
+
+from middleware.content_scanner import (
+    DANGEROUS_CODE_PATTERN, NUMBER_PATTERN, StreamRedactor, redact, scan,
+)
+
+
+LEAD_MESSAGE = (
+    "Oi, sou a Maria Silva (maria.silva@example.com, 11 98765-4321). Procuro um apartamento de 2 quartos "
+    "no Centro, até R$ 500 mil, com financiamento. Pode ser na semana que vem?"
+)
+AGENT_REPLY = (
+    "Perfeito, Maria! Anotei seu e-mail maria.silva@example.com e o telefone (11) 98765-4321. "
+    "Tenho estes horários com o nosso especialista: segunda, 26/10, às 09:00; terça, 27/10, às 14:00; "
+    "quarta, 28/10, às 10:30. Qual fica melhor para você? Assim que confirmar, envio o convite. "
+    "Você pode ver os imóveis em https://imobiliaria.example.com/centro/2-quartos?preco=500000."
+)
+# Resposta longa, do tamanho de um resumo do histórico ou de uma listagem grande.
+LONG_TEXT = (AGENT_REPLY + " Evento criado com sucesso! Link: https://www.google.com/calendar/event?eid=abc123 ") * 12
+
+
+def _stacked_middlewares():
+    """Todos os detectores como PIIMiddleware separados, como ficaria ligando-os um a um."""
+    return [
+        PIIMiddleware("dangerous_code", detector=DANGEROUS_CODE_PATTERN, strategy="block", apply_to_input=False),
+        PIIMiddleware("email", strategy="redact", apply_to_input=False),
+        PIIMiddleware("url", strategy="redact", apply_to_input=False),
+        PIIMiddleware("cpf", detector=r"\d{3}\.?\d{3}\.?\d{3}-?\d{2}", strategy="redact", apply_to_input=False),
+        PIIMiddleware("cnpj", detector=r"\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}", strategy="redact", apply_to_input=False),
+        PIIMiddleware("phone", detector=NUMBER_PATTERN, strategy="redact", apply_to_input=False),
+    ]
+
+
+def _timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _stream(text, chunk_size):
+    redactor = StreamRedactor()
+    out = [redactor.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    out.append(redactor.flush())
+    return out
+
+
+def main(repeat):
+    stacked = _stacked_middlewares()
+
+    def stacked_pass(text):
+        for middleware in stacked:
+            text = middleware._process_content(text)[0]
+        return text
+
+    print(f"{'mensagem':<22} {'chars':>6} {'empilhados':>11} {'passada única':>14}")
+    for name, text in (("mensagem do lead", LEAD_MESSAGE), ("resposta do agente", AGENT_REPLY), ("texto longo", LONG_TEXT)):
+        before = _timed(lambda: stacked_pass(text), repeat)
+        after = _timed(lambda: redact(text, matches=scan(text)), repeat)
+        print(f"{name:<22} {len(text):>6} {before:>8.1f} µs {after:>11.1f} µs")
+
+    print()
+    print(f"{'streaming (pedaços)':<22} {'custo total':>12} {'por pedaço':>11} {'retido máx.':>12}")
+    for chunk_size in (4, 16, 64):
+        total = _timed(lambda: _stream(AGENT_REPLY, chunk_size), repeat)
+        chunks = -(-len(AGENT_REPLY) // chunk_size)
+        redactor, held = StreamRedactor(), 0
+        for i in range(0, len(AGENT_REPLY), chunk_size):
+            redactor.feed(AGENT_REPLY[i:i + chunk_size])
+            held = max(held, len(redactor._buffer))
+        assert "".join(_stream(AGENT_REPLY, chunk_size)) == redact(AGENT_REPLY)
+        print(f"{chunk_size:>4} caracteres{'':<10} {total:>9.1f} µs {total / chunks:>8.1f} µs {held:>7} chars")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.repeat)
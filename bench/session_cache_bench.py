@@ -0,0 +1,149 @@
+"""
+Benchmark do cache de conversas do checkpointer (SessionCacheSaver em storage/checkpointer.py):
+latência de leitura do estado de uma conversa ativa (memória) contra o SQLite, memória real do cache
+contra a estimativa e o teto configurado, latência de turno com gravação adiada contra gravação
+direta e o arquivamento das conversas frias (tamanho do banco principal e tempo de restauração).
+
+Uso:
+    python -m bench.session_cache_bench --leads 2000 --turns 20 --cache-mb 20
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+
+from langchain_core.messages import HumanMessage
+
+from bench.checkpoint_bench import USER_TURN, build_graph, _db_size
+from storage.checkpointer import archive_cold_threads, open_checkpointer, vacuum_checkpoints
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.95)] * 1e6
+
+
+async def _seed(db_path, leads, turns):
+    """Uma conversa de 'turns' turnos pelo grafo, copiada para 'leads' thread_ids no banco."""
+    async with open_checkpointer(db_path, maintenance_interval=0, session_cache_mb=0) as saver:
+        graph = build_graph(saver)
+        config = {"configurable": {"thread_id": "modelo"}}
+        for _ in range(turns):
+            await graph.ainvoke({"messages": [HumanMessage(content=USER_TURN)]}, config)
+        async with saver.lock:
+            for n in range(leads):
+                await saver.conn.execute(
+                    "INSERT INTO checkpoints SELECT ?, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, "
+                    "checkpoint, metadata FROM checkpoints WHERE thread_id = 'modelo' "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (f"lead-{n:05d}",),
+                )
+            await saver.conn.execute("DELETE FROM checkpoints WHERE thread_id = 'modelo'")
+            await saver.conn.execute("DELETE FROM writes")
+            await saver.conn.commit()
+
+
+async def _loads(saver, leads, rounds):
+    samples = []
+    for _ in range(rounds):
+        for n in range(leads):
+            start = time.perf_counter()
+            await saver.aget_tuple({"configurable": {"thread_id": f"lead-{n:05d}"}})
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def _turns(db_path, session_cache_mb, conversations, turns, model_latency):
+    async with open_checkpointer(db_path, maintenance_interval=0, session_cache_mb=session_cache_mb) as saver:
+        graph = build_graph(saver)
+        latencies = []
+
+        async def conversation(n):
+            config = {"configurable": {"thread_id": f"turno-{n}"}}
+            for _ in range(turns):
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=USER_TURN)]}, config)
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(model_latency)  # o lead lendo e respondendo; o modelo fica fora da medida
+
+        await asyncio.gather(*(conversation(n) for n in range(conversations)))
+    return latencies
+
+
+async def main(leads, turns, cache_mb, conversations):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "db.sqlite")
+        await _seed(db_path, leads, turns)
+        print(f"{leads} conversas de {turns} turnos ({turns * 2} mensagens) no banco: {_db_size(db_path) / 1e6:.1f} MB")
+
+        print()
+        print(f"{'leitura do estado de uma conversa':<40} {'p50 (µs)':>10} {'p95 (µs)':>10}")
+        async with open_checkpointer(db_path, maintenance_interval=0, session_cache_mb=0) as saver:
+            p50, p95 = _percentiles(await _loads(saver, leads, 2))
+        print(f"{'SQLite (sem cache)':<40} {p50:>10.0f} {p95:>10.0f}")
+
+        async with open_checkpointer(
+            db_path, maintenance_interval=0, session_cache_mb=1e6, archive_after_days=0,
+        ) as saver:
+            p50, p95 = _percentiles(await _loads(saver, leads, 1))
+            print(f"{'primeira leitura (SQLite -> memória)':<40} {p50:>10.0f} {p95:>10.0f}")
+            p50, p95 = _percentiles(await _loads(saver, leads, 2))
+            print(f"{'conversa ativa (memória)':<40} {p50:>10.0f} {p95:>10.0f}")
+
+        async with open_checkpointer(
+            db_path, maintenance_interval=0, session_cache_mb=1e6, archive_after_days=0,
+        ) as saver:
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            await _loads(saver, leads, 1)
+            real = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+            print(f"memória do cache com {saver.cached_sessions} conversas: estimada {saver.cached_bytes / 1e6:.1f} MB, "
+                  f"medida (tracemalloc) {real / 1e6:.1f} MB")
+
+        async with open_checkpointer(
+            db_path, maintenance_interval=0, session_cache_mb=cache_mb, archive_after_days=0,
+        ) as saver:
+            await _loads(saver, leads, 1)
+            print(f"com teto de {cache_mb:.0f} MB: {saver.cached_sessions} conversas em memória, "
+                  f"{saver.cached_bytes / 1e6:.1f} MB estimados")
+
+        print()
+        print(f"turnos ({conversations} conversas simultâneas x 6 turnos, 200 ms entre turnos):")
+        for label, session_cache_mb in (("gravação direta", 0), ("memória + gravação adiada", 256)):
+            path = os.path.join(tmp, f"turnos-{session_cache_mb}.sqlite")
+            latencies = await _turns(path, session_cache_mb, conversations, 6, 0.2)
+            p50, p95 = _percentiles(latencies)
+            print(f"  {label:<28} p50={p50 / 1000:6.2f} ms  p95={p95 / 1000:6.2f} ms  banco={_db_size(path) / 1e6:5.1f} MB")
+
+        print()
+        archive_path = os.path.join(tmp, "archive.sqlite")
+        async with open_checkpointer(db_path, maintenance_interval=0, archive_path=archive_path) as saver:
+            async with saver.lock:
+                await saver.conn.execute(
+                    "INSERT OR REPLACE INTO session_activity SELECT DISTINCT thread_id, 0 FROM checkpoints"
+                )
+                await saver.conn.commit()
+            start = time.perf_counter()
+            archived = 0
+            while moved := await archive_cold_threads(saver, 30):
+                archived += moved
+            elapsed = time.perf_counter() - start
+            await vacuum_checkpoints(saver)
+            print(f"arquivamento: {archived} conversas em {elapsed:.2f} s; banco principal {_db_size(db_path) / 1e6:.2f} MB, "
+                  f"arquivo {_db_size(archive_path) / 1e6:.2f} MB")
+            start = time.perf_counter()
+            await saver.aget_tuple({"configurable": {"thread_id": "lead-00000"}})
+            print(f"restauração de uma conversa arquivada no primeiro acesso: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--cache-mb", type=float, default=20)
+    parser.add_argument("--conversations", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.leads, args.turns, args.cache_mb, args.conversations))
@@ -0,0 +1,110 @@
+"""
+Benchmark da inicialização do Google Calendar (API/google_auth.py): tempo de 'import API.google_auth'
+e do primeiro acesso a 'service', cada execução em um interpretador novo, antes e depois da
+criação preguiçosa do serviço.
+
+"antes" é o API/google_auth.py do histórico do git anterior à mudança (autenticava e montava o
+serviço no import); sem o histórico, só "depois" é medido. Roda em uma pasta temporária com um
+Token/token.json válido gerado aqui: o token real não é lido e a rede não é acessada (o 'service' é
+montado do documento de descoberta empacotado). As bibliotecas do Google usadas pelas duas versões
+são carregadas antes de medir. Com --stub-build, 'build' do googleapiclient é trocado por um stand-in.
+
+Uso:
+    python -m bench.startup_bench --runs 10
+"""
+import os
+import sys
+import json
+import argparse
+import datetime
+import tempfile
+import subprocess
+import statistics
+
+from google.oauth2.credentials import Credentials
+
+from API.google_auth import SCOPES
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import sys, json, time
+import google.oauth2.credentials, googleapiclient.discovery, googleapiclient.errors
+if sys.argv[1] == "stub":
+    googleapiclient.discovery.build = lambda *args, **kwargs: object()
+start = time.perf_counter()
+import API.google_auth as google_auth
+imported = time.perf_counter()
+assert google_auth.service is not None
+accessed = time.perf_counter()
+print(json.dumps({"import": imported - start, "service": accessed - imported}))
+"""
+
+
+def write_token(folder):
+    """Token/token.json válido por uma hora (credenciais fictícias)."""
+    os.makedirs(os.path.join(folder, "Token"))
+    expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(hours=1)
+    creds = Credentials(
+        token="token-de-teste", refresh_token="refresh-de-teste", client_id="cliente.apps.googleusercontent.com",
+        client_secret="segredo", token_uri="https://oauth2.googleapis.com/token", scopes=SCOPES, expiry=expiry,
+    )
+    with open(os.path.join(folder, "Token", "token.json"), "w") as token:
+        token.write(creds.to_json())
+
+
+def write_eager_version(folder):
+    """
+    Copia para 'folder'/API o google_auth.py de antes da criação preguiçosa (o pai do commit que
+    removeu 'service = get_calendar_service()' do módulo). Retorna 'folder', ou None sem o histórico.
+    """
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+
+    try:
+        rev = git("log", "-n1", "--format=%H", "-G", r"^service = get_calendar_service\(\)", "--", "API/google_auth.py")
+        source = git("show", f"{rev.strip()}^:API/google_auth.py")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    os.makedirs(os.path.join(folder, "API"))
+    with open(os.path.join(folder, "API", "google_auth.py"), "w", encoding="utf-8") as f:
+        f.write(source)
+    return folder
+
+
+def measure(folder, code_path, stub):
+    env = {**os.environ, "PYTHONPATH": code_path}
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, "stub" if stub else "real"],
+        cwd=folder, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(runs, stub):
+    with tempfile.TemporaryDirectory() as folder:
+        write_token(folder)
+        versions = [("depois (preguiçoso)", ROOT)]
+        eager = write_eager_version(os.path.join(folder, "antes"))
+        if eager:
+            versions.insert(0, ("antes (no import)", eager))
+        else:
+            print("Histórico do git indisponível: medindo só a versão atual.")
+
+        print(f"{runs} execuções, build {'stand-in' if stub else 'real (descoberta empacotada)'}; medianas em ms")
+        print(f"{'versão':<22} {'import':>8} {'1º acesso':>10} {'total':>8}")
+        for label, code_path in versions:
+            samples = [measure(folder, code_path, stub) for _ in range(runs)]
+            imported = statistics.median(s["import"] * 1000 for s in samples)
+            accessed = statistics.median(s["service"] * 1000 for s in samples)
+            total = statistics.median((s["import"] + s["service"]) * 1000 for s in samples)
+            print(f"{label:<22} {imported:>8.1f} {accessed:>10.1f} {total:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--stub-build", action="store_true", help="troca googleapiclient.discovery.build por um stand-in")
+    args = parser.parse_args()
+    main(args.runs, args.stub_build)
@@ -0,0 +1,196 @@
+"""
+Benchmark da saída em streaming (streaming/events.py e streaming/sinks.py), com o agente real e o
+modelo offline de bench/fakes.py transmitindo a resposta em trechos pequenos.
+
+- Custo por turno: o laço antigo do agent.py (astream_events v1, um print com flush por trecho)
+  contra agent_events + StdoutSink (com e sem janela de envio) e um destino que só quer eventos de
+  ferramenta (sem o modo "messages"). Mede o tempo de turno e as escritas no terminal.
+- Cliente lento: um destino que leva 'slow' segundos por envio mais o tempo de transmitir o texto
+  a 'bandwidth' caracteres/s; fila sem limite (um envio por trecho, como o WebSocket antigo) contra
+  o Sink com buffer limitado (esperando ou descartando).
+  Mede o pico de caracteres retidos em memória e a duração do turno.
+
+Uso:
+    python -m bench.streaming_bench --turns 20 --reply-chars 2000 --chunk 4
+"""
+import io
+import time
+import warnings
+import asyncio
+import argparse
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import agent as agent_module
+from bench.fakes import FakeChatModel, fake_context_cache
+from middleware.content_scanner import StreamRedactor
+from streaming.events import agent_events
+from streaming.sinks import QueueSink, Sink, SinkGroup, StdoutSink
+
+
+class CountingStream(io.StringIO):
+    """Terminal de mentira que conta as chamadas a flush (cada uma é uma escrita no terminal real)."""
+
+    flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+async def _legacy_print_stream(agent_executor, payload, config, out):
+    """O laço de agent._print_stream antes deste subsistema (astream_events v1, print por trecho)."""
+    redactor = StreamRedactor()
+    warnings.filterwarnings("ignore", message=".*astream_events version='v1' is deprecated")
+    async for event in agent_executor.astream_events(payload, config, stream_mode='values', version="v1"):
+        kind = event["event"]
+        if "nostream" in event.get("tags", []):
+            continue
+        if kind == "on_chat_model_stream":
+            content = event["data"]["chunk"].content
+            if content:
+                if isinstance(content, str):
+                    print(redactor.feed(content), end="", flush=True, file=out)
+                elif isinstance(content, list):
+                    for part in content:
+                        if isinstance(part, dict) and part.get("type") == "text":
+                            print(redactor.feed(part.get("text", "")), end="", flush=True, file=out)
+        elif kind == "on_chat_model_end":
+            print(redactor.flush(), end="", flush=True, file=out)
+        elif kind == "on_tool_call":
+            print(f"\n[Chamando ferramenta: {event['data']['name']}]", flush=True, file=out)
+        elif kind == "on_tool_end":
+            print(f"\n[Resultado da ferramenta: {str(event['data']['output'])[:200]}...]", flush=True, file=out)
+
+
+async def _new_print_stream(agent_executor, payload, config, sinks):
+    async with SinkGroup(sinks) as group:
+        async for event in agent_events(agent_executor, payload, config, group.kinds):
+            await group.put(event)
+
+
+def _graph(reply_chars, chunk, delay=0.0):
+    reply = ("Temos ótimas opções no Centro para o seu perfil, com financiamento facilitado. " * 1000)[:reply_chars]
+    model = FakeChatModel(reply=reply, stream_chunk=chunk, stream_delay=delay)
+    return agent_module.build_agent(InMemorySaver(), model=model, cache_factory=fake_context_cache, router=False)
+
+
+async def overhead(turns, reply_chars, chunk):
+    print(f"custo por turno ({turns} turnos, resposta de {reply_chars} caracteres em trechos de {chunk}):")
+    print(f"  {'saída':<40} {'turno (ms)':>10} {'escritas/turno':>15}")
+
+    async def measure(label, run):
+        graph = _graph(reply_chars, chunk)
+        config = {"configurable": {"thread_id": label}}
+        out = CountingStream()
+        await run(graph, {"messages": [HumanMessage(content="aquecimento")]}, config, out)
+        out.flushes = 0
+        start = time.perf_counter()
+        for _ in range(turns):
+            await run(graph, {"messages": [HumanMessage(content="Quero um apartamento.")]}, config, out)
+        elapsed = (time.perf_counter() - start) / turns
+        print(f"  {label:<40} {elapsed * 1000:>10.1f} {out.flushes / turns:>15.1f}")
+
+    await measure("astream_events v1 + print (antigo)", _legacy_print_stream)
+    await measure("StdoutSink, sem janela", lambda g, p, c, out: _new_print_stream(g, p, c, [StdoutSink(out, window=0)]))
+    await measure("StdoutSink, janela de 50 ms", lambda g, p, c, out: _new_print_stream(g, p, c, [StdoutSink(out)]))
+    queue = asyncio.Queue()
+    await measure(
+        "só eventos de ferramenta (QueueSink)",
+        lambda g, p, c, out: _new_print_stream(g, p, c, [QueueSink(queue, kinds={"tool_call", "tool_result"})]),
+    )
+
+
+class SlowSink(Sink):
+    """Cliente lento (ver _transfer). Registra o pico de caracteres pendentes e o total entregue."""
+
+    name = "bench"
+
+    def __init__(self, slow, bandwidth, **kwargs):
+        super().__init__(**kwargs)
+        self.slow = slow
+        self.bandwidth = bandwidth
+        self.peak = 0
+        self.received = 0
+
+    async def put(self, event):
+        await super().put(event)
+        self.peak = max(self.peak, self._size)
+
+    async def send(self, events):
+        size = sum(len(event.text) for event in events)
+        self.received += size
+        await _transfer(size, self.slow, self.bandwidth)
+
+
+async def _transfer(size, slow, bandwidth):
+    """Envio a um cliente lento: 'slow' segundos por mensagem mais 'size' caracteres a 'bandwidth' por segundo."""
+    await asyncio.sleep(slow + size / bandwidth)
+
+
+async def _unbounded(graph, payload, config, slow, bandwidth):
+    """Um envio por trecho, como o WebSocket antigo, com os trechos esperando em uma fila sem limite."""
+    queue = asyncio.Queue()
+    stats = {"peak": 0, "pending": 0, "received": 0}
+
+    async def client():
+        while (piece := await queue.get()) is not None:
+            stats["pending"] -= len(piece)
+            stats["received"] += len(piece)
+            await _transfer(len(piece), slow, bandwidth)
+
+    task = asyncio.create_task(client())
+    async for event in agent_events(graph, payload, config, {"token"}):
+        queue.put_nowait(event.text)
+        stats["pending"] += len(event.text)
+        stats["peak"] = max(stats["peak"], stats["pending"])
+    queue.put_nowait(None)
+    agent_done = time.perf_counter()
+    await task
+    return stats["peak"], stats["received"], agent_done
+
+
+async def slow_client(reply_chars, chunk, slow, bandwidth, max_buffer):
+    print()
+    print(f"cliente lento ({slow * 1000:.0f} ms por envio + {bandwidth} caracteres/s; resposta de {reply_chars} caracteres em trechos de {chunk}, "
+          f"1 ms entre trechos; buffer de {max_buffer} caracteres):")
+    print(f"  {'destino':<36} {'pico retido':>12} {'entregue':>9} {'fim do agente':>14} {'fim da entrega':>15}")
+    payload = {"messages": [HumanMessage(content="Quero um apartamento.")]}
+
+    start = time.perf_counter()
+    peak, received, agent_done = await _unbounded(
+        _graph(reply_chars, chunk, 0.001), payload, {"configurable": {"thread_id": "fila"}}, slow, bandwidth,
+    )
+    print(f"  {'fila sem limite, envio por trecho':<36} {peak:>12} {received:>9} "
+          f"{agent_done - start:>12.2f} s {time.perf_counter() - start:>13.2f} s")
+
+    for label, options in (
+        ("Sink, janela 50 ms, espera", {"on_full": "wait"}),
+        ("Sink, janela 50 ms, descarta", {"on_full": "drop"}),
+    ):
+        graph = _graph(reply_chars, chunk, 0.001)
+        sink = SlowSink(slow, bandwidth, kinds={"token", "end"}, max_buffer=max_buffer, **options)
+        start = time.perf_counter()
+        async with SinkGroup([sink]) as group:
+            async for event in agent_events(graph, payload, {"configurable": {"thread_id": label}}, group.kinds):
+                await group.put(event)
+            agent_done = time.perf_counter()
+        print(f"  {label:<36} {sink.peak:>12} {sink.received:>9} "
+              f"{agent_done - start:>12.2f} s {time.perf_counter() - start:>13.2f} s")
+
+
+async def main(turns, reply_chars, chunk, slow, bandwidth, max_buffer):
+    await overhead(turns, reply_chars, chunk)
+    await slow_client(reply_chars * 5, chunk, slow, bandwidth, max_buffer)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--reply-chars", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=4)
+    parser.add_argument("--slow", type=float, default=0.02)
+    parser.add_argument("--bandwidth", type=int, default=2000)
+    parser.add_argument("--max-buffer", type=int, default=1024)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.reply_chars, args.chunk, args.slow, args.bandwidth, args.max_buffer))
@@ -0,0 +1,71 @@
+"""
+Benchmark do formato de saída das ferramentas: tokens que cada resultado de ferramenta ocupa no
+prompt seguinte, no formato antigo (listas de dicts serializadas em JSON) e na tabela compacta.
+
+Uso:
+    python -m bench.tool_output_bench
+"""
+from datetime import datetime, timedelta
+
+from langchain_core.messages import ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.prebuilt.tool_node import msg_content_output
+
+from bench.fakes import google_event
+from tools.availability import LOCAL_TZ
+from tools.output_format import EVENT_OUTPUT, SEARCH_OUTPUT, SLOT_OUTPUT, BROKER_OUTPUT, BATCH_OUTPUT, shape_output
+
+
+def _tokens(content):
+    return count_tokens_approximately([ToolMessage(content=content, tool_call_id="call_0")])
+
+
+def _calendar(days=20, per_day=6):
+    """Agenda realista de um corretor: 'per_day' visitas por dia útil a partir de 19/10/2026."""
+    events, day = [], datetime(2026, 10, 19, tzinfo=LOCAL_TZ)
+    while len(events) < days * per_day:
+        if day.weekday() < 5:
+            for slot in range(per_day):
+                events.append(google_event(len(events), day.replace(hour=8 + slot * 2)))
+        day += timedelta(days=1)
+    return events
+
+
+def main():
+    events = _calendar()
+    upcoming = events[:10]
+    slots = [
+        {"start": (start := datetime(2026, 11, 3, 8, tzinfo=LOCAL_TZ) + timedelta(hours=h)).isoformat(),
+         "end": (start + timedelta(hours=1)).isoformat()}
+        for h in range(10)
+    ]
+    broker = {"broker_id": "ana", "broker_name": "Ana Souza", **slots[0]}
+    batch = [{"index": i, "ok": True, "event_id": events[i]["id"]} for i in range(20)]
+
+    cases = [
+        # (ferramenta, retorno antigo, retorno novo)
+        ("list_upcoming_events (10)", [
+            {
+                "start": e["start"]["dateTime"],
+                "end": e["end"]["dateTime"],
+                "status": e["status"],
+                "title": e["summary"],
+            }
+            for e in upcoming
+        ], shape_output(upcoming, EVENT_OUTPUT)),
+        ("search_calendar_events (10)", upcoming, shape_output(upcoming, SEARCH_OUTPUT)),
+        ("search_calendar_events (120)", events, shape_output(events, SEARCH_OUTPUT)),
+        ("find_available_slots (10)", slots, shape_output(slots, SLOT_OUTPUT)),
+        ("assign_broker", broker, shape_output(broker, BROKER_OUTPUT)),
+        ("bulk_create_calendar_events (20)", batch, shape_output(batch, BATCH_OUTPUT)),
+    ]
+
+    print(f"{'ferramenta':<34} {'antes':>7} {'depois':>7} {'redução':>8}")
+    for name, before, after in cases:
+        before_tokens = _tokens(msg_content_output(before))
+        after_tokens = _tokens(msg_content_output(after))
+        print(f"{name:<34} {before_tokens:>7} {after_tokens:>7} {1 - after_tokens / before_tokens:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Fixtures compartilhadas pelos testes (tests/). Na raiz do repositório para o pytest incluí-la no
+sys.path, como os módulos do projeto (sem pacotes).
+"""
+import pytest
+
+from API import brokers, event_cache, google_auth
+from bench.fakes import FakeCalendarService
+
+
+@pytest.fixture
+def fake_calendar():
+    """Google Calendar em memória (bench/fakes.py) no lugar do serviço real, com os caches zerados."""
+    previous = google_auth.__dict__.get("service")
+    service = FakeCalendarService(latency=0.01)
+    google_auth.service = service
+    event_cache._caches.clear()
+    brokers._busy_cache.clear()
+    yield service
+    event_cache._caches.clear()
+    brokers._busy_cache.clear()
+    if previous is None:
+        google_auth.__dict__.pop("service", None)
+    else:
+        google_auth.service = previous
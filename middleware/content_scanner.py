@@ -0,0 +1,210 @@
+import re
+
+from langchain.agents.middleware import AgentMiddleware, PIIDetectionError
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+# Detectores compilados em uma única expressão regular (um grupo nomeado por tipo): cada mensagem é
+# percorrida uma vez só, qualquer que seja o número de detectores. A ordem das alternativas decide
+# empates na mesma posição (ex.: e-mail antes de URL).
+DANGEROUS_CODE_PATTERN = r"rm\s+-rf\s+/|<script>|powershell\.exe|curl\s+http|DROP\s+TABLE|chmod\s+\+x"
+EMAIL_PATTERN = r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"
+URL_PATTERN = r"\b(?i:https?://|www\.)[^\s<>\"'()\[\]]+[^\s<>\"'()\[\].,;:!?]"
+# Sequências numéricas candidatas a CPF, CNPJ ou telefone; o tipo é decidido em classify_number.
+NUMBER_PATTERN = r"(?<![\w@])\+?\(?\d[\d\s().\-/]{7,22}\d(?![\w@])"
+
+PHONE_RE = re.compile(r"(?:\+?55[\s.-]?)?(?:\(\d{2}\)|\d{2})[\s.-]?9?\d{4}[\s.-]?\d{4}")
+CPF_RE = re.compile(r"\d{3}\.?\d{3}\.?\d{3}-?\d{2}")
+CNPJ_RE = re.compile(r"\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}")
+
+SCANNER_PATTERN = re.compile(
+    f"(?P<dangerous_code>{DANGEROUS_CODE_PATTERN})"
+    f"|(?P<email>{EMAIL_PATTERN})"
+    f"|(?P<url>{URL_PATTERN})"
+    f"|(?P<number>{NUMBER_PATTERN})"
+)
+
+# Tipos bloqueados na entrada do cliente e tipos ocultados nas respostas do agente.
+BLOCK_ON_INPUT = frozenset({"dangerous_code"})
+REDACT_ON_OUTPUT = frozenset({"email", "url", "cpf", "cnpj", "phone"})
+
+# Quantas "palavras" (trechos separados por espaço) o stream segura no fim do buffer: um telefone
+# como "+55 (11) 98765-4321" ocupa três.
+STREAM_HOLD_WORDS = 3
+
+
+def _check_digits(digits, weights):
+    total = sum(int(d) * w for d, w in zip(digits, weights))
+    rest = total % 11
+    return "0" if rest < 2 else str(11 - rest)
+
+
+def is_valid_cpf(digits):
+    if len(digits) != 11 or digits == digits[0] * 11:
+        return False
+    first = _check_digits(digits[:9], range(10, 1, -1))
+    second = _check_digits(digits[:10], range(11, 1, -1))
+    return digits[9:] == first + second
+
+
+def is_valid_cnpj(digits):
+    if len(digits) != 14 or digits == digits[0] * 14:
+        return False
+    weights = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+    first = _check_digits(digits[:12], weights[1:])
+    second = _check_digits(digits[:13], weights)
+    return digits[12:] == first + second
+
+
+def classify_number(text):
+    """'cpf', 'cnpj', 'phone' ou None para uma sequência numérica encontrada pelo scanner."""
+    digits = re.sub(r"\D", "", text)
+    if CNPJ_RE.fullmatch(text) and is_valid_cnpj(digits):
+        return "cnpj"
+    if CPF_RE.fullmatch(text) and is_valid_cpf(digits):
+        return "cpf"
+    if PHONE_RE.fullmatch(text):
+        return "phone"
+    return None
+
+
+def scan(text):
+    """Percorre 'text' uma vez e retorna [(tipo, início, fim), ...] de tudo o que os detectores acharam."""
+    found = []
+    for match in SCANNER_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == "number":
+            kind = classify_number(match.group())
+            if kind is None:
+                continue
+        found.append((kind, match.start(), match.end()))
+    return found
+
+
+def redact(text, kinds=REDACT_ON_OUTPUT, matches=None):
+    """Substitui cada trecho dos tipos em 'kinds' por [REDACTED_TIPO] (mesmo formato do PIIMiddleware)."""
+    pieces, position = [], 0
+    for kind, start, end in scan(text) if matches is None else matches:
+        if kind in kinds:
+            pieces.append(text[position:start])
+            pieces.append(f"[REDACTED_{kind.upper()}]")
+            position = end
+    if not pieces:
+        return text
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+class StreamRedactor:
+    """
+    Oculta dados pessoais de um texto que chega em pedaços (ex.: on_chat_model_stream), sem esperar a
+    resposta inteira. Cada 'feed' devolve o trecho que já pode ser mostrado, ocultado; as últimas
+    STREAM_HOLD_WORDS palavras ficam retidas porque ainda podem formar um e-mail, URL ou telefone com o
+    próximo pedaço. 'flush' devolve o que sobrou no fim da resposta.
+    """
+
+    def __init__(self, kinds=REDACT_ON_OUTPUT, hold_words=STREAM_HOLD_WORDS):
+        self.kinds = kinds
+        self.hold_words = hold_words
+        self._buffer = ""
+
+    def _cut(self, matches):
+        """Posição até onde o buffer pode ser liberado: antes das palavras retidas e fora de qualquer achado."""
+        cut, words = len(self._buffer), 0
+        while words < self.hold_words:
+            space = max(self._buffer.rfind(" ", 0, cut), self._buffer.rfind("\n", 0, cut))
+            if space < 0:
+                return 0
+            cut, words = space, words + 1
+        for _, start, end in matches:
+            if start < cut < end:
+                cut = start
+        return cut
+
+    def feed(self, chunk):
+        if not chunk:
+            return ""
+        self._buffer += chunk
+        matches = scan(self._buffer)
+        cut = self._cut(matches)
+        if cut == 0:
+            return ""
+        ready, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return redact(ready, self.kinds, [m for m in matches if m[2] <= cut])
+
+    def flush(self):
+        rest, self._buffer = self._buffer, ""
+        return redact(rest, self.kinds) if rest else ""
+
+
+def _map_text(content, func):
+    """Aplica 'func' ao texto de 'content' (string ou lista de blocos), mantendo o formato."""
+    if isinstance(content, str):
+        return func(content)
+    blocks = []
+    for block in content:
+        if isinstance(block, str):
+            blocks.append(func(block))
+        elif isinstance(block, dict) and isinstance(block.get("text"), str):
+            blocks.append({**block, "text": func(block["text"])})
+        else:
+            blocks.append(block)
+    return blocks
+
+
+class ContentScannerMiddleware(AgentMiddleware):
+    """
+    Substitui a pilha de PIIMiddleware (uma passada de regex por detector) por um scanner de passada única.
+    - Entrada: a mensagem nova do cliente é bloqueada (PIIDetectionError) se contiver código perigoso.
+    - Saída: e-mails, URLs, CPF/CNPJ e telefones são ocultados do texto das respostas do agente.
+      Os argumentos das chamadas de ferramenta não são alterados (o agendamento precisa do e-mail).
+    Para respostas transmitidas em streaming, use StreamRedactor sobre os pedaços de texto.
+    """
+
+    def __init__(self, block_on_input=BLOCK_ON_INPUT, redact_on_output=REDACT_ON_OUTPUT):
+        super().__init__()
+        self.block_on_input = block_on_input
+        self.redact_on_output = redact_on_output
+
+    def _check_input(self, state):
+        messages = state["messages"]
+        # Só a primeira chamada do turno traz mensagem nova do cliente; as seguintes vêm de ferramentas.
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return
+
+        def _block(text):
+            blocked = [
+                {"type": kind, "value": text[start:end], "start": start, "end": end}
+                for kind, start, end in scan(text)
+                if kind in self.block_on_input
+            ]
+            if blocked:
+                raise PIIDetectionError(blocked[0]["type"], blocked)
+            return text
+
+        _map_text(messages[-1].content, _block)
+
+    def _redact_output(self, state):
+        messages = state["messages"]
+        if not messages or not isinstance(messages[-1], AIMessage) or not messages[-1].content:
+            return None
+        message = messages[-1]
+        content = _map_text(message.content, lambda text: redact(text, self.redact_on_output))
+        if content == message.content:
+            return None
+        # Mesmo id: o reducer add_messages substitui a mensagem em vez de acrescentar.
+        return {"messages": [message.model_copy(update={"content": content})]}
+
+    def before_model(self, state, runtime):
+        self._check_input(state)
+        return None
+
+    async def abefore_model(self, state, runtime):
+        self._check_input(state)
+        return None
+
+    def after_model(self, state, runtime):
+        return self._redact_output(state)
+
+    async def aafter_model(self, state, runtime):
+        return self._redact_output(state)
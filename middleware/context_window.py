@@ -0,0 +1,155 @@
+import os
+
+from typing_extensions import NotRequired
+
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.constants import TAG_NOSTREAM
+
+
+# Orçamento aproximado de tokens do histórico enviado ao modelo (sem contar o prompt de sistema).
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "4000"))
+# Máximo de mensagens no histórico antes de resumir, mesmo abaixo do orçamento de tokens.
+CONTEXT_MAX_MESSAGES = int(os.getenv("CONTEXT_MAX_MESSAGES", "40"))
+# Quantas mensagens recentes são mantidas na íntegra depois de resumir.
+CONTEXT_KEEP_MESSAGES = int(os.getenv("CONTEXT_KEEP_MESSAGES", "12"))
+
+SUMMARY_PROMPT = """Você mantém o resumo de uma conversa entre uma assistente imobiliária e um cliente (lead).
+
+Resumo atual:
+{summary}
+
+Novas mensagens a incorporar ao resumo:
+{messages}
+
+Reescreva o resumo incorporando as novas mensagens. Preserve nome, e-mail e contatos do cliente, \
+as respostas de Orçamento, Autoridade, Necessidade e Prazo (BANT), a classificação do lead \
+(curioso ou qualificado), horários propostos ou agendados (com IDs de eventos e corretores) e \
+pendências. Descarte cumprimentos e repetições. Responda apenas com o resumo, em no máximo 200 palavras."""
+
+
+class ContextWindowState(AgentState):
+    # Resumo incremental das mensagens que já saíram da janela do histórico.
+    conversation_summary: NotRequired[str]
+
+
+def _format_for_summary(messages):
+    lines = []
+    for message in messages:
+        text = message.text
+        if isinstance(message, HumanMessage):
+            lines.append(f"Cliente: {text}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Resultado de {message.name or 'ferramenta'}: {text}")
+        elif isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                lines.append(f"Assistente chamou {call['name']} com {call['args']}")
+            if text:
+                lines.append(f"Assistente: {text}")
+    return "\n".join(lines)
+
+
+def find_cutoff(messages, keep):
+    """
+    Índice a partir do qual as mensagens ficam na íntegra, mantendo ao menos as 'keep' últimas.
+    Prefere cortar no início de uma mensagem do cliente; nunca separa uma chamada de ferramenta
+    (AIMessage com tool_calls) dos seus ToolMessage.
+    """
+    cutoff = len(messages) - keep
+    if cutoff <= 0:
+        return 0
+
+    for index in range(cutoff, 0, -1):
+        if isinstance(messages[index], HumanMessage):
+            return index
+
+    # Sem mensagem do cliente antes do corte (ex.: uma sequência longa de ferramentas):
+    # recua até a AIMessage que originou os ToolMessage do início da janela.
+    while cutoff > 0 and isinstance(messages[cutoff], ToolMessage):
+        cutoff -= 1
+    return cutoff
+
+
+class ContextWindowMiddleware(AgentMiddleware):
+    """
+    Mantém o histórico enviado ao modelo dentro de um orçamento de tokens.
+    Quando o histórico passa de 'max_tokens' ou de 'max_messages', as mensagens mais antigas são
+    incorporadas a um resumo incremental salvo no estado da conversa ('conversation_summary') e
+    removidas do histórico; as 'keep_messages' mais recentes continuam na íntegra.
+    O resumo é enviado ao modelo logo antes do histórico, depois do prompt de sistema.
+    """
+
+    state_schema = ContextWindowState
+
+    def __init__(
+        self,
+        model,
+        max_tokens=CONTEXT_MAX_TOKENS,
+        max_messages=CONTEXT_MAX_MESSAGES,
+        keep_messages=CONTEXT_KEEP_MESSAGES,
+        token_counter=count_tokens_approximately,
+    ):
+        super().__init__()
+        self.model = model
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.keep_messages = keep_messages
+        self.token_counter = token_counter
+
+    def _should_fold(self, messages):
+        return (
+            len(messages) > self.max_messages
+            or self.token_counter(messages) > self.max_tokens
+        )
+
+    def _prepare(self, state):
+        messages = state["messages"]
+        if not self._should_fold(messages):
+            return None
+        cutoff = find_cutoff(messages, self.keep_messages)
+        if cutoff == 0:
+            return None
+        prompt = SUMMARY_PROMPT.format(
+            summary=state.get("conversation_summary") or "(vazio)",
+            messages=_format_for_summary(messages[:cutoff]),
+        )
+        return messages[:cutoff], prompt
+
+    @staticmethod
+    def _update(folded, summary):
+        return {
+            "conversation_summary": summary.strip(),
+            "messages": [RemoveMessage(id=message.id) for message in folded],
+        }
+
+    def before_model(self, state, runtime):
+        prepared = self._prepare(state)
+        if prepared is None:
+            return None
+        folded, prompt = prepared
+        # 'nostream' evita que o texto do resumo apareça no streaming de tokens para o cliente.
+        response = self.model.invoke(prompt, config={"tags": [TAG_NOSTREAM]})
+        return self._update(folded, response.text)
+
+    async def abefore_model(self, state, runtime):
+        prepared = self._prepare(state)
+        if prepared is None:
+            return None
+        folded, prompt = prepared
+        response = await self.model.ainvoke(prompt, config={"tags": [TAG_NOSTREAM]})
+        return self._update(folded, response.text)
+
+    @staticmethod
+    def _with_summary(request):
+        summary = request.state.get("conversation_summary")
+        if not summary:
+            return request
+        note = HumanMessage(content=f"[RESUMO_DA_CONVERSA_ATÉ_AQUI]\n{summary}")
+        return request.override(messages=[note, *request.messages])
+
+    def wrap_model_call(self, request, handler):
+        return handler(self._with_summary(request))
+
+    async def awrap_model_call(self, request, handler):
+        return await handler(self._with_summary(request))
@@ -0,0 +1,269 @@
+import re
+from datetime import datetime
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.config import get_config
+
+
+# Extração da ficha BANT a partir das mensagens novas de cada turno, sem chamar o modelo:
+# o texto do lead passa por expressões regulares e os argumentos que o próprio agente já estruturou
+# nas chamadas de ferramenta ('search_properties', 'assign_broker', 'create_calendar_event')
+# completam e corrigem o que foi lido do texto.
+
+_NUMBER_WORDS = {
+    "um": 1, "uma": 1, "dois": 2, "duas": 2, "tres": 3, "três": 3, "quatro": 4, "cinco": 5,
+    "seis": 6, "sete": 7, "oito": 8, "nove": 9, "dez": 10, "doze": 12,
+}
+_NUMBER = r"(\d+(?:[.,]\d+)?|" + "|".join(_NUMBER_WORDS) + ")"
+
+_AMOUNT = r"\d[\d.]*(?:,\d+)?"
+_UNIT = r"mil\b|milh(?:ão|ao|ões|oes)\b|k\b"
+# Valores em reais: com "R$" ou com unidade ("500 mil", "1,2 milhão", "500k").
+MONEY_RE = re.compile(
+    rf"R\$\s*(?P<brl>{_AMOUNT})\s*(?P<brl_unit>{_UNIT})?|\b(?P<num>{_AMOUNT})\s*(?P<unit>{_UNIT})",
+    re.IGNORECASE,
+)
+# "entre 400 e 500 mil", "entre R$ 2.500 e R$ 3.000": a unidade do segundo valor vale para o primeiro.
+BUDGET_RANGE_RE = re.compile(
+    rf"\bentre\s+(?:R\$\s*)?(?P<low>{_AMOUNT})\s*(?P<low_unit>{_UNIT})?\s+e\s+"
+    rf"(?P<high_currency>R\$\s*)?(?P<high>{_AMOUNT})\s*(?P<high_unit>{_UNIT})?",
+    re.IGNORECASE,
+)
+BUDGET_MIN_CONTEXT_RE = re.compile(r"(a partir d[eo]|m[ií]nimo|pelo menos|acima d[eo])\W*$", re.IGNORECASE)
+
+TIMELINE_RE = re.compile(
+    r"\b(?:em|nos pr[oó]ximos|nas pr[oó]ximas|daqui a|dentro de|at[eé])\s+(?:uns\s+|umas\s+|cerca de\s+|mais ou menos\s+)?"
+    + _NUMBER + r"\s+(dias?|semanas?|m[eê]s(?:es)?|anos?)\b",
+    re.IGNORECASE,
+)
+TIMELINE_PHRASES = (
+    (re.compile(r"\b(urgente|pra ontem|para ontem|o quanto antes|imediat\w+|essa semana|esta semana)\b", re.I), 0.5),
+    (re.compile(r"\b(m[eê]s que vem|pr[oó]ximo m[eê]s)\b", re.I), 1.0),
+    (re.compile(r"\b(ano que vem|pr[oó]ximo ano)\b", re.I), 12.0),
+)
+END_OF_YEAR_RE = re.compile(r"\b(fim|final) d[oe] ano\b", re.IGNORECASE)
+CURIOUS_RE = re.compile(
+    r"\b(s[oó] (?:olhando|pesquisando|dando uma olhada)|sem pressa|n[aã]o tenho pressa|"
+    r"dando uma olhada|s[oó] curiosidade|ainda n[aã]o sei quando)\b",
+    re.IGNORECASE,
+)
+
+FINANCING_PATTERNS = (
+    (re.compile(r"carta de cr[eé]dito", re.I), "carta_de_credito"),
+    (re.compile(r"\bfinanci(?:amento|ar|ado)\b", re.I), "financiamento"),
+    (re.compile(r"\b(?:[àa] vista|dinheiro guardado)\b", re.I), "a_vista"),
+)
+AUTHORITY_PATTERNS = (
+    (re.compile(r"\b(?:para|pra|pro) (?:um amigo|uma amiga|minha m[aã]e|meu pai|meu filho|minha filha|um cliente)\b", re.I), "terceiro"),
+    (re.compile(r"\b(?:minha esposa|meu marido|minha mulher|meu esposo|meu noivo|minha noiva|meu s[oó]cio|"
+                r"decidir juntos|a gente decide|com a fam[ií]lia)\b", re.I), "compartilhada"),
+    (re.compile(r"\b(?:eu decido|eu que decido|a decis[aã]o [eé] minha|s[oó] eu)\b", re.I), "propria"),
+)
+TRANSACTION_PATTERNS = (
+    (re.compile(r"\b(?:alug(?:ar|uel|o)|loca[çc][aã]o)\b", re.I), "aluguel"),
+    (re.compile(r"\b(?:compr(?:ar|a|o)|financi\w+|carta de cr[eé]dito)\b", re.I), "venda"),
+)
+BEDROOMS_RE = re.compile(_NUMBER + r"\s+(?:quartos?|dormit[oó]rios?|dorms?|qts?)\b", re.IGNORECASE)
+PROPERTY_TYPE_RE = re.compile(r"\b(apartamento|ap[eê]?|casa|kitnet|studio|est[uú]dio|cobertura|sobrado|terreno|sala comercial)\b", re.I)
+PET_RE = re.compile(r"\b(pets?|cachorros?|gatos?|cães|animais|animal de estima[çc][aã]o)\b", re.IGNORECASE)
+
+_PROPERTY_TYPES = {"ap": "apartamento", "ape": "apartamento", "apê": "apartamento", "estudio": "studio", "estúdio": "studio"}
+
+
+def _number(text):
+    text = text.lower()
+    if text in _NUMBER_WORDS:
+        return float(_NUMBER_WORDS[text])
+    return float(text.replace(",", "."))
+
+
+def _money(amount, unit=None):
+    """Valor em reais: ('500', 'mil') -> 500000; ('3.500', None) -> 3500; ('1,2', 'milhão') -> 1200000."""
+    unit = (unit or "").lower()
+    if unit:
+        value = float(amount.replace(",", "."))
+    else:
+        value = float(amount.replace(".", "").replace(",", "."))
+    if unit in ("mil", "k"):
+        value *= 1_000
+    elif unit.startswith("milh"):
+        value *= 1_000_000
+    return value
+
+
+def _timeline_months(amount, unit):
+    unit = unit.lower()
+    if unit.startswith("dia"):
+        return round(amount / 30, 2)
+    if unit.startswith("semana"):
+        return round(amount / 4.3, 2)
+    if unit.startswith("ano"):
+        return amount * 12
+    return amount
+
+
+def extract_from_text(text, now=None):
+    """Campos da ficha encontrados em uma mensagem do lead (só os que aparecem nela)."""
+    found = {}
+
+    budget_range = next(
+        (m for m in BUDGET_RANGE_RE.finditer(text) if m.group("high_unit") or m.group("high_currency")), None
+    )
+    if budget_range:
+        high_unit = budget_range.group("high_unit")
+        found["budget_min"] = _money(budget_range.group("low"), budget_range.group("low_unit") or high_unit)
+        found["budget_max"] = _money(budget_range.group("high"), high_unit)
+    else:
+        for match in MONEY_RE.finditer(text):
+            if match.group("brl"):
+                value = _money(match.group("brl"), match.group("brl_unit"))
+            else:
+                value = _money(match.group("num"), match.group("unit"))
+            before = text[max(0, match.start() - 30):match.start()]
+            found["budget_min" if BUDGET_MIN_CONTEXT_RE.search(before) else "budget_max"] = value
+
+    for pattern, value in FINANCING_PATTERNS:
+        if pattern.search(text):
+            found["financing"] = value
+            break
+    for pattern, value in AUTHORITY_PATTERNS:
+        if pattern.search(text):
+            found["authority"] = value
+            break
+    for pattern, value in TRANSACTION_PATTERNS:
+        if pattern.search(text):
+            found["transaction"] = value
+            break
+
+    bedrooms = BEDROOMS_RE.search(text)
+    if bedrooms:
+        found["bedrooms"] = int(_number(bedrooms.group(1)))
+    property_type = PROPERTY_TYPE_RE.search(text)
+    if property_type:
+        name = property_type.group(1).lower()
+        found["property_type"] = _PROPERTY_TYPES.get(name, name)
+    if PET_RE.search(text):
+        found["pet_friendly"] = True
+
+    timeline = TIMELINE_RE.search(text)
+    if timeline:
+        found["timeline_months"] = _timeline_months(_number(timeline.group(1)), timeline.group(2))
+    else:
+        for pattern, months in TIMELINE_PHRASES:
+            if pattern.search(text):
+                found["timeline_months"] = months
+                break
+        else:
+            if END_OF_YEAR_RE.search(text):
+                now = now or datetime.now()
+                found["timeline_months"] = float(max(12 - now.month, 0) + 1)
+    if CURIOUS_RE.search(text) and "timeline_months" not in found:
+        found["curious"] = True
+    return found
+
+
+def extract_from_tool_call(name, args):
+    """Campos da ficha nos argumentos que o agente passou a uma ferramenta."""
+    found = {}
+    if name == "search_properties":
+        if args.get("max_price") is not None:
+            found["budget_max"] = float(args["max_price"])
+        if args.get("min_price") is not None:
+            found["budget_min"] = float(args["min_price"])
+        if args.get("min_bedrooms") is not None:
+            found["bedrooms"] = int(args["min_bedrooms"])
+        if args.get("transaction"):
+            found["transaction"] = "aluguel" if "alug" in str(args["transaction"]).lower() else "venda"
+        if args.get("pet_friendly"):
+            found["pet_friendly"] = True
+        if args.get("neighborhood"):
+            found["neighborhoods"] = [n.strip() for n in str(args["neighborhood"]).split(",") if n.strip()]
+    elif name == "assign_broker" and args.get("region"):
+        found["neighborhoods"] = [args["region"]]
+    return found
+
+
+def classify(record):
+    """Status do lead pelos critérios do prompt: prazo E orçamento definidos E necessidade clara."""
+    if record.get("booked_at"):
+        return "agendado"
+    has_budget = record.get("budget_max") is not None or record.get("budget_min") is not None
+    has_timeline = record.get("timeline_months") is not None
+    has_need = bool(record.get("bedrooms") or record.get("property_type") or record.get("neighborhoods"))
+    if has_budget and has_timeline and has_need:
+        return "qualificado"
+    if record.get("curious"):
+        return "curioso"
+    return "em_qualificacao"
+
+
+def _new_messages(messages, last_message_id):
+    """Mensagens depois de 'last_message_id'; se ela já saiu do histórico (resumo), as do último turno do lead."""
+    if last_message_id:
+        for i in range(len(messages) - 1, -1, -1):
+            if messages[i].id == last_message_id:
+                return messages[i + 1:]
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return messages[i:]
+    return messages
+
+
+def update_record(record, messages, now=None):
+    """
+    Aplica à ficha 'record' (dict, pode ser vazio) só as mensagens novas desde 'last_message_id'.
+    Valores novos substituem os antigos; o que não aparece nas mensagens novas é mantido.
+    Retorna a ficha atualizada, ou None se não havia mensagem nova.
+    """
+    new = _new_messages(messages, record.get("last_message_id"))
+    if not new:
+        return None
+    record = dict(record)
+    # "curioso" não tem coluna própria: vem do status gravado no turno anterior.
+    record.setdefault("curious", record.get("status") == "curioso")
+    calls = {}
+    for message in new:
+        if isinstance(message, HumanMessage):
+            found = extract_from_text(message.text, now)
+            if "timeline_months" in found:
+                record["curious"] = False
+            record.update(found)
+        elif isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                calls[call["id"]] = call
+                record.update(extract_from_tool_call(call["name"], call["args"]))
+        elif isinstance(message, ToolMessage) and message.name == "create_calendar_event":
+            call = calls.get(message.tool_call_id)
+            if call and message.status != "error" and not message.text.startswith("Erro"):
+                record["booked_at"] = call["args"].get("start_time")
+    record["status"] = classify(record)
+    record["last_message_id"] = new[-1].id
+    record["turns"] = (record.get("turns") or 0) + sum(isinstance(m, HumanMessage) for m in new)
+    return record
+
+
+class LeadStateMiddleware(AgentMiddleware):
+    """
+    Atualiza a ficha de qualificação (BANT) do lead no fim de cada execução do agente, lendo só as
+    mensagens novas do turno, e grava em 'store' (storage/lead_state.py). Turnos parados em um interrupt
+    de aprovação são processados quando a conversa é retomada.
+    """
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    async def aafter_agent(self, state, runtime):
+        thread_id = get_config().get("configurable", {}).get("thread_id")
+        if thread_id is None:
+            return None
+        try:
+            record = await self.store.get(thread_id) or {"thread_id": thread_id}
+            updated = update_record(record, state["messages"])
+            if updated is not None:
+                await self.store.put(updated)
+        except Exception as e:
+            # A ficha é auxiliar: um erro aqui não pode derrubar a resposta ao lead.
+            print(f"Erro ao atualizar a ficha do lead '{thread_id}': {e}")
+        return None
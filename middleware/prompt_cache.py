@@ -0,0 +1,110 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import SystemMessage
+
+
+# Validade, em segundos, do cache de contexto criado no Gemini. Ele é recriado um pouco antes de expirar.
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))
+PROMPT_CACHE_RENEW_MARGIN = 120
+# Depois de uma falha ao criar o cache, espera esse tempo antes de tentar de novo (sem cache nesse meio-tempo).
+PROMPT_CACHE_RETRY_AFTER = 300
+
+
+def prefix_key(system_message, tools):
+    """Identifica o prefixo estático da chamada (prompt de sistema + ferramentas)."""
+    digest = hashlib.sha256((system_message.text if system_message else "").encode())
+    for tool in tools:
+        digest.update(repr(tool if isinstance(tool, dict) else tool.name).encode())
+    return digest.hexdigest()
+
+
+def gemini_context_cache(model, system_message, tools, ttl):
+    """
+    Registra o prompt de sistema e as ferramentas como cache de contexto no Gemini e retorna uma cópia
+    do modelo apontando para ele. Retorna None para modelos que não são do Gemini.
+    """
+    try:
+        from langchain_google_genai import ChatGoogleGenerativeAI, create_context_cache
+    except ImportError:
+        return None
+    if not isinstance(model, ChatGoogleGenerativeAI):
+        return None
+
+    name = create_context_cache(
+        model,
+        [system_message or SystemMessage(content="")],
+        tools=list(tools) or None,
+        ttl=f"{ttl}s",
+    )
+    return model.model_copy(update={"cached_content": name})
+
+
+class PromptCacheMiddleware(AgentMiddleware):
+    """
+    Envia o prefixo estático (prompt de sistema + ferramentas) ao provedor uma única vez, como cache de
+    contexto, e faz as chamadas seguintes referenciarem o cache em vez de reenviá-lo.
+    Com o cache ativo a chamada vai sem 'system_message' e sem ferramentas (o Gemini recusa os dois junto
+    com 'cached_content'). Se o modelo não tem suporte ou a criação falha, a chamada segue sem cache.
+
+    'cache_factory(model, system_message, tools, ttl)' cria o cache e retorna o modelo que o usa
+    (ou None); o padrão é o do Gemini, e os benchmarks usam um substituto local.
+    Deve ser o último middleware da lista, para enxergar o prompt e as ferramentas finais.
+    """
+
+    def __init__(self, cache_factory=gemini_context_cache, ttl=PROMPT_CACHE_TTL):
+        super().__init__()
+        self.cache_factory = cache_factory
+        self.ttl = ttl
+        # (id do modelo, chave do prefixo) -> (modelo com cache ou None, válido até)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, request):
+        key = (id(request.model), prefix_key(request.system_message, request.tools))
+        entry = self._entries.get(key)
+        if entry and entry[1] > time.monotonic():
+            return key, entry[0], True
+        return key, None, False
+
+    def _create(self, key, request):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            try:
+                cached = self.cache_factory(request.model, request.system_message, request.tools, self.ttl)
+                if cached is None:
+                    # Modelo sem suporte a cache: não adianta tentar de novo.
+                    valid_until = float("inf")
+                else:
+                    valid_until = time.monotonic() + self.ttl - PROMPT_CACHE_RENEW_MARGIN
+            except Exception as e:
+                print(f"[cache de contexto] Não foi possível criar o cache do prompt: {e}")
+                cached = None
+                valid_until = time.monotonic() + PROMPT_CACHE_RETRY_AFTER
+            self._entries[key] = (cached, valid_until)
+            return cached
+
+    @staticmethod
+    def _use(request, cached):
+        if cached is None:
+            return request
+        return request.override(model=cached, system_message=None, tools=[])
+
+    def wrap_model_call(self, request, handler):
+        key, cached, found = self._lookup(request)
+        if not found:
+            cached = self._create(key, request)
+        return handler(self._use(request, cached))
+
+    async def awrap_model_call(self, request, handler):
+        key, cached, found = self._lookup(request)
+        if not found:
+            # A criação do cache é uma chamada HTTP síncrona: roda fora do event loop.
+            cached = await asyncio.to_thread(self._create, key, request)
+        return await handler(self._use(request, cached))
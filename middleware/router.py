@@ -0,0 +1,230 @@
+import os
+import re
+import math
+import unicodedata
+from collections import Counter
+
+from langchain.agents.middleware import AgentMiddleware, ModelResponse
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
+
+from telemetry.metrics import ROUTER_DECISIONS
+
+
+# Similaridade mínima (cosseno TF-IDF) com a intenção para responder pelo caminho rápido.
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "0.6"))
+# Mensagens com mais palavras que isso sempre vão para o agente completo.
+ROUTER_MAX_WORDS = 12
+
+# Exemplos de cada intenção. "agente" reúne o que precisa do agente completo (qualificação,
+# imóveis, agenda); as demais são respondidas sem o modelo principal.
+INTENT_EXAMPLES = {
+    "saudacao": (
+        "oi", "olá", "ola tudo bem", "bom dia", "boa tarde", "boa noite", "oi tudo bem?", "e aí",
+        "opa", "oie", "oii", "eae", "olá, boa tarde", "oi bom dia", "hello", "alô", "oi, voltei",
+    ),
+    "agradecimento": (
+        "obrigado", "obrigada", "muito obrigado", "valeu", "vlw", "obg", "brigado", "agradeço",
+        "obrigado pela ajuda", "valeu mesmo", "show, obrigado", "perfeito, obrigada", "muito obrigada pela atenção",
+    ),
+    "despedida": (
+        "tchau", "até mais", "até logo", "falou", "até amanhã", "boa noite, até mais", "depois eu volto",
+        "tenho que ir", "até breve", "fui",
+    ),
+    "horario_atendimento": (
+        "qual o horário de atendimento?", "qual o horario de atendimento", "que horas vocês abrem?",
+        "que horas vocês fecham?", "vocês atendem no sábado?", "até que horas vocês atendem?",
+        "qual o horário de funcionamento?", "vocês abrem domingo?", "horário de atendimento",
+        "funcionam no fim de semana?", "atendem feriado?",
+    ),
+    "agente": (
+        "quero comprar um apartamento", "estou procurando uma casa para alugar", "quero agendar uma visita",
+        "pode ser terça de manhã", "sim", "pode ser", "quero sim", "não, só olhando", "tenho um cachorro",
+        "meu orçamento é de 500 mil", "vou financiar", "já tenho carta de crédito", "quais horários livres?",
+        "quais horários vocês têm amanhã?", "quero marcar com o corretor", "preciso de 2 quartos",
+        "no centro", "quero mudar em 3 meses", "tem apartamento no bairro jardins?", "quanto custa?",
+        "me mostra opções", "quero remarcar a visita", "cancela o horário", "prefiro à tarde",
+        "sou eu que decido", "estou só pesquisando", "quero investir", "aceita pet?", "tem vaga de garagem?",
+        "tenho interesse", "quero saber mais", "quero mais informações", "me fala mais", "ok", "beleza",
+        "não sei ainda", "talvez", "não", "quem é você?", "e o condomínio?", "perfeito", "show", "combinado",
+        "fechado", "ótimo", "pode sim", "entendi",
+    ),
+}
+
+# Termos que sempre levam ao agente completo (números, agenda, imóveis, dinheiro).
+AGENT_TERMS = re.compile(
+    r"\d|\br\$|\b(?:agend|marc|remarc|cancel|visit|livre|dispon|quart|apart|ap\b|casa|imove|alug|compr|"
+    r"financ|orcament|mil\b|bairro|corretor|vaga|pet|cachorr|gat[oa]|prazo|mudar|mudanca|terca|quarta|"
+    r"quinta|sexta|segunda|amanha|semana que vem)",
+)
+
+REPLIES = {
+    "saudacao": "Olá! Sou a Assistente de Oportunidades e vou te ajudar a encontrar o imóvel ideal.",
+    "saudacao_retorno": "Olá de novo! Que bom falar com você.",
+    "agradecimento": "Imagina, fico feliz em ajudar!",
+    "despedida": "Foi um prazer conversar com você! Quando quiser retomar, é só mandar uma mensagem por aqui.",
+    "horario_atendimento": (
+        "Nossos corretores atendem de segunda a sexta-feira, das 08:00 às 18:00. "
+        "Por aqui eu respondo a qualquer hora."
+    ),
+}
+OPENING_QUESTION = "Você está procurando um imóvel para comprar ou para alugar?"
+FOLLOW_UP_PREFIX = "Voltando à nossa conversa: "
+
+LIGHT_PROMPT = """Você é a Assistente de Oportunidades de uma imobiliária, conversando com um cliente.
+Responda à mensagem do cliente em no máximo duas frases curtas, em português, com simpatia e sem \
+inventar informações sobre imóveis, preços ou horários. Termine exatamente com esta pergunta: {follow_up}"""
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return text.lower()
+
+
+def features(text):
+    """Palavras e trigramas de caracteres de cada palavra (tolera erros de digitação e abreviações)."""
+    counts = Counter()
+    for word in re.findall(r"\w+", _normalize(text)):
+        counts[word] += 1
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            counts["~" + padded[i:i + 3]] += 1
+    return counts
+
+
+def _unit(vector):
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+class TurnClassifier:
+    """
+    Classificador local (TF-IDF + exemplo mais próximo, sem rede) da intenção da mensagem do lead.
+    'examples' é {intenção: frases de exemplo}.
+    """
+
+    def __init__(self, examples=INTENT_EXAMPLES):
+        documents = [(label, features(text)) for label, texts in examples.items() for text in texts]
+        frequency = Counter(term for _, counts in documents for term in counts)
+        total = len(documents)
+        self.idf = {term: math.log((1 + total) / (1 + n)) + 1 for term, n in frequency.items()}
+        self.examples = [(label, self._vector(counts)) for label, counts in documents]
+
+    def _vector(self, counts):
+        return _unit({term: n * self.idf[term] for term, n in counts.items() if term in self.idf})
+
+    def classify(self, text):
+        """(intenção, similaridade) do exemplo mais próximo."""
+        vector = self._vector(features(text))
+        best = ("agente", 0.0)
+        for label, example in self.examples:
+            score = sum(value * example.get(term, 0.0) for term, value in vector.items())
+            if score > best[1]:
+                best = (label, score)
+        return best
+
+
+def route_turn(messages, classifier, min_score=ROUTER_MIN_SCORE):
+    """
+    Intenção a responder pelo caminho rápido, ou None para seguir no agente completo.
+    Só a primeira chamada ao modelo de um turno (última mensagem do lead) é roteada.
+    """
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return None
+    text = messages[-1].text
+    if len(text.split()) > ROUTER_MAX_WORDS or AGENT_TERMS.search(_normalize(text)):
+        return None
+    label, score = classifier.classify(text)
+    if label == "agente" or score < min_score:
+        return None
+    return label
+
+
+def pending_question(messages):
+    """Última pergunta da assistente antes da mensagem atual do lead, ou None."""
+    for message in reversed(messages[:-1]):
+        if isinstance(message, AIMessage) and message.text and not message.tool_calls:
+            questions = re.findall(r"[^.!?\n]*\?", message.text)
+            return questions[-1].strip() if questions else None
+    return None
+
+
+def fast_reply(intent, messages):
+    """Resposta pronta da intenção, terminando com a pergunta pendente (ou a de abertura)."""
+    returning = any(isinstance(m, AIMessage) for m in messages[:-1])
+    text = REPLIES["saudacao_retorno" if intent == "saudacao" and returning else intent]
+    question = pending_question(messages)
+    if intent == "despedida":
+        return text
+    if question:
+        return f"{text} {FOLLOW_UP_PREFIX}{question}"
+    return f"{text} {OPENING_QUESTION}"
+
+
+class TurnRouterMiddleware(AgentMiddleware):
+    """
+    Roteia cada mensagem do lead antes da chamada ao modelo principal. Cumprimentos, agradecimentos,
+    despedidas e a pergunta do horário de atendimento (classificados localmente por TurnClassifier)
+    são respondidos por uma resposta pronta ou, com 'light_model', por um modelo menor sem prompt
+    completo nem ferramentas; o resto segue para o agente completo. A resposta entra no histórico da
+    conversa como qualquer outra (mesmo checkpoint, mesmos middlewares de saída).
+    """
+
+    def __init__(self, classifier=None, light_model=None, min_score=ROUTER_MIN_SCORE):
+        super().__init__()
+        self.classifier = classifier or TurnClassifier()
+        self.light_model = light_model
+        self.min_score = min_score
+
+    def _route(self, request):
+        messages = request.state.get("messages") or request.messages
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return None, messages
+        intent = route_turn(messages, self.classifier, self.min_score)
+        return intent, messages
+
+    def _light_prompt(self, intent, messages):
+        if self.light_model is None or intent == "horario_atendimento":
+            return None
+        follow_up = pending_question(messages) or OPENING_QUESTION
+        return [SystemMessage(content=LIGHT_PROMPT.format(follow_up=follow_up)), messages[-1]]
+
+    @staticmethod
+    def _response(text):
+        return ModelResponse(result=[AIMessage(content=text)])
+
+    def wrap_model_call(self, request, handler):
+        intent, messages = self._route(request)
+        if intent is None:
+            if messages and isinstance(messages[-1], HumanMessage):
+                ROUTER_DECISIONS.inc(route="agente", intent="agente")
+            return handler(request)
+        prompt = self._light_prompt(intent, messages)
+        if prompt is not None:
+            try:
+                # 'nostream': os tokens do modelo leve não vão ao cliente; ele recebe só a mensagem de
+                # _response (com id próprio), uma vez, como a resposta pronta.
+                reply = self.light_model.invoke(prompt, config={"tags": [TAG_NOSTREAM]})
+                ROUTER_DECISIONS.inc(route="modelo_leve", intent=intent)
+                return self._response(reply.text)
+            except Exception as e:
+                print(f"[roteador] Modelo leve indisponível, usando a resposta pronta: {e}")
+        ROUTER_DECISIONS.inc(route="resposta_pronta", intent=intent)
+        return self._response(fast_reply(intent, messages))
+
+    async def awrap_model_call(self, request, handler):
+        intent, messages = self._route(request)
+        if intent is None:
+            if messages and isinstance(messages[-1], HumanMessage):
+                ROUTER_DECISIONS.inc(route="agente", intent="agente")
+            return await handler(request)
+        prompt = self._light_prompt(intent, messages)
+        if prompt is not None:
+            try:
+                reply = await self.light_model.ainvoke(prompt, config={"tags": [TAG_NOSTREAM]})
+                ROUTER_DECISIONS.inc(route="modelo_leve", intent=intent)
+                return self._response(reply.text)
+            except Exception as e:
+                print(f"[roteador] Modelo leve indisponível, usando a resposta pronta: {e}")
+        ROUTER_DECISIONS.inc(route="resposta_pronta", intent=intent)
+        return self._response(fast_reply(intent, messages))
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+from langchain.agents.middleware import AgentMiddleware
+
+
+# Ferramentas que alteram a agenda. As demais só leem e rodam em paralelo entre si.
+WRITE_TOOLS = frozenset({
+    "create_calendar_event",
+    "update_calendar_event",
+    "delete_calendar_event",
+    "bulk_create_calendar_events",
+    "bulk_update_calendar_events",
+    "bulk_delete_calendar_events",
+})
+
+
+class ToolSchedulerMiddleware(AgentMiddleware):
+    """
+    Ordem de execução das chamadas de ferramenta de um mesmo passo do agente.
+
+    O grafo do create_agent já despacha cada chamada de ferramenta da resposta do modelo como uma
+    tarefa própria, e as ferramentas de leitura (list_/search_/find_available_slots, assign_broker,
+    search_properties) rodam juntas no executor do Google Calendar. As de escrita passam por uma
+    trava por conversa (thread_id): uma de cada vez, na ordem em que aparecem na resposta do modelo
+    (as tarefas começam nessa ordem e a trava atende por ordem de chegada), para que, por exemplo,
+    "apagar o evento antigo e criar o novo" não corra contra si mesmo nem contra a verificação de
+    conflito da outra chamada. Os ToolMessages voltam na ordem original das chamadas de qualquer forma.
+    """
+
+    def __init__(self, write_tools=WRITE_TOOLS):
+        super().__init__()
+        self.write_tools = frozenset(write_tools)
+        self._locks = {}    # thread_id -> [trava, chamadas usando a trava]
+        self._sync_locks = {}
+        self._guard = threading.Lock()
+
+    @staticmethod
+    def _thread_id(request):
+        config = getattr(request.runtime, "config", None) or {}
+        return config.get("configurable", {}).get("thread_id")
+
+    def _acquire_entry(self, table, thread_id, factory):
+        with self._guard:
+            entry = table.get(thread_id)
+            if entry is None:
+                entry = table[thread_id] = [factory(), 0]
+            entry[1] += 1
+            return entry
+
+    def _release_entry(self, table, thread_id, entry):
+        with self._guard:
+            entry[1] -= 1
+            if entry[1] == 0 and table.get(thread_id) is entry:
+                del table[thread_id]
+
+    def wrap_tool_call(self, request, handler):
+        if request.tool_call["name"] not in self.write_tools:
+            return handler(request)
+        thread_id = self._thread_id(request)
+        entry = self._acquire_entry(self._sync_locks, thread_id, threading.Lock)
+        try:
+            with entry[0]:
+                return handler(request)
+        finally:
+            self._release_entry(self._sync_locks, thread_id, entry)
+
+    async def awrap_tool_call(self, request, handler):
+        if request.tool_call["name"] not in self.write_tools:
+            return await handler(request)
+        # Nada de 'await' antes da trava: a ordem de chegada é a ordem das chamadas na resposta.
+        thread_id = self._thread_id(request)
+        entry = self._acquire_entry(self._locks, thread_id, asyncio.Lock)
+        try:
+            async with entry[0]:
+                return await handler(request)
+        finally:
+            self._release_entry(self._locks, thread_id, entry)
@@ -0,0 +1,37 @@
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import HumanMessage
+
+
+class TurnContextMiddleware(AgentMiddleware):
+    """
+    Injeta o contexto dinâmico do turno (data/hora, dados do lead) na chamada ao modelo, logo antes
+    da última mensagem do cliente, sem gravá-lo no histórico.
+    Assim o prompt de sistema e o histórico anterior ficam idênticos entre turnos e podem ser
+    reaproveitados pelo cache de contexto do provedor.
+
+    'render' recebe o contexto de execução da chamada (ex.: {"lead_id": ...}, passado em
+    'context=' no invoke/stream) e retorna o texto a injetar.
+    """
+
+    def __init__(self, render):
+        super().__init__()
+        self.render = render
+
+    def _with_context(self, request):
+        lead = request.runtime.context if isinstance(request.runtime.context, dict) else None
+        note = HumanMessage(content=self.render(lead=lead))
+
+        messages = list(request.messages)
+        position = len(messages)
+        for index in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[index], HumanMessage):
+                position = index
+                break
+        messages.insert(position, note)
+        return request.override(messages=messages)
+
+    def wrap_model_call(self, request, handler):
+        return handler(self._with_context(request))
+
+    async def awrap_model_call(self, request, handler):
+        return await handler(self._with_context(request))
@@ -0,0 +1,431 @@
+import io
+import os
+import csv
+import hmac
+import json
+import time
+import weakref
+import asyncio
+
+from aiohttp import web, WSMsgType
+
+from langchain_core.messages import HumanMessage
+from langgraph.types import Command
+
+from agent import build_agent, message_text
+from storage.checkpointer import open_checkpointer
+from streaming.events import StreamEvent, agent_events
+from streaming.sinks import SSESink, SinkGroup, WebSocketSink
+from storage.approvals import ApprovalQueue, expand_decision
+from storage.lead_state import LEAD_STATE_FIELDS, LeadStateStore
+from telemetry.metrics import APPROVAL_WAIT_SECONDS, render_metrics
+from telemetry.tracing import TRACE_CALLBACKS, turn_span
+
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+
+# Limite de turnos do agente rodando ao mesmo tempo no processo inteiro.
+# Dentro de um mesmo lead os turnos são sempre serializados.
+MAX_CONCURRENT_TURNS = int(os.getenv("MAX_CONCURRENT_TURNS", "64"))
+
+# Token das rotas de operador (fila de aprovações e fichas dos leads), enviado no cabeçalho
+# "Authorization: Bearer <token>". Sem ele configurado, essas rotas ficam fechadas.
+OPERATOR_TOKEN = os.getenv("OPERATOR_TOKEN", "")
+
+# Resposta ao lead enquanto uma ação do agente espera a aprovação de um operador.
+AWAITING_APPROVAL_REPLY = (
+    "Só um instante: estou confirmando esse agendamento com a nossa equipe e já te retorno."
+)
+
+
+class LeadSessions:
+    """
+    Atende vários leads com um único grafo compilado.
+    Cada lead usa o próprio 'thread_id' no checkpointer; turnos do mesmo lead rodam um por vez
+    e o total de turnos simultâneos é limitado por um semáforo global.
+    Quando uma ferramenta de escrita precisa de aprovação, o turno termina em um interrupt salvo no
+    checkpoint e a conversa entra na fila 'approvals' até um operador decidir (ver resume_turn).
+    """
+
+    def __init__(self, agent, approvals, max_concurrent_turns=MAX_CONCURRENT_TURNS):
+        self.agent = agent
+        self.approvals = approvals
+        self._turns = asyncio.Semaphore(max_concurrent_turns)
+        # Os locks somem sozinhos quando nenhum turno do lead está em andamento.
+        self._locks = weakref.WeakValueDictionary()
+
+    def _lock_for(self, thread_id):
+        lock = self._locks.get(thread_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[thread_id] = lock
+        return lock
+
+    @staticmethod
+    def config_for(thread_id):
+        return {"configurable": {"thread_id": thread_id}, "callbacks": TRACE_CALLBACKS}
+
+    @staticmethod
+    def context_for(thread_id):
+        """Dados do lead enviados ao modelo a cada turno (ver agent.build_turn_context)."""
+        return {"lead_id": thread_id}
+
+    async def _finish(self, thread_id, result, queued=()):
+        """
+        Põe a conversa na fila se o turno parou em um interrupt (com as mensagens 'queued' ainda não
+        respondidas); retorna o texto para o lead.
+        """
+        interrupts = result.get("__interrupt__")
+        if interrupts:
+            await self.approvals.add(thread_id, interrupts[0].id, interrupts[0].value, queued)
+            return AWAITING_APPROVAL_REPLY
+        return message_text(result["messages"][-1].content)
+
+    async def _message_turn(self, thread_id, texts):
+        """Turno com as mensagens do lead em 'texts'. Quem chama já tem o lock do lead e a vaga no semáforo."""
+        with turn_span(thread_id, "message") as attrs:
+            result = await self.agent.ainvoke(
+                {"messages": [HumanMessage(content=text) for text in texts]},
+                self.config_for(thread_id),
+                context=self.context_for(thread_id),
+            )
+            if result.get("__interrupt__"):
+                attrs["outcome"] = "interrupt"
+            return await self._finish(thread_id, result)
+
+    async def run_turn(self, thread_id, text):
+        """Executa um turno completo e retorna o texto da resposta final."""
+        async with self._lock_for(thread_id), self._turns:
+            # Enquanto há uma aprovação pendente o grafo está parado no interrupt: a mensagem fica
+            # guardada com a aprovação e entra no turno seguinte à decisão (resume_turn).
+            if await self.approvals.queue_message(thread_id, text):
+                return AWAITING_APPROVAL_REPLY
+            return await self._message_turn(thread_id, [text])
+
+    async def stream_turn(self, thread_id, text, sinks):
+        """
+        Executa um turno enviando os eventos (trechos de texto, ferramentas) aos destinos em 'sinks'
+        (streaming/sinks.py), que recebem 'end' ou 'error' no fim.
+        """
+        async with self._lock_for(thread_id), self._turns, SinkGroup(sinks) as group:
+            if await self.approvals.queue_message(thread_id, text):
+                await group.put(StreamEvent("token", AWAITING_APPROVAL_REPLY))
+                return
+            with turn_span(thread_id, "stream") as attrs:
+                async for event in agent_events(
+                    self.agent,
+                    {"messages": [HumanMessage(content=text)]},
+                    self.config_for(thread_id),
+                    group.kinds,
+                    context=self.context_for(thread_id),
+                ):
+                    await group.put(event)
+                    if event.kind == "interrupt":
+                        attrs["outcome"] = "interrupt"
+                        await self.approvals.add(thread_id, event.data["id"], event.data["value"])
+                        await group.put(StreamEvent("token", AWAITING_APPROVAL_REPLY))
+
+    async def continue_turn(self, thread_id):
+        """
+        Termina um turno que ficou pela metade (ex.: o processo caiu no meio da execução), continuando do
+        último checkpoint sem reenviar a mensagem do lead. Retorna o texto da resposta.
+        """
+        async with self._lock_for(thread_id), self._turns:
+            with turn_span(thread_id, "continue") as attrs:
+                result = await self.agent.ainvoke(
+                    None, self.config_for(thread_id), context=self.context_for(thread_id),
+                )
+                if result.get("__interrupt__"):
+                    attrs["outcome"] = "interrupt"
+                return await self._finish(thread_id, result)
+
+    async def resume_turn(self, thread_id, decision):
+        """
+        Aplica a decisão do operador à aprovação pendente da conversa e retoma o grafo a partir do
+        checkpoint. As mensagens que o lead mandou durante a espera entram em seguida, em um turno
+        novo, e a resposta dele vem depois da resposta à decisão.
+        Retorna o texto da resposta, ou None se a conversa não tinha aprovação pendente.
+        """
+        async with self._lock_for(thread_id), self._turns:
+            pending = await self.approvals.get(thread_id)
+            if pending is None:
+                return None
+            APPROVAL_WAIT_SECONDS.observe(time.time() - pending["created_at"])
+            decisions = expand_decision(pending["actions"], decision)
+            with turn_span(thread_id, "resume") as attrs:
+                result = await self.agent.ainvoke(
+                    Command(resume={"decisions": decisions}),
+                    self.config_for(thread_id),
+                    context=self.context_for(thread_id),
+                )
+                await self.approvals.remove(thread_id)
+                if result.get("__interrupt__"):
+                    attrs["outcome"] = "interrupt"
+                reply = await self._finish(thread_id, result, pending["queued"])
+            if pending["queued"] and not result.get("__interrupt__"):
+                reply = f"{reply}\n\n{await self._message_turn(thread_id, pending['queued'])}"
+            return reply
+
+
+SESSIONS = web.AppKey("sessions", LeadSessions)
+LEAD_STATES = web.AppKey("lead_states", LeadStateStore)
+
+
+async def handle_message(request):
+    lead_id = request.match_info["lead_id"]
+    try:
+        payload = await request.json()
+        text = payload["message"]
+    except Exception:
+        return web.json_response(
+            {"error": "Corpo inválido. Envie JSON no formato {\"message\": \"...\"}."},
+            status=400,
+        )
+
+    try:
+        reply = await request.app[SESSIONS].run_turn(lead_id, text)
+    except Exception as e:
+        return web.json_response({"error": f"Erro ao processar a mensagem: {e}"}, status=500)
+
+    return web.json_response({"lead_id": lead_id, "reply": reply})
+
+
+async def handle_stream(request):
+    """Turno transmitido por Server-Sent Events: POST {"message": "..."}, eventos 'token', 'end' ou 'error'."""
+    lead_id = request.match_info["lead_id"]
+    try:
+        payload = await request.json()
+        text = payload["message"]
+    except Exception:
+        return web.json_response(
+            {"error": "Corpo inválido. Envie JSON no formato {\"message\": \"...\"}."},
+            status=400,
+        )
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+    try:
+        await request.app[SESSIONS].stream_turn(lead_id, text, [SSESink(response)])
+    except Exception as e:
+        print(f"[sse] Erro no turno de {lead_id}: {e}")
+    await response.write_eof()
+    return response
+
+
+async def handle_websocket(request):
+    lead_id = request.match_info["lead_id"]
+    sessions = request.app[SESSIONS]
+
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT:
+            continue
+        try:
+            # O erro, se houver, já chega ao cliente como {"type": "error"}.
+            await sessions.stream_turn(lead_id, msg.data, [WebSocketSink(ws)])
+        except Exception as e:
+            print(f"[ws] Erro no turno de {lead_id}: {e}")
+
+    return ws
+
+
+async def handle_list_approvals(request):
+    try:
+        limit = int(request.query.get("limit", "100"))
+    except ValueError:
+        return web.json_response({"error": "'limit' deve ser um número inteiro."}, status=400)
+    pending = await request.app[SESSIONS].approvals.pending(limit)
+    return web.json_response({"pending": pending})
+
+
+async def handle_decide_approvals(request):
+    """
+    Aprova/rejeita em lote: {"decisions": [{"thread_id": "...", "type": "approve"}, ...]}.
+    Cada conversa é retomada em paralelo; o resultado de cada item volta na mesma ordem.
+    """
+    sessions = request.app[SESSIONS]
+    try:
+        payload = await request.json()
+        decisions = list(payload["decisions"])
+        thread_ids = [item["thread_id"] for item in decisions]
+    except Exception:
+        return web.json_response(
+            {"error": "Corpo inválido. Envie JSON no formato {\"decisions\": [{\"thread_id\": \"...\", \"type\": \"approve\"}]}."},
+            status=400,
+        )
+
+    replies = await asyncio.gather(
+        *(sessions.resume_turn(item["thread_id"], item) for item in decisions),
+        return_exceptions=True,
+    )
+
+    results = []
+    for thread_id, reply in zip(thread_ids, replies):
+        if isinstance(reply, Exception):
+            results.append({"thread_id": thread_id, "status": "error", "error": f"Erro ao retomar a conversa: {reply}"})
+        elif reply is None:
+            results.append({"thread_id": thread_id, "status": "not_found"})
+        else:
+            results.append({"thread_id": thread_id, "status": "resumed", "reply": reply})
+    return web.json_response({"results": results})
+
+
+def _lead_filters(query):
+    """Filtros das consultas de fichas a partir da query string. Levanta ValueError com a mensagem de erro."""
+    filters = {"status": query.get("status") or None}
+    for name in ("max_timeline_months", "min_budget", "max_budget", "updated_since"):
+        if query.get(name):
+            try:
+                filters[name] = float(query[name])
+            except ValueError:
+                raise ValueError(f"'{name}' deve ser um número.")
+    return filters
+
+
+async def handle_list_leads(request):
+    """
+    Fichas de qualificação filtradas, ex.: GET /leads?status=qualificado&max_timeline_months=3.
+    Lê só a tabela indexada 'lead_state'; não relê o histórico nem chama o modelo.
+    """
+    try:
+        filters = _lead_filters(request.query)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    try:
+        limit = int(request.query.get("limit", "100"))
+        offset = int(request.query.get("offset", "0"))
+    except ValueError:
+        return web.json_response({"error": "'limit' e 'offset' devem ser números inteiros."}, status=400)
+    store = request.app[LEAD_STATES]
+    leads = await store.query(limit=limit, offset=offset, **filters)
+    return web.json_response({"leads": leads, "counts": await store.counts()})
+
+
+async def handle_export_leads(request):
+    """
+    Exportação em lote das fichas (GET /leads/export?format=jsonl|csv, com os mesmos filtros de /leads),
+    transmitida em páginas para não montar o arquivo inteiro em memória.
+    """
+    try:
+        filters = _lead_filters(request.query)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    export_format = request.query.get("format", "jsonl")
+    if export_format not in ("jsonl", "csv"):
+        return web.json_response({"error": "'format' deve ser 'jsonl' ou 'csv'."}, status=400)
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/csv; charset=utf-8" if export_format == "csv" else "application/x-ndjson",
+        "Content-Disposition": f'attachment; filename="leads.{export_format}"',
+    })
+    await response.prepare(request)
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=LEAD_STATE_FIELDS) if export_format == "csv" else None
+    if writer:
+        writer.writeheader()
+    async for record in request.app[LEAD_STATES].export(**filters):
+        if writer:
+            writer.writerow({**record, "neighborhoods": ";".join(record["neighborhoods"])})
+        else:
+            buffer.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if buffer.tell() >= 64 * 1024:
+            await response.write(buffer.getvalue().encode("utf-8"))
+            buffer.seek(0)
+            buffer.truncate()
+    await response.write(buffer.getvalue().encode("utf-8"))
+    await response.write_eof()
+    return response
+
+
+async def handle_lead_state(request):
+    record = await request.app[LEAD_STATES].get(request.match_info["lead_id"])
+    if record is None:
+        return web.json_response({"error": "Lead sem ficha de qualificação."}, status=404)
+    return web.json_response(record)
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok"})
+
+
+async def handle_metrics(request):
+    """Métricas no formato de texto do Prometheus (turnos, modelo, ferramentas, Calendar e checkpoints)."""
+    return web.Response(
+        body=render_metrics().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+# Rotas de operador: decidem aprovações ou expõem dados de todos os leads; as demais rotas são as
+# do próprio lead (mensagens, stream, WebSocket) e as de infraestrutura (health, metrics).
+OPERATOR_HANDLERS = frozenset({
+    handle_list_approvals, handle_decide_approvals, handle_list_leads, handle_export_leads, handle_lead_state,
+})
+
+
+def operator_auth(token=None):
+    """
+    Middleware que exige o token de operador ('token', padrão OPERATOR_TOKEN) nas rotas de
+    OPERATOR_HANDLERS. Sem token configurado, essas rotas respondem 403.
+    """
+    token = OPERATOR_TOKEN if token is None else token
+    expected = f"Bearer {token}".encode("utf-8")
+
+    @web.middleware
+    async def check(request, handler):
+        if request.match_info.handler not in OPERATOR_HANDLERS:
+            return await handler(request)
+        if not token:
+            return web.json_response(
+                {"error": "Rotas de operador desativadas: configure OPERATOR_TOKEN."}, status=403,
+            )
+        given = request.headers.get("Authorization", "").encode("utf-8")
+        if not hmac.compare_digest(given, expected):
+            return web.json_response(
+                {"error": "Token de operador ausente ou inválido."}, status=401,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return await handler(request)
+
+    return check
+
+
+async def _agent_context(app):
+    """Abre o checkpointer e compila o agente uma única vez para todo o processo."""
+    async with open_checkpointer() as memory:
+        approvals = ApprovalQueue(memory)
+        await approvals.setup()
+        lead_states = LeadStateStore(memory)
+        await lead_states.setup()
+        app[LEAD_STATES] = lead_states
+        app[SESSIONS] = LeadSessions(build_agent(memory, lead_states=lead_states), approvals)
+        print("Agente de Calendário pronto para atender leads.")
+        yield
+
+
+def create_app(operator_token=None, agent_context=_agent_context):
+    if not (OPERATOR_TOKEN if operator_token is None else operator_token):
+        print("[server] OPERATOR_TOKEN não configurado: rotas de aprovação e de fichas desativadas.")
+    app = web.Application(middlewares=[operator_auth(operator_token)])
+    app.cleanup_ctx.append(agent_context)
+    app.add_routes([
+        web.post("/leads/{lead_id}/messages", handle_message),
+        web.post("/leads/{lead_id}/stream", handle_stream),
+        web.get("/leads/{lead_id}/ws", handle_websocket),
+        web.get("/leads", handle_list_leads),
+        web.get("/leads/export", handle_export_leads),
+        web.get("/leads/{lead_id}/state", handle_lead_state),
+        web.get("/approvals", handle_list_approvals),
+        web.post("/approvals/decisions", handle_decide_approvals),
+        web.get("/health", handle_health),
+        web.get("/metrics", handle_metrics),
+    ])
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host=SERVER_HOST, port=SERVER_PORT)
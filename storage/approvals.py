@@ -0,0 +1,130 @@
+import json
+import time
+
+
+# Colunas de pending_approvals, na ordem lida por ApprovalQueue._row.
+_COLUMNS = "thread_id, interrupt_id, request, created_at, queued_messages"
+
+class ApprovalQueue:
+    """
+    Fila de aprovações pendentes, gravada no mesmo banco SQLite do checkpointer.
+    Cada conversa (thread_id) tem no máximo uma aprovação pendente: o pedido de revisão
+    (HITLRequest) do interrupt em que o grafo parou. O estado da conversa continua no
+    checkpoint; a fila só indexa quem está esperando, para listar e retomar em lote.
+    """
+
+    def __init__(self, saver):
+        self.saver = saver
+
+    async def setup(self):
+        async with self.saver.lock:
+            await self.saver.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pending_approvals (
+                    thread_id TEXT PRIMARY KEY,
+                    interrupt_id TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    queued_messages TEXT NOT NULL DEFAULT '[]'
+                )
+                """
+            )
+            # Bancos criados antes da coluna de mensagens guardadas.
+            async with self.saver.conn.execute("PRAGMA table_info(pending_approvals)") as cursor:
+                columns = {row[1] for row in await cursor.fetchall()}
+            if "queued_messages" not in columns:
+                await self.saver.conn.execute(
+                    "ALTER TABLE pending_approvals ADD COLUMN queued_messages TEXT NOT NULL DEFAULT '[]'"
+                )
+            await self.saver.conn.commit()
+
+    async def add(self, thread_id, interrupt_id, request, queued=()):
+        async with self.saver.lock:
+            await self.saver.conn.execute(
+                f"INSERT OR REPLACE INTO pending_approvals ({_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                (
+                    thread_id, interrupt_id, json.dumps(request, ensure_ascii=False, default=str), time.time(),
+                    json.dumps(list(queued), ensure_ascii=False),
+                ),
+            )
+            await self.saver.conn.commit()
+
+    async def queue_message(self, thread_id, text):
+        """Guarda uma mensagem do lead com a aprovação pendente da conversa. Retorna False se não houver uma."""
+        async with self.saver.lock:
+            async with self.saver.conn.execute(
+                "SELECT queued_messages FROM pending_approvals WHERE thread_id = ?", (thread_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return False
+            queued = json.loads(row[0]) + [text]
+            await self.saver.conn.execute(
+                "UPDATE pending_approvals SET queued_messages = ? WHERE thread_id = ?",
+                (json.dumps(queued, ensure_ascii=False), thread_id),
+            )
+            await self.saver.conn.commit()
+        return True
+
+    async def remove(self, thread_id):
+        async with self.saver.lock:
+            await self.saver.conn.execute("DELETE FROM pending_approvals WHERE thread_id = ?", (thread_id,))
+            await self.saver.conn.commit()
+
+    @staticmethod
+    def _row(row):
+        thread_id, interrupt_id, request, created_at, queued = row
+        return {
+            "thread_id": thread_id,
+            "interrupt_id": interrupt_id,
+            "actions": json.loads(request)["action_requests"],
+            "created_at": created_at,
+            "queued": json.loads(queued),
+        }
+
+    async def get(self, thread_id):
+        async with self.saver.conn.execute(
+            f"SELECT {_COLUMNS} FROM pending_approvals WHERE thread_id = ?", (thread_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return self._row(row) if row else None
+
+    async def pending(self, limit=100):
+        """Aprovações pendentes, das mais antigas para as mais novas."""
+        async with self.saver.conn.execute(
+            f"SELECT {_COLUMNS} FROM pending_approvals ORDER BY created_at LIMIT ?", (limit,)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        return [self._row(row) for row in rows]
+
+
+def expand_decision(actions, decision):
+    """
+    Converte a decisão do operador ({"type": "approve"}, {"type": "reject", "message": ...} ou
+    {"type": "edit", "args": {...}}) na lista de decisões esperada pelo HumanInTheLoopMiddleware:
+    uma por ação pendente, na mesma ordem. Na edição, 'args' substitui só os argumentos informados;
+    com mais de uma ação pendente, 'args' é uma lista com as alterações de cada ação, na ordem
+    ({} para manter a ação como está). Levanta ValueError para decisões inválidas.
+    """
+    kind = decision.get("type")
+    if kind == "approve":
+        return [{"type": "approve"} for _ in actions]
+    if kind == "reject":
+        message = decision.get("message") or "Ação rejeitada pelo operador."
+        return [{"type": "reject", "message": message} for _ in actions]
+    if kind == "edit":
+        edits = decision.get("args", {})
+        if isinstance(edits, dict):
+            if len(actions) > 1:
+                # Os mesmos argumentos em ações diferentes dariam a uma ferramenta os dados da outra.
+                raise ValueError(
+                    f"Há {len(actions)} ações pendentes: envie em 'args' uma lista com as alterações de cada uma."
+                )
+            edits = [edits]
+        if len(edits) != len(actions):
+            raise ValueError(f"'args' tem {len(edits)} itens para {len(actions)} ações pendentes.")
+        return [
+            {"type": "edit", "edited_action": {"name": action["name"], "args": {**action["args"], **changes}}}
+            for action, changes in zip(actions, edits)
+        ]
+    raise ValueError(f"Decisão inválida: {kind!r}. Use 'approve', 'reject' ou 'edit'.")
@@ -0,0 +1,688 @@
+import os
+import sys
+import json
+import zlib
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import aiosqlite
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, CheckpointTuple, get_checkpoint_id, get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from telemetry.metrics import CHECKPOINT_SECONDS, SESSION_LOADS
+from telemetry.tracing import span
+
+
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "db.sqlite")
+# Quantos checkpoints manter por conversa (thread_id). O estado do agente é salvo inteiro em cada
+# checkpoint, então os antigos só servem para "voltar no tempo" e podem ser descartados.
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "10"))
+# "zstd" (precisa do pacote zstandard; sem ele cai para zlib), "zlib" ou "none".
+CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "zstd")
+# Intervalo, em segundos, da manutenção em segundo plano (poda + vacuum). 0 desliga.
+CHECKPOINT_MAINTENANCE_INTERVAL = float(os.getenv("CHECKPOINT_MAINTENANCE_INTERVAL", "300"))
+
+# Teto de memória, em MB, do estado das conversas ativas mantido em memória (ver SessionCacheSaver).
+# 0 desliga o cache: cada turno lê e grava direto no SQLite.
+SESSION_CACHE_MAX_MB = float(os.getenv("SESSION_CACHE_MAX_MB", "256"))
+# Conversas sem turno há mais que isso (segundos) saem da memória (continuam no SQLite).
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "900"))
+# De quanto em quanto tempo (segundos) os checkpoints em memória são gravados no SQLite, numa transação só.
+# É também o máximo de trabalho perdido se o processo cair.
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "1"))
+# Arquivo SQLite das conversas frias (só o último checkpoint de cada uma, recomprimido).
+# Sem a variável, fica ao lado do banco de checkpoints ("db.sqlite" -> "db.archive.sqlite").
+SESSION_ARCHIVE_PATH = os.getenv("SESSION_ARCHIVE_PATH")
+# Conversas sem turno há mais que isso (dias) vão para o arquivo na manutenção periódica. 0 desliga.
+SESSION_ARCHIVE_AFTER_DAYS = float(os.getenv("SESSION_ARCHIVE_AFTER_DAYS", "30"))
+# Conversas arquivadas por rodada da manutenção.
+SESSION_ARCHIVE_BATCH = 500
+
+
+class CompressedSerializer(SerializerProtocol):
+    """
+    Serializador que comprime os blobs do serializador padrão do LangGraph (msgpack).
+    O tipo gravado ganha o prefixo do codec ("zstd:msgpack"); blobs sem prefixo, gravados antes
+    da compressão ser ligada, continuam sendo lidos normalmente.
+    """
+
+    def __init__(self, codec=CHECKPOINT_COMPRESSION, inner=None, level=3, min_size=128):
+        if codec == "zstd" and zstandard is None:
+            codec = "zlib"
+        self.codec = codec
+        self.inner = inner or JsonPlusSerializer()
+        self.level = level
+        self.min_size = min_size
+        if zstandard is not None:
+            self._zstd_compressor = zstandard.ZstdCompressor(level=level)
+            self._zstd_decompressor = zstandard.ZstdDecompressor()
+
+    def _compress(self, data):
+        if self.codec == "zstd":
+            return self._zstd_compressor.compress(data)
+        return zlib.compress(data, self.level)
+
+    def _decompress(self, codec, data):
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Checkpoint comprimido com zstd, mas o pacote 'zstandard' não está instalado.")
+            return self._zstd_decompressor.decompress(data)
+        return zlib.decompress(data)
+
+    def dumps_typed(self, obj):
+        type_, data = self.inner.dumps_typed(obj)
+        if self.codec == "none" or len(data) < self.min_size:
+            return type_, data
+        return f"{self.codec}:{type_}", self._compress(data)
+
+    def loads_typed(self, data):
+        type_, payload = data
+        codec, sep, inner_type = type_.partition(":")
+        if sep and codec in ("zstd", "zlib"):
+            return self.inner.loads_typed((inner_type, self._decompress(codec, payload)))
+        return self.inner.loads_typed(data)
+
+    def recompress(self, type_, data, level):
+        """Recomprime um blob já serializado com outro nível, sem desserializar o objeto."""
+        codec, sep, inner_type = type_.partition(":")
+        if sep and codec in ("zstd", "zlib"):
+            data = self._decompress(codec, data)
+            type_ = inner_type
+        if self.codec == "none" or len(data) < self.min_size:
+            return type_, data
+        if self.codec == "zstd":
+            return f"zstd:{type_}", zstandard.ZstdCompressor(level=level).compress(data)
+        return f"zlib:{type_}", zlib.compress(data, min(level, 9))
+
+
+async def prune_checkpoints(saver, keep_last=CHECKPOINT_KEEP_LAST):
+    """
+    Apaga, em cada conversa, os checkpoints além dos 'keep_last' mais recentes e as escritas pendentes
+    que ficaram sem checkpoint. Retorna quantos checkpoints foram removidos.
+    """
+    async with saver.lock:
+        cursor = await saver.conn.execute(
+            """
+            DELETE FROM checkpoints WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, ROW_NUMBER() OVER (
+                        PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                    ) AS position
+                    FROM checkpoints
+                )
+                WHERE position > ?
+            )
+            """,
+            (keep_last,),
+        )
+        removed = cursor.rowcount
+        await saver.conn.execute(
+            """
+            DELETE FROM writes WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints c
+                WHERE c.thread_id = writes.thread_id
+                  AND c.checkpoint_ns = writes.checkpoint_ns
+                  AND c.checkpoint_id = writes.checkpoint_id
+            )
+            """
+        )
+        await saver.conn.commit()
+    return removed
+
+
+async def vacuum_checkpoints(saver):
+    """Devolve ao disco as páginas liberadas pela poda e trunca o arquivo de WAL."""
+    async with saver.lock:
+        # Pelo execute() do sqlite3 o incremental_vacuum libera uma única página por chamada;
+        # o executescript() roda o PRAGMA até o fim.
+        await saver.conn.executescript("PRAGMA incremental_vacuum;")
+        if getattr(saver, "archive_enabled", False):
+            await saver.conn.executescript("PRAGMA archive.incremental_vacuum;")
+        await saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+async def _maintenance_loop(saver, keep_last, interval, archive_after_days=0):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await prune_checkpoints(saver, keep_last)
+            archived = 0
+            if archive_after_days > 0 and getattr(saver, "archive_enabled", False):
+                archived = await archive_cold_threads(saver, archive_after_days)
+            await vacuum_checkpoints(saver)
+            if removed:
+                print(f"[checkpoints] {removed} checkpoints antigos removidos.")
+            if archived:
+                print(f"[checkpoints] {archived} conversas sem atividade movidas para o arquivo.")
+        except Exception as e:
+            print(f"[checkpoints] Erro na manutenção do banco de checkpoints: {e}")
+
+
+class TracedSqliteSaver(AsyncSqliteSaver):
+    """AsyncSqliteSaver que mede cada gravação (checkpoint e writes pendentes) nas métricas e no trace."""
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        with span("checkpoint", CHECKPOINT_SECONDS, op="put"):
+            return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        with span("checkpoint", CHECKPOINT_SECONDS, op="put_writes", writes=len(writes)):
+            return await super().aput_writes(config, writes, task_id, task_path)
+
+
+# Custo fixo estimado, em bytes, de uma mensagem em memória (objeto pydantic, ids, metadados).
+_MESSAGE_OVERHEAD = 1500
+
+
+def estimate_size(value):
+    """Estimativa rápida (sem serializar) da memória ocupada pelos valores de um checkpoint, em bytes."""
+    if isinstance(value, BaseMessage):
+        size = _MESSAGE_OVERHEAD + len(str(value.content))
+        for call in getattr(value, "tool_calls", None) or ():
+            size += 200 + len(str(call.get("args")))
+        return size
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return 64 + sum(64 + estimate_size(item) for item in value.values())
+    if isinstance(value, str):
+        return 49 + len(value)
+    return sys.getsizeof(value)
+
+
+class _Session:
+    """Último checkpoint de uma conversa em memória e o que dele ainda não foi gravado no SQLite."""
+
+    __slots__ = ("tuple", "writes", "size", "last_used", "dirty_checkpoint", "dirty_writes")
+
+    def __init__(self, checkpoint_tuple, writes=None):
+        self.tuple = checkpoint_tuple
+        self.writes = writes or {}    # (task_id, idx) -> (task_path, channel, value)
+        self.size = estimate_size(checkpoint_tuple.checkpoint.get("channel_values"))
+        self.last_used = time.monotonic()
+        self.dirty_checkpoint = False
+        self.dirty_writes = set()
+
+    @property
+    def checkpoint_id(self):
+        return self.tuple.config["configurable"]["checkpoint_id"]
+
+    @property
+    def dirty(self):
+        return self.dirty_checkpoint or bool(self.dirty_writes)
+
+    def snapshot(self):
+        pending = sorted(self.writes.items(), key=lambda item: (item[1][0], item[0]))
+        return self.tuple._replace(
+            pending_writes=[(task_id, channel, value) for (task_id, _), (_, channel, value) in pending]
+        )
+
+
+class SessionCacheSaver(TracedSqliteSaver):
+    """
+    Checkpointer com as conversas ativas em memória (LRU limitado por 'max_bytes') e gravação adiada
+    (write-behind) no SQLite.
+
+    - Leitura: o último checkpoint de uma conversa em memória é devolvido sem tocar no banco; as
+      demais vêm do SQLite (ou do arquivo de conversas frias, que as devolve ao banco principal) e
+      entram no cache.
+    - Gravação: checkpoints e escritas pendentes ficam em memória e vão para o SQLite a cada
+      'flush_interval' segundos, todas as conversas numa transação só. Vários checkpoints da mesma
+      conversa dentro do intervalo viram um (o último), então o histórico no banco fica mais curto;
+      escritas de interrupt (aprovações) são gravadas na hora.
+    - Despejo: conversas sem uso há mais de 'idle_ttl' segundos e, acima do teto, as menos recentes
+      saem da memória depois de gravadas.
+
+    Um checkpoint específico (checkpoint_id antigo), o histórico (alist) e o apagar de uma conversa
+    gravam antes o que está pendente dela e seguem para o AsyncSqliteSaver.
+    """
+
+    def __init__(self, conn, *, serde=None, max_bytes=SESSION_CACHE_MAX_MB * 1e6,
+                 idle_ttl=SESSION_IDLE_TTL, flush_interval=SESSION_FLUSH_INTERVAL):
+        super().__init__(conn, serde=serde)
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.flush_interval = flush_interval
+        self.archive_enabled = False
+        self._sessions = OrderedDict()   # (thread_id, checkpoint_ns) -> _Session, do menos ao mais recente
+        self._bytes = 0
+        self._dirty = set()
+        self._flush_now = asyncio.Event()
+        self._flusher = None
+
+    async def setup(self):
+        await super().setup()
+        async with self.lock:
+            await self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS session_activity (
+                    thread_id TEXT PRIMARY KEY,
+                    last_active REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS session_activity_last_active ON session_activity (last_active);
+                """
+            )
+            await self.conn.commit()
+
+    def start(self):
+        """Inicia a gravação periódica em segundo plano."""
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Para a gravação periódica e grava tudo o que está pendente."""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    @property
+    def cached_bytes(self):
+        return self._bytes
+
+    @property
+    def cached_sessions(self):
+        return len(self._sessions)
+
+    @staticmethod
+    def _key(config):
+        configurable = config["configurable"]
+        return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+    def _admit(self, key, session):
+        previous = self._sessions.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.size
+        self._sessions[key] = session
+        self._bytes += session.size
+        if self._bytes > self.max_bytes:
+            self._evict()
+
+    def _drop(self, key):
+        session = self._sessions.pop(key)
+        self._bytes -= session.size
+        self._dirty.discard(key)
+
+    def _evict(self):
+        """Tira da memória as conversas ociosas e, acima do teto, as menos recentes que já estão gravadas."""
+        now = time.monotonic()
+        for key, session in list(self._sessions.items()):
+            if now - session.last_used < self.idle_ttl and self._bytes <= self.max_bytes:
+                break
+            if not session.dirty:
+                self._drop(key)
+        if self._bytes > self.max_bytes and self._dirty:
+            # O que sobrou acima do teto está pendente de gravação: antecipa o próximo flush.
+            self._flush_now.set()
+
+    async def aget_tuple(self, config):
+        key = self._key(config)
+        checkpoint_id = get_checkpoint_id(config)
+        session = self._sessions.get(key)
+        if session is not None:
+            if checkpoint_id in (None, session.checkpoint_id):
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(key)
+                SESSION_LOADS.inc(source="memory")
+                return session.snapshot()
+            await self.flush([key])
+            return await super().aget_tuple(config)
+
+        result = await super().aget_tuple(config)
+        source = "sqlite"
+        if result is None and checkpoint_id is None and self.archive_enabled:
+            if await restore_thread(self, key[0]):
+                result = await super().aget_tuple(config)
+                source = "archive"
+        SESSION_LOADS.inc(source=source)
+        # Se um turno gravou um checkpoint desta conversa enquanto o SQLite era lido, vale o da memória.
+        if result is not None and checkpoint_id is None and key not in self._sessions:
+            writes, positions = {}, {}
+            for task_id, channel, value in result.pending_writes or ():
+                position = positions.get(task_id, 0)
+                positions[task_id] = position + 1
+                writes[(task_id, WRITES_IDX_MAP.get(channel, position))] = ("", channel, value)
+            self._admit(key, _Session(result, writes))
+        return result
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        key = self._key(config)
+        configurable = config["configurable"]
+        parent_id = configurable.get("checkpoint_id")
+        new_config = {
+            "configurable": {"thread_id": key[0], "checkpoint_ns": key[1], "checkpoint_id": checkpoint["id"]}
+        }
+        parent_config = (
+            {"configurable": {"thread_id": key[0], "checkpoint_ns": key[1], "checkpoint_id": parent_id}}
+            if parent_id else None
+        )
+        # O checkpoint anterior ainda não gravado (e as escritas dele) é substituído por este.
+        session = _Session(CheckpointTuple(
+            new_config, checkpoint, get_checkpoint_metadata(config, metadata), parent_config, [],
+        ))
+        session.dirty_checkpoint = True
+        self._admit(key, session)
+        self._dirty.add(key)
+        return new_config
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        key = self._key(config)
+        session = self._sessions.get(key)
+        if session is None or session.checkpoint_id != config["configurable"].get("checkpoint_id"):
+            return await super().aput_writes(config, writes, task_id, task_path)
+        # Mesma regra do AsyncSqliteSaver: canais especiais substituem, os demais não sobrescrevem.
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        for idx, (channel, value) in enumerate(writes):
+            write_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+            if replace or write_key not in session.writes:
+                session.writes[write_key] = (task_path, channel, value)
+                session.dirty_writes.add(write_key)
+        self._dirty.add(key)
+        if any(channel == "__interrupt__" for channel, _ in writes):
+            await self.flush([key])
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        await self.flush([self._key(config)] if config else None)
+        async for item in super().alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aget_delta_channel_history(self, *, config, channels):
+        await self.flush([self._key(config)])
+        return await super().aget_delta_channel_history(config=config, channels=channels)
+
+    async def adelete_thread(self, thread_id):
+        thread_id = str(thread_id)
+        for key in [key for key in self._sessions if key[0] == thread_id]:
+            self._drop(key)
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM session_activity WHERE thread_id = ?", (thread_id,))
+            if self.archive_enabled:
+                await self.conn.execute("DELETE FROM archive.checkpoints WHERE thread_id = ?", (thread_id,))
+                await self.conn.execute("DELETE FROM archive.writes WHERE thread_id = ?", (thread_id,))
+            await self.conn.commit()
+
+    async def flush(self, keys=None):
+        """Grava no SQLite, numa transação, o que está pendente das conversas 'keys' (ou de todas)."""
+        checkpoints, writes, activity, taken = [], [], {}, []
+        now = time.time()
+        for key in list(self._dirty if keys is None else keys):
+            session = self._sessions.get(key)
+            self._dirty.discard(key)
+            if session is None or not session.dirty:
+                continue
+            thread_id, checkpoint_ns = key
+            checkpoint_id = session.checkpoint_id
+            if session.dirty_checkpoint:
+                parent = session.tuple.parent_config
+                checkpoints.append((
+                    thread_id, checkpoint_ns, checkpoint_id,
+                    parent["configurable"]["checkpoint_id"] if parent else None,
+                    *self.serde.dumps_typed(session.tuple.checkpoint),
+                    json.dumps(session.tuple.metadata, ensure_ascii=False).encode("utf-8", "ignore"),
+                ))
+            for write_key in session.dirty_writes:
+                task_path, channel, value = session.writes[write_key]
+                writes.append((
+                    thread_id, checkpoint_ns, checkpoint_id, write_key[0], task_path, write_key[1], channel,
+                    *self.serde.dumps_typed(value),
+                ))
+            activity[thread_id] = now
+            taken.append((key, session, session.dirty_checkpoint, session.dirty_writes))
+            session.dirty_checkpoint, session.dirty_writes = False, set()
+        if not taken:
+            return 0
+
+        try:
+            with span("checkpoint", CHECKPOINT_SECONDS, op="flush", threads=len(taken)):
+                async with self.lock:
+                    await self.conn.executemany(
+                        "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                        "parent_checkpoint_id, type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        checkpoints,
+                    )
+                    await self.conn.executemany(
+                        "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, "
+                        "task_path, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        writes,
+                    )
+                    await self.conn.executemany(
+                        "INSERT OR REPLACE INTO session_activity (thread_id, last_active) VALUES (?, ?)",
+                        activity.items(),
+                    )
+                    await self.conn.commit()
+        except Exception:
+            # Volta a marcar como pendente o que não foi substituído por um checkpoint mais novo.
+            for key, session, dirty_checkpoint, dirty_writes in taken:
+                if self._sessions.get(key) is session:
+                    session.dirty_checkpoint |= dirty_checkpoint
+                    session.dirty_writes |= dirty_writes
+                    self._dirty.add(key)
+            raise
+        return len(taken)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+                self._evict()
+            except Exception as e:
+                print(f"[checkpoints] Erro ao gravar as conversas em memória: {e}")
+
+
+async def setup_archive(saver, path):
+    """Anexa o arquivo de conversas frias à conexão do checkpointer (schema 'archive')."""
+    async with saver.lock:
+        await saver.conn.execute("ATTACH DATABASE ? AS archive", (path,))
+        await saver.conn.executescript(
+            """
+            PRAGMA archive.auto_vacuum=INCREMENTAL;
+            PRAGMA archive.journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS archive.checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata BLOB,
+                archived_at REAL NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns)
+            );
+            CREATE TABLE IF NOT EXISTS archive.writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                task_path TEXT NOT NULL DEFAULT '',
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            """
+        )
+        await saver.conn.commit()
+    saver.archive_enabled = True
+
+
+_CHECKPOINT_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata"
+_WRITE_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value"
+
+
+async def archive_cold_threads(saver, older_than_days=SESSION_ARCHIVE_AFTER_DAYS, limit=SESSION_ARCHIVE_BATCH,
+                               level=19):
+    """
+    Move para o arquivo as conversas sem turno há mais de 'older_than_days' dias (até 'limit' por chamada):
+    só o último checkpoint de cada uma e as escritas pendentes dele, recomprimidos com 'level'; o histórico
+    é descartado. As conversas em memória ficam de fora. Retorna quantas foram arquivadas.
+    """
+    cutoff = time.time() - older_than_days * 86400
+    async with saver.lock:
+        async with saver.conn.execute(
+            "SELECT thread_id, last_active FROM session_activity WHERE last_active < ? ORDER BY last_active LIMIT ?",
+            (cutoff, limit),
+        ) as cursor:
+            hot = {thread_id for thread_id, _ in getattr(saver, "_sessions", {})}
+            last_active = {row[0]: row[1] for row in await cursor.fetchall() if row[0] not in hot}
+        if not last_active:
+            return 0
+        threads = list(last_active)
+        marks = ", ".join("?" for _ in threads)
+        async with saver.conn.execute(
+            f"""
+            SELECT {_CHECKPOINT_COLUMNS} FROM checkpoints
+            WHERE thread_id IN ({marks}) AND (thread_id, checkpoint_ns, checkpoint_id) IN (
+                SELECT thread_id, checkpoint_ns, MAX(checkpoint_id) FROM checkpoints
+                WHERE thread_id IN ({marks}) GROUP BY thread_id, checkpoint_ns
+            )
+            """,
+            (*threads, *threads),
+        ) as cursor:
+            latest = await cursor.fetchall()
+    now = time.time()
+
+    def recompress():
+        rows = []
+        for thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, blob, metadata in latest:
+            type_, blob = saver.serde.recompress(type_, blob, level)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, blob, metadata, now))
+        return rows
+
+    # A recompressão é CPU pura e demorada (zstd no nível 'level'): roda em outra thread e sem o
+    # lock do checkpointer, para as leituras e gravações dos turnos em andamento não esperarem.
+    rows = await asyncio.to_thread(recompress)
+
+    async with saver.lock:
+        # Conversas que voltaram a ser usadas durante a recompressão (novo turno gravado ou
+        # carregadas na memória) continuam no banco principal.
+        async with saver.conn.execute(
+            f"SELECT thread_id, last_active FROM session_activity WHERE thread_id IN ({marks})", threads,
+        ) as cursor:
+            current = dict(await cursor.fetchall())
+        hot = {thread_id for thread_id, _ in getattr(saver, "_sessions", {})}
+        threads = [t for t in threads if current.get(t) == last_active[t] and t not in hot]
+        if not threads:
+            return 0
+        keep = set(threads)
+        rows = [row for row in rows if row[0] in keep]
+        marks = ", ".join("?" for _ in threads)
+        await saver.conn.executemany(
+            f"INSERT OR REPLACE INTO archive.checkpoints ({_CHECKPOINT_COLUMNS}, archived_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        await saver.conn.execute(
+            f"""
+            INSERT OR REPLACE INTO archive.writes ({_WRITE_COLUMNS})
+            SELECT {", ".join("w." + c.strip() for c in _WRITE_COLUMNS.split(","))}
+            FROM writes w JOIN archive.checkpoints a USING (thread_id, checkpoint_ns, checkpoint_id)
+            WHERE w.thread_id IN ({marks})
+            """,
+            threads,
+        )
+        for table in ("writes", "checkpoints", "session_activity"):
+            await saver.conn.execute(f"DELETE FROM {table} WHERE thread_id IN ({marks})", threads)
+        await saver.conn.commit()
+    return len(threads)
+
+
+async def restore_thread(saver, thread_id):
+    """Devolve ao banco principal uma conversa arquivada. Retorna False se ela não está no arquivo."""
+    async with saver.lock:
+        async with saver.conn.execute(
+            "SELECT 1 FROM archive.checkpoints WHERE thread_id = ? LIMIT 1", (thread_id,)
+        ) as cursor:
+            if await cursor.fetchone() is None:
+                return False
+        await saver.conn.execute(
+            f"INSERT OR IGNORE INTO checkpoints ({_CHECKPOINT_COLUMNS}) "
+            f"SELECT {_CHECKPOINT_COLUMNS} FROM archive.checkpoints WHERE thread_id = ?",
+            (thread_id,),
+        )
+        await saver.conn.execute(
+            f"INSERT OR IGNORE INTO writes ({_WRITE_COLUMNS}) "
+            f"SELECT {_WRITE_COLUMNS} FROM archive.writes WHERE thread_id = ?",
+            (thread_id,),
+        )
+        await saver.conn.execute(
+            "INSERT OR REPLACE INTO session_activity (thread_id, last_active) VALUES (?, ?)",
+            (thread_id, time.time()),
+        )
+        await saver.conn.execute("DELETE FROM archive.writes WHERE thread_id = ?", (thread_id,))
+        await saver.conn.execute("DELETE FROM archive.checkpoints WHERE thread_id = ?", (thread_id,))
+        await saver.conn.commit()
+    print(f"[checkpoints] Conversa {thread_id} restaurada do arquivo.")
+    return True
+
+
+@asynccontextmanager
+async def open_checkpointer(
+    db_path=CHECKPOINT_DB_PATH,
+    keep_last=CHECKPOINT_KEEP_LAST,
+    compression=CHECKPOINT_COMPRESSION,
+    maintenance_interval=CHECKPOINT_MAINTENANCE_INTERVAL,
+    session_cache_mb=SESSION_CACHE_MAX_MB,
+    archive_path=SESSION_ARCHIVE_PATH,
+    archive_after_days=SESSION_ARCHIVE_AFTER_DAYS,
+):
+    """
+    Abre o AsyncSqliteSaver ajustado para tráfego contínuo: WAL com synchronous=NORMAL,
+    checkpoints comprimidos e poda/vacuum periódicos em segundo plano.
+    Com 'session_cache_mb' > 0, as conversas ativas ficam em memória com gravação adiada
+    (SessionCacheSaver) e, com 'archive_after_days' > 0, as frias vão para 'archive_path'.
+    """
+    async with aiosqlite.connect(db_path) as conn:
+        # auto_vacuum só tem efeito em um banco novo (antes de criar as tabelas);
+        # em bancos antigos, rode um VACUUM manual uma vez para ativá-lo.
+        await conn.executescript(
+            """
+            PRAGMA auto_vacuum=INCREMENTAL;
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA busy_timeout=5000;
+            """
+        )
+        if session_cache_mb > 0:
+            saver = SessionCacheSaver(conn, serde=CompressedSerializer(compression), max_bytes=session_cache_mb * 1e6)
+        else:
+            saver = TracedSqliteSaver(conn, serde=CompressedSerializer(compression))
+        await saver.setup()
+        if session_cache_mb > 0:
+            if archive_after_days > 0:
+                await setup_archive(saver, archive_path or os.path.splitext(db_path)[0] + ".archive.sqlite")
+            saver.start()
+
+        maintenance = None
+        if maintenance_interval > 0:
+            maintenance = asyncio.create_task(
+                _maintenance_loop(saver, keep_last, maintenance_interval, archive_after_days)
+            )
+        try:
+            yield saver
+        finally:
+            if maintenance:
+                maintenance.cancel()
+            if session_cache_mb > 0:
+                await saver.close()
@@ -0,0 +1,159 @@
+import json
+import time
+
+
+# Colunas da ficha de qualificação (BANT) de cada lead, na ordem da tabela 'lead_state'.
+LEAD_STATE_FIELDS = (
+    "thread_id",
+    "status",           # "em_qualificacao", "curioso", "qualificado" ou "agendado"
+    "budget_min",       # orçamento em reais (para aluguel, o valor mensal)
+    "budget_max",
+    "financing",        # "financiamento", "carta_de_credito" ou "a_vista"
+    "authority",        # "propria", "compartilhada" ou "terceiro"
+    "transaction",      # "venda" ou "aluguel"
+    "property_type",
+    "bedrooms",
+    "neighborhoods",    # lista, gravada como JSON
+    "pet_friendly",
+    "timeline_months",  # prazo em meses (0.5 = urgente)
+    "booked_at",        # início da visita agendada
+    "last_message_id",  # última mensagem já processada; o próximo turno lê só as seguintes
+    "turns",
+    "created_at",
+    "updated_at",
+)
+_JSON_FIELDS = {"neighborhoods"}
+_BOOL_FIELDS = {"pet_friendly"}
+
+
+class LeadStateStore:
+    """
+    Ficha de qualificação de cada lead (uma linha por thread_id), gravada no mesmo banco SQLite do
+    checkpointer. É atualizada a cada turno só com as mensagens novas (ver middleware/lead_state.py)
+    e indexada para relatórios e roteamento sem reler o histórico nem chamar o modelo.
+    """
+
+    def __init__(self, saver):
+        self.saver = saver
+
+    async def setup(self):
+        async with self.saver.lock:
+            await self.saver.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS lead_state (
+                    thread_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    budget_min REAL,
+                    budget_max REAL,
+                    financing TEXT,
+                    authority TEXT,
+                    "transaction" TEXT,
+                    property_type TEXT,
+                    bedrooms INTEGER,
+                    neighborhoods TEXT,
+                    pet_friendly INTEGER,
+                    timeline_months REAL,
+                    booked_at TEXT,
+                    last_message_id TEXT,
+                    turns INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS lead_state_status_updated ON lead_state (status, updated_at);
+                CREATE INDEX IF NOT EXISTS lead_state_status_timeline ON lead_state (status, timeline_months);
+                CREATE INDEX IF NOT EXISTS lead_state_updated_at ON lead_state (updated_at);
+                """
+            )
+            await self.saver.conn.commit()
+
+    @staticmethod
+    def _row(row):
+        record = dict(zip(LEAD_STATE_FIELDS, row))
+        for name in _JSON_FIELDS:
+            record[name] = json.loads(record[name]) if record[name] else []
+        for name in _BOOL_FIELDS:
+            record[name] = None if record[name] is None else bool(record[name])
+        return record
+
+    async def get(self, thread_id):
+        async with self.saver.conn.execute(
+            "SELECT * FROM lead_state WHERE thread_id = ?", (thread_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return self._row(row) if row else None
+
+    async def put(self, record):
+        """Grava a ficha inteira de um lead (INSERT OR REPLACE), com 'updated_at' = agora."""
+        now = time.time()
+        record = {**record, "updated_at": now, "created_at": record.get("created_at") or now}
+        values = []
+        for name in LEAD_STATE_FIELDS:
+            value = record.get(name)
+            if name in _JSON_FIELDS:
+                value = json.dumps(value or [], ensure_ascii=False)
+            elif name in _BOOL_FIELDS and value is not None:
+                value = int(value)
+            values.append(value)
+        async with self.saver.lock:
+            await self.saver.conn.execute(
+                f"INSERT OR REPLACE INTO lead_state VALUES ({', '.join('?' for _ in LEAD_STATE_FIELDS)})",
+                values,
+            )
+            await self.saver.conn.commit()
+
+    @staticmethod
+    def _where(status=None, max_timeline_months=None, min_budget=None, max_budget=None, updated_since=None):
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if max_timeline_months is not None:
+            clauses.append("timeline_months <= ?")
+            params.append(max_timeline_months)
+        if min_budget is not None:
+            clauses.append("budget_max >= ?")
+            params.append(min_budget)
+        if max_budget is not None:
+            clauses.append("budget_max <= ?")
+            params.append(max_budget)
+        if updated_since is not None:
+            clauses.append("updated_at >= ?")
+            params.append(updated_since)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    async def query(self, limit=100, offset=0, **filters):
+        """
+        Fichas que atendem aos filtros (status, max_timeline_months, min_budget, max_budget, updated_since),
+        das atualizadas mais recentemente para as mais antigas; com 'max_timeline_months', das mais urgentes
+        para as menos urgentes (a ordem do índice status + prazo, sem ordenar no SQLite).
+        Ex.: query(status="qualificado", max_timeline_months=3).
+        """
+        where, params = self._where(**filters)
+        order = "timeline_months" if filters.get("max_timeline_months") is not None else "updated_at DESC"
+        async with self.saver.conn.execute(
+            f"SELECT * FROM lead_state{where} ORDER BY {order} LIMIT ? OFFSET ?",
+            (*params, limit, offset),
+        ) as cursor:
+            rows = await cursor.fetchall()
+        return [self._row(row) for row in rows]
+
+    async def export(self, page_size=1000, **filters):
+        """Todas as fichas que atendem aos filtros, em páginas ordenadas por thread_id (para exportação em lote)."""
+        where, params = self._where(**filters)
+        where += (" AND" if where else " WHERE") + " thread_id > ?"
+        last = ""
+        while True:
+            async with self.saver.conn.execute(
+                f"SELECT * FROM lead_state{where} ORDER BY thread_id LIMIT ?", (*params, last, page_size)
+            ) as cursor:
+                rows = await cursor.fetchall()
+            for row in rows:
+                yield self._row(row)
+            if len(rows) < page_size:
+                return
+            last = rows[-1][0]
+
+    async def counts(self):
+        """{status: quantidade de leads}."""
+        async with self.saver.conn.execute("SELECT status, COUNT(*) FROM lead_state GROUP BY status") as cursor:
+            return dict(await cursor.fetchall())
@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from middleware.content_scanner import StreamRedactor
+
+
+# Tipos de evento de um turno:
+# - token: trecho do texto da resposta (já passado pelo StreamRedactor);
+# - tool_call / tool_result: chamada de ferramenta do modelo e o resultado completo;
+# - interrupt: o turno parou esperando a aprovação de um operador ('data': id e value do interrupt);
+# - end / error: fim do turno (enviados por SinkGroup, em streaming/sinks.py).
+EVENT_KINDS = frozenset({"token", "tool_call", "tool_result", "interrupt", "end", "error"})
+
+
+@dataclass
+class StreamEvent:
+    """Evento normalizado de um turno do agente, independente do transporte."""
+    kind: str
+    text: str = ""
+    name: str = ""
+    data: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        """Formato JSON enviado aos clientes: {"type": ..., "text": ...} e os campos do tipo."""
+        payload = {"type": self.kind}
+        if self.kind == "error":
+            payload["error"] = self.text
+        elif self.text:
+            payload["text"] = self.text
+        if self.name:
+            payload["name"] = self.name
+        payload.update(self.data)
+        return payload
+
+
+async def agent_events(agent, payload, config, kinds=EVENT_KINDS, context=None):
+    """
+    Executa um turno do agente e gera os StreamEvents dos tipos em 'kinds'. Interrupts são sempre
+    gerados (quem chama precisa deles para a fila de aprovações).
+    Sem "token" em 'kinds' o turno roda sem o modo "messages" do LangGraph, sem o custo de repassar
+    cada trecho do modelo; chamadas e resultados de ferramentas vêm do modo "updates", uma vez por nó.
+    """
+    tokens = "token" in kinds
+    redactor = StreamRedactor() if tokens else None
+    stream_mode = ["messages", "updates"] if tokens else ["updates"]
+
+    def pending_text():
+        rest = redactor.flush() if redactor else ""
+        return [StreamEvent("token", rest)] if rest else []
+
+    async for mode, data in agent.astream(payload, config, context=context, stream_mode=stream_mode):
+        if mode == "messages":
+            chunk, _metadata = data
+            if isinstance(chunk, AIMessage) and chunk.text:
+                piece = redactor.feed(chunk.text)
+                if piece:
+                    yield StreamEvent("token", piece)
+            continue
+
+        if "__interrupt__" in data:
+            for event in pending_text():
+                yield event
+            interrupt = data["__interrupt__"][0]
+            yield StreamEvent("interrupt", data={"id": interrupt.id, "value": interrupt.value})
+            continue
+        for update in data.values():
+            messages = update.get("messages", ()) if isinstance(update, dict) else ()
+            for message in messages:
+                if isinstance(message, AIMessage) and message.tool_calls and "tool_call" in kinds:
+                    for event in pending_text():
+                        yield event
+                    for call in message.tool_calls:
+                        yield StreamEvent("tool_call", name=call["name"], data={"id": call["id"], "args": call["args"]})
+                elif isinstance(message, ToolMessage) and "tool_result" in kinds:
+                    yield StreamEvent("tool_result", message.text, message.name or "", {"id": message.tool_call_id})
+
+    for event in pending_text():
+        yield event
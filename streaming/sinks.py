@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+import asyncio
+
+from streaming.events import StreamEvent
+from telemetry.metrics import STREAM_BACKPRESSURE_SECONDS, STREAM_DROPPED, STREAM_FLUSHES
+
+
+# Janela, em segundos, em que os trechos de texto de um turno são juntados antes de cada envio.
+# 0 envia cada trecho assim que chega.
+STREAM_FLUSH_WINDOW = float(os.getenv("STREAM_FLUSH_WINDOW", "0.05"))
+# Caracteres pendentes por destino antes de segurar o turno (ou descartar, com on_full="drop").
+STREAM_MAX_BUFFER = int(os.getenv("STREAM_MAX_BUFFER", str(64 * 1024)))
+
+LEAD_KINDS = frozenset({"token", "end", "error"})
+OPERATOR_KINDS = frozenset({"token", "tool_call", "tool_result", "interrupt", "end", "error"})
+
+
+def coalesce(events):
+    """Junta trechos de texto consecutivos em um único evento 'token'."""
+    merged = []
+    pieces = []
+    for event in events:
+        if event.kind == "token":
+            pieces.append(event.text)
+            continue
+        if pieces:
+            merged.append(StreamEvent("token", "".join(pieces)))
+            pieces = []
+        merged.append(event)
+    if pieces:
+        merged.append(StreamEvent("token", "".join(pieces)))
+    return merged
+
+
+class Sink:
+    """
+    Destino dos eventos de um turno (terminal, SSE, WebSocket, fila). Recebe só os tipos em 'kinds'
+    e envia em lotes: uma tarefa própria espera até 'window' segundos juntando trechos de texto e
+    chama 'send' com o lote (eventos que não são texto saem sem esperar a janela).
+    Com mais de 'max_buffer' caracteres pendentes, 'put' espera o envio terminar (on_full="wait",
+    o cliente lento segura o próprio turno) ou descarta os trechos de texto (on_full="drop", para
+    destinos que não podem atrasar a conversa). Se 'send' falhar (cliente desconectado), o destino
+    é fechado e os eventos seguintes são ignorados; o turno continua.
+    """
+
+    name = "sink"
+    kinds = LEAD_KINDS
+
+    def __init__(self, kinds=None, window=STREAM_FLUSH_WINDOW, max_buffer=STREAM_MAX_BUFFER, on_full="wait"):
+        if kinds is not None:
+            self.kinds = frozenset(kinds)
+        self.window = window
+        self.max_buffer = max_buffer
+        self.on_full = on_full
+        self.closed = False
+        self._pending = []
+        self._size = 0
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._flush_now = asyncio.Event()
+        self._closing = False
+        self._task = None
+
+    async def send(self, events):
+        """Envia um lote de eventos (trechos de texto já juntados) pelo transporte."""
+        raise NotImplementedError
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, event):
+        if self.closed or event.kind not in self.kinds:
+            return
+        if self._size >= self.max_buffer:
+            if self.on_full == "drop" and event.kind == "token":
+                STREAM_DROPPED.inc(sink=self.name)
+                return
+            start = time.perf_counter()
+            while self._size >= self.max_buffer and not self.closed:
+                self._drained.clear()
+                await self._drained.wait()
+            STREAM_BACKPRESSURE_SECONDS.observe(time.perf_counter() - start, sink=self.name)
+            if self.closed:
+                return
+        self._pending.append(event)
+        self._size += len(event.text)
+        if event.kind != "token":
+            self._flush_now.set()
+        self._ready.set()
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            if self.window and not self._flush_now.is_set():
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+            batch, self._pending, self._size = self._pending, [], 0
+            self._ready.clear()
+            self._flush_now.clear()
+            self._drained.set()
+            if batch:
+                try:
+                    await self.send(coalesce(batch))
+                    STREAM_FLUSHES.inc(sink=self.name)
+                except Exception as e:
+                    print(f"[stream] Destino '{self.name}' fechado: {e}")
+                    self.closed = True
+                    self._pending, self._size = [], 0
+                    self._drained.set()
+                    return
+            if self._closing and not self._pending:
+                return
+
+    async def close(self):
+        """Envia o que ainda está pendente e encerra a tarefa de envio."""
+        self._closing = True
+        self._flush_now.set()
+        self._ready.set()
+        if self._task is not None:
+            await self._task
+
+
+class SinkGroup:
+    """
+    Distribui os eventos de um turno entre vários destinos. Ao sair do bloco 'async with', envia
+    'end' (ou 'error' com a mensagem da exceção) e espera cada destino terminar.
+    'kinds' é a união dos tipos pedidos pelos destinos (ver streaming.events.agent_events).
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self.kinds = frozenset().union(*(sink.kinds for sink in self.sinks))
+
+    async def __aenter__(self):
+        for sink in self.sinks:
+            sink.start()
+        return self
+
+    async def put(self, event):
+        for sink in self.sinks:
+            await sink.put(event)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc is None:
+            final = StreamEvent("end")
+        else:
+            final = StreamEvent("error", f"Erro ao processar a mensagem: {exc}")
+        await self.put(final)
+        for sink in self.sinks:
+            await sink.close()
+        return False
+
+
+class StdoutSink(Sink):
+    """Terminal do agent.py: texto conforme chega e uma linha por chamada/resultado de ferramenta."""
+
+    name = "stdout"
+    kinds = frozenset({"token", "tool_call", "tool_result"})
+
+    def __init__(self, stream=None, preview=200, **kwargs):
+        super().__init__(**kwargs)
+        self.stream = stream or sys.stdout
+        self.preview = preview
+
+    async def send(self, events):
+        parts = []
+        for event in events:
+            if event.kind == "token":
+                parts.append(event.text)
+            elif event.kind == "tool_call":
+                parts.append(f"\n[Chamando ferramenta: {event.name} com args {event.data['args']}]\n")
+            elif event.kind == "tool_result":
+                parts.append(f"\n[Resultado da ferramenta: {event.text[:self.preview]}...]\n")
+        self.stream.write("".join(parts))
+        self.stream.flush()
+
+
+class SSESink(Sink):
+    """Server-Sent Events em uma aiohttp.web.StreamResponse já preparada; uma escrita por lote."""
+
+    name = "sse"
+
+    def __init__(self, response, **kwargs):
+        super().__init__(**kwargs)
+        self.response = response
+
+    async def send(self, events):
+        body = "".join(
+            f"event: {event.kind}\ndata: {json.dumps(event.to_dict(), ensure_ascii=False)}\n\n" for event in events
+        )
+        # StreamResponse.write espera o transporte esvaziar quando o cliente não está lendo.
+        await self.response.write(body.encode("utf-8"))
+
+
+class WebSocketSink(Sink):
+    """Mensagens JSON ({"type": "token", "text": ...}, {"type": "end"}) em uma aiohttp.web.WebSocketResponse."""
+
+    name = "websocket"
+
+    def __init__(self, ws, **kwargs):
+        super().__init__(**kwargs)
+        self.ws = ws
+
+    async def send(self, events):
+        for event in events:
+            await self.ws.send_json(event.to_dict())
+
+
+class QueueSink(Sink):
+    """
+    Publica cada lote como uma mensagem {"key": ..., "events": [...]} em uma fila (stand-in de um
+    broker de mensagens: qualquer objeto com 'await put(mensagem)', ex.: asyncio.Queue com maxsize).
+    """
+
+    name = "queue"
+    kinds = OPERATOR_KINDS
+
+    def __init__(self, queue, key=None, **kwargs):
+        super().__init__(**kwargs)
+        self.queue = queue
+        self.key = key
+
+    async def send(self, events):
+        await self.queue.put({"key": self.key, "events": [event.to_dict() for event in events]})
@@ -0,0 +1,155 @@
+import threading
+from bisect import bisect_left
+
+
+# Limites (em segundos) dos buckets dos histogramas de duração: de 1 ms a 2 minutos.
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Contador monotônico no formato do Prometheus, com um valor por combinação de rótulos."""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Histograma no formato do Prometheus (buckets cumulativos, _sum e _count).
+    'observe' guarda só a contagem do bucket da amostra; o acúmulo é feito na exportação.
+    """
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def totals(self):
+        """(amostras, soma) somando todas as combinações de rótulos."""
+        with self._lock:
+            return sum(e[2] for e in self._values.values()), sum(e[1] for e in self._values.values())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels_text(self.labels, key, ('le', bound))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_labels_text(self.labels, key)} {count}")
+        return lines
+
+
+def render_metrics():
+    """Todas as métricas do processo no formato de texto do Prometheus (para GET /metrics)."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Métricas do agente ---
+
+TURN_SECONDS = Histogram(
+    "sdr_turn_seconds", "Duração de um turno do agente (da mensagem do lead à resposta ou ao interrupt).",
+    ("kind", "outcome"),
+)
+LLM_SECONDS = Histogram(
+    "sdr_llm_seconds", "Duração de cada chamada ao modelo.", ("model", "call", "outcome"),
+)
+LLM_TTFT_SECONDS = Histogram(
+    "sdr_llm_ttft_seconds", "Tempo até o primeiro token de cada chamada ao modelo.", ("model", "call"),
+)
+LLM_TOKENS = Counter(
+    "sdr_llm_tokens_total", "Tokens das chamadas ao modelo (input, output e cached).", ("model", "type"),
+)
+TOOL_SECONDS = Histogram(
+    "sdr_tool_seconds", "Duração de cada execução de ferramenta.", ("tool", "outcome"),
+)
+CALENDAR_SECONDS = Histogram(
+    "sdr_calendar_request_seconds", "Duração de cada requisição à API do Google Calendar, com as novas tentativas.",
+    ("method", "outcome"),
+)
+CALENDAR_THROTTLE_SECONDS = Histogram(
+    "sdr_calendar_throttle_seconds", "Espera no limitador de taxa antes de cada requisição ao Google Calendar.",
+)
+CALENDAR_RETRIES = Counter(
+    "sdr_calendar_retries_total", "Novas tentativas de requisições ao Google Calendar.", ("method",),
+)
+CHECKPOINT_SECONDS = Histogram(
+    "sdr_checkpoint_write_seconds", "Duração das gravações no checkpointer SQLite.", ("op",),
+)
+ROUTER_DECISIONS = Counter(
+    "sdr_router_decisions_total", "Mensagens do lead por caminho do roteador (agente, modelo_leve, resposta_pronta).",
+    ("route", "intent"),
+)
+STREAM_FLUSHES = Counter(
+    "sdr_stream_flushes_total", "Lotes de eventos de streaming enviados, por destino (stdout, sse, websocket, queue).",
+    ("sink",),
+)
+STREAM_DROPPED = Counter(
+    "sdr_stream_dropped_total", "Trechos de texto descartados por destinos lentos com on_full=\"drop\".", ("sink",),
+)
+STREAM_BACKPRESSURE_SECONDS = Histogram(
+    "sdr_stream_backpressure_seconds", "Tempo em que um turno esperou um destino lento esvaziar o buffer.", ("sink",),
+)
+SESSION_LOADS = Counter(
+    "sdr_session_loads_total", "Leituras do estado de uma conversa, por origem (memory, sqlite ou archive).",
+    ("source",),
+)
+APPROVAL_WAIT_SECONDS = Histogram(
+    "sdr_approval_wait_seconds", "Tempo entre o pedido de aprovação e a decisão do operador.",
+    buckets=(1, 5, 15, 30, 60, 300, 900, 1800, 3600, 14400, 86400),
+)
@@ -0,0 +1,313 @@
+import io
+import os
+import json
+import time
+import atexit
+import threading
+
+from googleapiclient.errors import HttpError
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import message_to_dict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Arquivo opcional com a gravação de cada turno (entrada do lead, respostas do modelo, ferramentas e
+# requisições ao Google Calendar, com tempos), para reproduzir as conversas com bench/replay.py.
+# JSONL; com a extensão ".zst", comprimido com zstd.
+RECORD_PATH = os.getenv("RECORD_PATH")
+RECORD_FLUSH_INTERVAL = 1.0
+RECORD_VERSION = 1
+
+
+def _json(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class RecordingWriter:
+    """Grava os registros da gravação, um JSON por linha, em buffer compartilhado entre threads."""
+
+    def __init__(self, path, header=None):
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError("Gravação .zst precisa do pacote 'zstandard'.")
+            raw = open(path, "ab")
+            self._file = io.TextIOWrapper(zstandard.ZstdCompressor(level=6).stream_writer(raw), encoding="utf-8")
+        else:
+            self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        # Os instantes ('at') são segundos desde o início da gravação.
+        self._origin = time.perf_counter()
+        self.write({
+            "type": "header", "version": RECORD_VERSION, "started_at": time.time(),
+            **(header or {}),
+        })
+        atexit.register(self.close)
+
+    def now(self):
+        return time.perf_counter() - self._origin
+
+    def write(self, record):
+        line = _json(record) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line)
+            now = time.monotonic()
+            if now - self._flushed_at >= RECORD_FLUSH_INTERVAL:
+                self._file.flush()
+                self._flushed_at = now
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def _default_header():
+    """Configuração que muda o comportamento do agente e precisa ser a mesma na reprodução."""
+    brokers_path = os.getenv("BROKERS_PATH", "brokers.json")
+    brokers = None
+    if os.path.exists(brokers_path):
+        with open(brokers_path, encoding="utf-8") as f:
+            brokers = json.load(f)
+    return {"light_model": os.getenv("ROUTER_LIGHT_MODEL", ""), "brokers": brokers}
+
+
+_writer = RecordingWriter(RECORD_PATH, _default_header()) if RECORD_PATH else None
+
+
+def set_record_path(path, **header):
+    """
+    Liga (ou, com None, desliga) a gravação em tempo de execução. 'header' vai no primeiro registro,
+    sobre a configuração atual (modelo leve do roteador, lista de corretores).
+    """
+    global _writer
+    if _writer:
+        _writer.close()
+    _writer = RecordingWriter(path, {**_default_header(), **header}) if path else None
+
+
+def is_recording():
+    return _writer is not None
+
+
+def read_recording(path):
+    """Registros de uma gravação (.jsonl ou .jsonl.zst), na ordem em que foram gravados."""
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("Gravação .zst precisa do pacote 'zstandard'.")
+        raw = open(path, "rb")
+        text = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding="utf-8")
+    else:
+        text = open(path, encoding="utf-8")
+    with text:
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _turn_input(inputs):
+    """Entrada do turno: a mensagem do lead, a decisão de um operador (Command(resume=...)) ou nada."""
+    resume = getattr(inputs, "resume", None)
+    if resume is not None:
+        return {"resume": resume}
+    if isinstance(inputs, dict) and inputs.get("messages"):
+        message = inputs["messages"][-1]
+        return {"message": getattr(message, "text", None) or str(message)}
+    return {}
+
+
+def _output_text(output):
+    content = getattr(output, "content", output)
+    return content if isinstance(content, str) else str(content)
+
+
+class RecordingCallbackHandler(BaseCallbackHandler):
+    """
+    Callbacks do LangChain que gravam, por conversa (thread_id dos metadados), o início e o fim de cada
+    turno, cada resposta do modelo (a mensagem inteira, com chamadas de ferramenta) e cada ferramenta.
+    Sem gravação ligada (RECORD_PATH / set_record_path), não faz nada.
+    """
+
+    run_inline = True
+    ignore_retriever = True
+    ignore_retry = True
+    ignore_custom_event = True
+
+    def __init__(self):
+        self._runs = {}
+
+    @property
+    def ignore_chain(self):
+        # Os eventos dos nós do grafo só interessam (para achar o início do turno) durante a gravação.
+        return _writer is None
+
+    @property
+    def ignore_llm(self):
+        return _writer is None
+
+    @property
+    def ignore_chat_model(self):
+        return _writer is None
+
+    @property
+    def ignore_agent(self):
+        return _writer is None
+
+    def _start(self, run_id, metadata, **info):
+        if _writer is not None:
+            self._runs[run_id] = {"thread_id": (metadata or {}).get("thread_id"), "at": _writer.now(), **info}
+
+    def _finish(self, run_id, **fields):
+        run = self._runs.pop(run_id, None)
+        if run is None or _writer is None:
+            return
+        at = run.pop("at")
+        _writer.write({**run, "at": round(at, 6), "ms": round((_writer.now() - at) * 1000, 3), **fields})
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        if parent_run_id is None:
+            self._start(run_id, metadata, type="turn", input=_turn_input(inputs))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id in self._runs:
+            interrupted = isinstance(outputs, dict) and bool(outputs.get("__interrupt__"))
+            self._finish(run_id, outcome="interrupt" if interrupted else "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        if run_id in self._runs:
+            self._finish(run_id, outcome="error", error=str(error))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, metadata=None, **kwargs):
+        call = "interna" if "nostream" in (tags or []) else "agente"
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or ""
+        self._start(run_id, metadata, type="model", call=call, model=model, first_token=None)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run["first_token"] is None:
+            run["first_token"] = _writer.now() if _writer else None
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        first_token = run.pop("first_token")
+        ttft = round((first_token - run["at"]) * 1000, 3) if first_token else None
+        message = response.generations[0][0].message if response.generations and response.generations[0] else None
+        self._finish(run_id, ttft_ms=ttft, message=message_to_dict(message) if message is not None else None)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None:
+            run.pop("first_token", None)
+            self._finish(run_id, error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, inputs=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or ""
+        self._start(run_id, metadata, type="tool", name=name, args=inputs if inputs is not None else input_str)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish(run_id, output=_output_text(output))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error=str(error))
+
+
+def _calendar_outcome(response, error):
+    if error is None:
+        return {"response": response}
+    if isinstance(error, HttpError):
+        content = error.content.decode("utf-8", "replace") if isinstance(error.content, bytes) else str(error.content)
+        return {"error": {"status": int(error.resp.status), "content": content}}
+    return {"error": {"status": None, "content": f"{type(error).__name__}: {error}"}}
+
+
+class RecordingService:
+    """
+    Envolve o 'service' do Google Calendar de uma thread (ver API.calendar_client.get_service) e grava
+    cada requisição executada: recurso, método, parâmetros, resposta (ou erro) e duração.
+    Lotes viram um único registro "calendar_batch" com os itens na ordem em que foram adicionados.
+    """
+
+    def __init__(self, service):
+        self._service = service
+
+    def events(self):
+        return _RecordingResource(self._service.events(), "events")
+
+    def freebusy(self):
+        return _RecordingResource(self._service.freebusy(), "freebusy")
+
+    def new_batch_http_request(self, callback=None):
+        return _RecordingBatch(self._service, callback)
+
+
+class _RecordingResource:
+    def __init__(self, resource, name):
+        self._resource = resource
+        self._name = name
+
+    def __getattr__(self, method):
+        def build(**params):
+            return _RecordingRequest(getattr(self._resource, method)(**params), self._name, method, params)
+        return build
+
+
+class _RecordingRequest:
+    def __init__(self, request, resource, method, params):
+        self._request = request
+        self.call = {"resource": resource, "method": method, "params": params}
+
+    def __getattr__(self, name):
+        # method, uri, methodId... do HttpRequest original (usados por API.calendar_client).
+        return getattr(self._request, name)
+
+    def execute(self):
+        at = _writer.now() if _writer else 0.0
+        response, error = None, None
+        try:
+            response = self._request.execute()
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if _writer is not None:
+                _writer.write({
+                    "type": "calendar", "at": round(at, 6), "ms": round((_writer.now() - at) * 1000, 3),
+                    **self.call, **_calendar_outcome(response, error),
+                })
+
+
+class _RecordingBatch:
+    def __init__(self, service, callback):
+        self._callback = callback
+        self._batch = service.new_batch_http_request(callback=self._record_item)
+        self._calls = {}
+        self._items = []
+
+    def add(self, request, request_id=None):
+        self._calls[request_id] = request.call
+        self._batch.add(request._request, request_id=request_id)
+
+    def _record_item(self, request_id, response, exception):
+        self._items.append({"id": request_id, **self._calls[request_id], **_calendar_outcome(response, exception)})
+        if self._callback:
+            self._callback(request_id, response, exception)
+
+    def execute(self):
+        at = _writer.now() if _writer else 0.0
+        try:
+            return self._batch.execute()
+        finally:
+            if _writer is not None:
+                _writer.write({
+                    "type": "calendar_batch", "at": round(at, 6), "ms": round((_writer.now() - at) * 1000, 3),
+                    "items": self._items,
+                })
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from telemetry.recording import RecordingCallbackHandler
+from telemetry.metrics import LLM_SECONDS, LLM_TTFT_SECONDS, LLM_TOKENS, TOOL_SECONDS, TURN_SECONDS
+
+
+# Arquivo JSONL opcional com um registro por span (turno, chamada ao modelo, ferramenta,
+# requisição ao Calendar, gravação de checkpoint). Sem ele, só as métricas são atualizadas.
+TRACE_PATH = os.getenv("TRACE_PATH")
+# O arquivo de trace é gravado em buffer e descarregado no disco a cada TRACE_FLUSH_INTERVAL segundos.
+TRACE_FLUSH_INTERVAL = 1.0
+
+# (trace_id, thread_id, span_id) do span em andamento no contexto atual.
+_current = contextvars.ContextVar("sdr_trace_span", default=(None, None, None))
+_span_ids = itertools.count(1)
+
+
+class TraceWriter:
+    """Grava os spans em JSONL, um objeto por linha, em buffer compartilhado entre threads."""
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        atexit.register(self.close)
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line)
+            now = time.monotonic()
+            if now - self._flushed_at >= TRACE_FLUSH_INTERVAL:
+                self._file.flush()
+                self._flushed_at = now
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+_writer = TraceWriter(TRACE_PATH) if TRACE_PATH else None
+
+
+def set_trace_path(path):
+    """Liga (ou, com None, desliga) o arquivo de trace em tempo de execução."""
+    global _writer
+    if _writer:
+        _writer.close()
+    _writer = TraceWriter(path) if path else None
+
+
+def _reset(token):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Gerador assíncrono finalizado em outro contexto (ex.: stream abandonado pelo cliente).
+        pass
+
+
+def _write(name, started_at, duration, trace_id, thread_id, span_id, parent_id, attrs):
+    _writer.write({
+        "trace_id": trace_id,
+        "span_id": span_id,
+        "parent_id": parent_id,
+        "thread_id": thread_id,
+        "name": name,
+        "start": round(started_at, 6),
+        "duration_ms": round(duration * 1000, 3),
+        **attrs,
+    })
+
+
+def record_span(name, started_at, duration, parent=None, **attrs):
+    """Registra no trace um span já medido ('started_at' em epoch, 'duration' em segundos)."""
+    if _writer is None:
+        return
+    trace_id, thread_id, parent_id = parent or _current.get()
+    _write(name, started_at, duration, trace_id, thread_id, next(_span_ids), parent_id, attrs)
+
+
+@contextmanager
+def span(name, histogram=None, **attrs):
+    """
+    Mede o bloco: observa a duração em 'histogram' (com os rótulos tirados de 'attrs') e grava o span
+    no trace. O dict devolvido pode receber atributos durante o bloco (ex.: attrs["outcome"] = "interrupt");
+    'outcome' vale "ok", ou "error" quando o bloco levanta uma exceção.
+    """
+    trace_id, thread_id, parent_id = _current.get()
+    span_id = next(_span_ids)
+    token = _current.set((trace_id, thread_id, span_id))
+    started_at, start = time.time(), time.perf_counter()
+    try:
+        yield attrs
+    except BaseException:
+        attrs.setdefault("outcome", "error")
+        raise
+    else:
+        attrs.setdefault("outcome", "ok")
+    finally:
+        duration = time.perf_counter() - start
+        _reset(token)
+        if histogram is not None:
+            histogram.observe(duration, **attrs)
+        if _writer is not None:
+            _write(name, started_at, duration, trace_id, thread_id, span_id, parent_id, attrs)
+
+
+@contextmanager
+def turn_span(thread_id, kind):
+    """Span raiz de um turno do agente: tudo o que roda dentro dele (modelo, ferramentas, Calendar, checkpoints) fica no mesmo trace."""
+    token = _current.set((uuid.uuid4().hex, thread_id, None))
+    try:
+        with span("turn", TURN_SECONDS, kind=kind) as attrs:
+            yield attrs
+    finally:
+        _reset(token)
+
+
+def _text(output):
+    content = getattr(output, "content", output)
+    return content if isinstance(content, str) else str(content)
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """
+    Callbacks do LangChain que medem cada chamada ao modelo (duração, tempo até o primeiro token e tokens)
+    e cada execução de ferramenta. Passe em config["callbacks"] ao chamar o agente.
+    Ferramentas que devolvem texto começando com "Erro" contam como outcome="error".
+    """
+
+    # Roda no próprio event loop, sem passar por um executor: os métodos só anotam tempos.
+    run_inline = True
+    # Só interessam os eventos de modelo e de ferramenta; os dos nós do grafo são descartados na origem.
+    ignore_chain = True
+    ignore_retriever = True
+    ignore_retry = True
+    ignore_custom_event = True
+
+    def __init__(self):
+        self._runs = {}
+
+    def _start(self, run_id, **info):
+        self._runs[run_id] = {
+            "started_at": time.time(),
+            "start": time.perf_counter(),
+            "parent": _current.get(),
+            **info,
+        }
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "desconhecido"
+        # As chamadas marcadas com "nostream" são internas (ex.: o resumo do histórico).
+        call = "interna" if "nostream" in (tags or []) else "agente"
+        self._start(run_id, model=model, call=call, first_token=None)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run and run["first_token"] is None:
+            run["first_token"] = time.perf_counter()
+
+    def _finish_llm(self, run_id, outcome, response=None):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        end = time.perf_counter()
+        duration = end - run["start"]
+        ttft = (run["first_token"] or end) - run["start"]
+        LLM_SECONDS.observe(duration, model=run["model"], call=run["call"], outcome=outcome)
+        LLM_TTFT_SECONDS.observe(ttft, model=run["model"], call=run["call"])
+
+        tokens = {}
+        if response is not None and response.generations and response.generations[0]:
+            usage = getattr(response.generations[0][0], "message", None)
+            usage = getattr(usage, "usage_metadata", None) or {}
+            tokens = {
+                "input": usage.get("input_tokens", 0),
+                "output": usage.get("output_tokens", 0),
+                "cached": (usage.get("input_token_details") or {}).get("cache_read", 0),
+            }
+            for kind, amount in tokens.items():
+                if amount:
+                    LLM_TOKENS.inc(amount, model=run["model"], type=kind)
+
+        record_span(
+            "llm", run["started_at"], duration, parent=run["parent"],
+            model=run["model"], call=run["call"], outcome=outcome,
+            ttft_ms=round(ttft * 1000, 3), tokens=tokens,
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish_llm(run_id, "ok", response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish_llm(run_id, "error")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, tool=(serialized or {}).get("name") or kwargs.get("name") or "desconhecida")
+
+    def _finish_tool(self, run_id, outcome):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        duration = time.perf_counter() - run["start"]
+        TOOL_SECONDS.observe(duration, tool=run["tool"], outcome=outcome)
+        record_span("tool", run["started_at"], duration, parent=run["parent"], tool=run["tool"], outcome=outcome)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish_tool(run_id, "error" if _text(output).startswith("Erro") else "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish_tool(run_id, "error")
+
+
+# Handlers compartilhados pelo processo; os runs são separados pelo run_id. O de gravação
+# (telemetry/recording.py) só trabalha com RECORD_PATH ligado.
+TRACE_CALLBACKS = [TraceCallbackHandler(), RecordingCallbackHandler()]
@@ -0,0 +1,103 @@
+import io
+import asyncio
+import contextlib
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.types import Command
+
+import agent as agent_module
+from bench.fakes import FakeChatModel, fake_context_cache
+from server import AWAITING_APPROVAL_REPLY, LeadSessions
+from storage.approvals import ApprovalQueue, expand_decision
+from storage.checkpointer import open_checkpointer
+
+
+DELETES = {
+    "delete_calendar_event": lambda event_id: {"event_id": event_id},
+    "bulk_delete_calendar_events": lambda event_id: {"event_ids": [event_id]},
+}
+
+
+@pytest.mark.parametrize("tool_name", DELETES)
+def test_deletes_wait_for_the_operator(fake_calendar, tmp_path, tool_name):
+    event = fake_calendar._insert("primary", {
+        "summary": "Lead 1 - Visita",
+        "start": {"dateTime": "2026-11-03T10:00:00-03:00"}, "end": {"dateTime": "2026-11-03T11:00:00-03:00"},
+    })
+    model = FakeChatModel(script=[("cancele", [(tool_name, DELETES[tool_name](event["id"]))])])
+    config = {"configurable": {"thread_id": "lead-1"}}
+
+    async def run():
+        async with open_checkpointer(str(tmp_path / "db.sqlite"), maintenance_interval=0) as saver:
+            graph = agent_module.build_agent(saver, model=model, cache_factory=fake_context_cache)
+            with contextlib.redirect_stdout(io.StringIO()):
+                first = await graph.ainvoke({"messages": [HumanMessage(content="Por favor, cancele a visita.")]}, config)
+                interrupts = first.get("__interrupt__", ())
+                # Nada é apagado antes da decisão do operador.
+                assert event["id"] in fake_calendar.calendars["primary"]
+                await graph.ainvoke(Command(resume={"decisions": [{"type": "reject", "message": "Não apague."}]}), config)
+            return interrupts
+
+    interrupts = asyncio.run(run())
+
+    assert [r["name"] for r in interrupts[0].value["action_requests"]] == [tool_name]
+    assert event["id"] in fake_calendar.calendars["primary"]
+
+
+def test_message_sent_during_a_pending_approval_is_answered_after_the_decision(fake_calendar, tmp_path):
+    model = FakeChatModel(script=[("visita", [("create_calendar_event", {
+        "summary": "Lead 1 - Visita", "start_time": "2026-11-03T10:00:00",
+    })])])
+    db_path = str(tmp_path / "db.sqlite")
+    config = {"configurable": {"thread_id": "lead-1"}}
+
+    async def sessions_for(saver):
+        approvals = ApprovalQueue(saver)
+        await approvals.setup()
+        graph = agent_module.build_agent(saver, model=model, cache_factory=fake_context_cache)
+        return LeadSessions(graph, approvals)
+
+    async def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            async with open_checkpointer(db_path, maintenance_interval=0) as saver:
+                sessions = await sessions_for(saver)
+                assert await sessions.run_turn("lead-1", "Quero agendar uma visita.") == AWAITING_APPROVAL_REPLY
+                assert await sessions.run_turn("lead-1", "Tem vaga de garagem?") == AWAITING_APPROVAL_REPLY
+                assert (await sessions.approvals.get("lead-1"))["queued"] == ["Tem vaga de garagem?"]
+
+            # A mensagem guardada sobrevive a um reinício do processo.
+            async with open_checkpointer(db_path, maintenance_interval=0) as saver:
+                sessions = await sessions_for(saver)
+                reply = await sessions.resume_turn("lead-1", {"type": "approve"})
+                state = await sessions.agent.aget_state(config)
+                pending = await sessions.approvals.get("lead-1")
+        return reply, state, pending
+
+    reply, state, pending = asyncio.run(run())
+
+    humans = [m.text for m in state.values["messages"] if isinstance(m, HumanMessage)]
+    assert humans == ["Quero agendar uma visita.", "Tem vaga de garagem?"]
+    assert reply.endswith(model.reply)
+    assert pending is None
+    assert len(fake_calendar.calendars["primary"]) == 1
+
+
+def test_edit_decision_never_copies_args_across_actions():
+    actions = [
+        {"name": "create_calendar_event", "args": {"summary": "Lead 1 - Visita", "start_time": "2026-11-03T10:00:00"}},
+        {"name": "delete_calendar_event", "args": {"event_id": "evt000001"}},
+    ]
+
+    with pytest.raises(ValueError):
+        expand_decision(actions, {"type": "edit", "args": {"start_time": "2026-11-03T14:00:00"}})
+    with pytest.raises(ValueError):
+        expand_decision(actions, {"type": "edit", "args": [{"start_time": "2026-11-03T14:00:00"}]})
+
+    decisions = expand_decision(actions, {"type": "edit", "args": [{"start_time": "2026-11-03T14:00:00"}, {}]})
+    assert [d["edited_action"] for d in decisions] == [
+        {"name": "create_calendar_event", "args": {"summary": "Lead 1 - Visita", "start_time": "2026-11-03T14:00:00"}},
+        {"name": "delete_calendar_event", "args": {"event_id": "evt000001"}},
+    ]
+    single = expand_decision(actions[:1], {"type": "edit", "args": {"start_time": "2026-11-03T14:00:00"}})
+    assert single[0]["edited_action"]["args"]["start_time"] == "2026-11-03T14:00:00"
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from storage.checkpointer import archive_cold_threads, open_checkpointer
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+async def _put(saver, thread_id):
+    await saver.aput(_config(thread_id), empty_checkpoint(), {"source": "input", "step": 0}, {})
+    await saver.flush()
+
+
+async def _count(saver, table, thread_id):
+    async with saver.lock:
+        async with saver.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE thread_id = ?", (thread_id,)) as cursor:
+            return (await cursor.fetchone())[0]
+
+
+def test_archiving_releases_the_lock_and_keeps_reactivated_threads(tmp_path):
+    async def run():
+        async with open_checkpointer(
+            str(tmp_path / "db.sqlite"), maintenance_interval=0, archive_path=str(tmp_path / "archive.sqlite"),
+            archive_after_days=30,
+        ) as saver:
+            for n in range(5):
+                await _put(saver, f"lead-{n}")
+            await _put(saver, "ativo")
+            async with saver.lock:
+                await saver.conn.execute("UPDATE session_activity SET last_active = 0 WHERE thread_id != 'ativo'")
+                await saver.conn.commit()
+            saver.idle_ttl = 0
+            saver._evict()
+
+            started, proceed = threading.Event(), threading.Event()
+            recompress = saver.serde.recompress
+
+            def paused_recompress(*args):
+                started.set()
+                proceed.wait(5)
+                return recompress(*args)
+
+            saver.serde.recompress = paused_recompress
+            archiving = asyncio.create_task(archive_cold_threads(saver, 30))
+            await asyncio.to_thread(started.wait, 5)
+
+            # Durante a recompressão, turnos de outras conversas leem e gravam sem esperar o arquivamento.
+            assert await asyncio.wait_for(saver.aget_tuple(_config("ativo")), 1) is not None
+            # ... e uma conversa fria volta a ser usada.
+            await asyncio.wait_for(_put(saver, "lead-0"), 1)
+
+            proceed.set()
+            archived = await archiving
+
+            assert archived == 4
+            assert await _count(saver, "checkpoints", "lead-0") > 0
+            assert await _count(saver, "archive.checkpoints", "lead-0") == 0
+            assert await _count(saver, "checkpoints", "lead-1") == 0
+            assert await _count(saver, "archive.checkpoints", "lead-1") == 1
+
+    asyncio.run(run())
@@ -0,0 +1,102 @@
+import io
+import asyncio
+import contextlib
+from datetime import date, datetime, timedelta
+
+import pytz
+
+from tools.calendar_tools import bulk_create_calendar_events, create_calendar_event
+
+
+LOCAL_TZ = pytz.timezone("America/Sao_Paulo")
+
+
+def _next_business_day():
+    day = date.today() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def _at(day, hour, minute=0):
+    return LOCAL_TZ.localize(datetime(day.year, day.month, day.day, hour, minute))
+
+
+def _overlaps(service, calendar_id="primary"):
+    """Pares de eventos da agenda que se sobrepõem (sem contar o intervalo de 15 minutos)."""
+    spans = sorted(
+        (datetime.fromisoformat(e["start"]["dateTime"]), datetime.fromisoformat(e["end"]["dateTime"]))
+        for e in service.calendars.get(calendar_id, {}).values()
+    )
+    return sum(1 for a, b in zip(spans, spans[1:]) if b[0] < a[1])
+
+
+async def _book_concurrently(starts):
+    async def book(n, start):
+        return await create_calendar_event.ainvoke({
+            "summary": f"Lead {n} - Visita",
+            "start_time": start.replace(tzinfo=None).isoformat(),
+            "attendees": [f"lead{n}@example.com"],
+        })
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return await asyncio.gather(*(book(n, start) for n, start in enumerate(starts)))
+
+
+def test_concurrent_bookings_of_the_same_slot_create_one_event(fake_calendar):
+    day = _next_business_day()
+    results = asyncio.run(_book_concurrently([_at(day, 10)] * 20))
+
+    assert sum(r.startswith("Evento criado") for r in results) == 1
+    assert len(fake_calendar.calendars["primary"]) == 1
+    assert _overlaps(fake_calendar) == 0
+
+
+def test_concurrent_overlapping_bookings_leave_no_overlaps(fake_calendar):
+    day = _next_business_day()
+    # Inícios a cada 20 minutos: cada reserva de 1 h colide com as vizinhas.
+    starts = [_at(day, 8) + timedelta(minutes=20 * i) for i in range(24)]
+    results = asyncio.run(_book_concurrently(starts))
+
+    created = sum(r.startswith("Evento criado") for r in results)
+    assert created == len(fake_calendar.calendars["primary"]) > 1
+    assert _overlaps(fake_calendar) == 0
+
+
+def test_booking_sees_events_created_outside_the_process(fake_calendar):
+    day = _next_business_day()
+    asyncio.run(_book_concurrently([_at(day, 8)]))
+    # Evento criado por outra instância/cliente depois da última sincronização do espelho.
+    fake_calendar.events().insert(calendarId="primary", body={
+        "summary": "Reunião externa",
+        "start": {"dateTime": _at(day, 14).isoformat()},
+        "end": {"dateTime": _at(day, 15).isoformat()},
+    }).execute()
+
+    result, = asyncio.run(_book_concurrently([_at(day, 14, 30)]))
+
+    assert "Reunião externa" in result
+    assert _overlaps(fake_calendar) == 0
+
+
+def test_concurrent_bulk_and_single_bookings_leave_no_overlaps(fake_calendar):
+    day = _next_business_day()
+    batch = [
+        {"summary": f"Lote {i} - Visita", "start_time": _at(day, 9 + 2 * i).replace(tzinfo=None).isoformat()}
+        for i in range(4)
+    ]
+
+    async def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return await asyncio.gather(
+                bulk_create_calendar_events.ainvoke({"events": batch}),
+                *(create_calendar_event.ainvoke({
+                    "summary": f"Lead {n} - Visita",
+                    "start_time": _at(day, 9 + 2 * n).replace(tzinfo=None).isoformat(),
+                }) for n in range(4)),
+            )
+
+    asyncio.run(run())
+
+    assert len(fake_calendar.calendars["primary"]) == 4
+    assert _overlaps(fake_calendar) == 0
@@ -0,0 +1,54 @@
+import threading
+
+import google_auth_oauthlib.flow
+
+from API import google_auth
+
+
+def test_failed_service_is_not_retried_inside_the_window(monkeypatch):
+    calls = []
+
+    def failing_service():
+        calls.append(1)
+        raise RuntimeError("sem token")
+
+    monkeypatch.delitem(google_auth.__dict__, "service", raising=False)
+    monkeypatch.setattr(google_auth, "get_calendar_service", failing_service)
+    monkeypatch.setattr(google_auth, "_retry_at", 0.0)
+
+    assert all(google_auth.service is None for _ in range(10))
+    assert len(calls) == 1
+
+    # Passada a janela, tenta de novo.
+    google_auth._retry_at = 0.0
+    assert google_auth.service is None
+    assert len(calls) == 2
+
+
+def test_interactive_flow_never_runs_off_the_main_thread(monkeypatch, tmp_path):
+    secret = tmp_path / "client_secret.json"
+    secret.write_text("{}")
+    monkeypatch.setattr(google_auth, "CREDS_PATH", str(secret))
+    monkeypatch.setattr(google_auth, "TOKEN_PATH", str(tmp_path / "token.json"))
+    monkeypatch.setattr(google_auth, "TOKEN_LOCK_PATH", str(tmp_path / "token.json.lock"))
+
+    def flow_started(*args, **kwargs):
+        raise AssertionError("fluxo interativo iniciado fora da thread principal")
+
+    monkeypatch.setattr(google_auth_oauthlib.flow.InstalledAppFlow, "from_client_secrets_file", flow_started)
+
+    errors = []
+
+    def worker():
+        try:
+            google_auth.get_credentials()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join(5)
+
+    assert len(errors) == 1
+    assert isinstance(errors[0], RuntimeError)
+    assert "python -m API.google_auth" in str(errors[0])
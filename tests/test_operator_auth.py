@@ -0,0 +1,69 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+import server
+from storage.approvals import ApprovalQueue
+from storage.checkpointer import open_checkpointer
+from storage.lead_state import LeadStateStore
+
+
+TOKEN = "segredo-do-operador"
+OPERATOR_ROUTES = [
+    ("GET", "/approvals"),
+    ("POST", "/approvals/decisions"),
+    ("GET", "/leads"),
+    ("GET", "/leads/export"),
+    ("GET", "/leads/lead-1/state"),
+]
+
+
+def _context(db_path):
+    """Checkpointer, fila de aprovações e fichas reais, sem compilar o agente (nenhum turno roda)."""
+    async def context(app):
+        async with open_checkpointer(str(db_path), maintenance_interval=0) as saver:
+            approvals = ApprovalQueue(saver)
+            await approvals.setup()
+            lead_states = LeadStateStore(saver)
+            await lead_states.setup()
+            app[server.LEAD_STATES] = lead_states
+            app[server.SESSIONS] = server.LeadSessions(None, approvals)
+            yield
+    return context
+
+
+def _statuses(tmp_path, operator_token, headers):
+    async def run():
+        app = server.create_app(operator_token=operator_token, agent_context=_context(tmp_path / "db.sqlite"))
+        async with TestClient(TestServer(app)) as client:
+            statuses = {}
+            for method, path in OPERATOR_ROUTES:
+                kwargs = {"json": {"decisions": []}} if method == "POST" else {}
+                response = await client.request(method, path, headers=headers, **kwargs)
+                statuses[path] = response.status
+            statuses["/health"] = (await client.get("/health")).status
+            return statuses
+
+    return asyncio.run(run())
+
+
+def test_operator_routes_reject_missing_or_wrong_token(tmp_path):
+    for headers in ({}, {"Authorization": "Bearer outro"}, {"Authorization": TOKEN}):
+        statuses = _statuses(tmp_path, TOKEN, headers)
+        assert all(statuses[path] == 401 for _, path in OPERATOR_ROUTES), statuses
+        assert statuses["/health"] == 200
+
+
+def test_operator_routes_accept_the_token(tmp_path):
+    statuses = _statuses(tmp_path, TOKEN, {"Authorization": f"Bearer {TOKEN}"})
+    assert statuses["/approvals"] == 200
+    assert statuses["/approvals/decisions"] == 200
+    assert statuses["/leads"] == 200
+    assert statuses["/leads/export"] == 200
+    # Sem ficha para o lead: passou pela autenticação e chegou ao handler.
+    assert statuses["/leads/lead-1/state"] == 404
+
+
+def test_operator_routes_are_closed_without_a_configured_token(tmp_path):
+    statuses = _statuses(tmp_path, "", {"Authorization": "Bearer "})
+    assert all(statuses[path] == 403 for _, path in OPERATOR_ROUTES), statuses
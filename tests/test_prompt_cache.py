@@ -0,0 +1,87 @@
+import json
+import asyncio
+from datetime import datetime, timedelta
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.checkpoint.memory import InMemorySaver
+
+import agent as agent_module
+from bench.fakes import FakeChatModel, fake_context_cache
+from middleware.prompt_cache import prefix_key
+
+
+LEAD_TURN = "Procuro um apartamento de 2 quartos no Centro, até R$ 500 mil. Quais horários vocês têm?"
+LEADS = ("lead-1", "lead-2")
+CONTEXT_TAG = "[CONTEXTO_DO_TURNO]"
+
+
+class PromptRecordingModel(FakeChatModel):
+    """FakeChatModel que guarda as mensagens de cada chamada (compartilhadas com as cópias do cache)."""
+    prompts: list = []
+
+    def _respond(self, messages):
+        self.prompts.append(list(messages))
+        return super()._respond(messages)
+
+
+def _run(monkeypatch, turns=3, builds=2):
+    """Roda 'turns' turnos para cada lead em 'builds' agentes recompilados; retorna (prefixos, prompts, históricos)."""
+    clock = [datetime(2026, 10, 19, 9, 0)]
+    render = agent_module.build_turn_context
+    monkeypatch.setattr(
+        agent_module, "build_turn_context", lambda current_datetime=None, lead=None: render(clock[0], lead),
+    )
+    prefixes, prompts, histories = [], [], []
+
+    def recording_factory(model, system_message, tools, ttl):
+        schemas = json.dumps([convert_to_openai_tool(tool) for tool in tools], sort_keys=True, ensure_ascii=False)
+        prefixes.append((system_message.text.encode(), schemas.encode(), prefix_key(system_message, tools)))
+        return fake_context_cache(model, system_message, tools, ttl)
+
+    async def run():
+        for _ in range(builds):
+            model = PromptRecordingModel()
+            saver = InMemorySaver()
+            graph = agent_module.build_agent(saver, model=model, cache_factory=recording_factory)
+            for lead in LEADS:
+                config = {"configurable": {"thread_id": lead}}
+                for _ in range(turns):
+                    clock[0] += timedelta(minutes=7)
+                    await graph.ainvoke({"messages": [HumanMessage(content=LEAD_TURN)]}, config, context={"lead_id": lead})
+                histories.append((await graph.aget_state(config)).values["messages"])
+            prompts.extend(model.prompts)
+
+    asyncio.run(run())
+    return prefixes, prompts, histories
+
+
+def test_static_prefix_is_identical_across_turns_leads_and_rebuilds(monkeypatch):
+    prefixes, prompts, _ = _run(monkeypatch)
+
+    # Um cache por agente compilado: o prefixo não mudou entre turnos nem entre leads.
+    assert len(prefixes) == 2
+    assert prefixes[0] == prefixes[1]
+    system_text = prefixes[0][0].decode()
+    assert "2026" not in system_text and "lead-" not in system_text
+    # Com o cache ativo, prompt de sistema e ferramentas não são reenviados.
+    assert prompts and not any(isinstance(m, SystemMessage) for prompt in prompts for m in prompt)
+
+
+def test_turn_date_and_lead_data_only_in_the_turn_context(monkeypatch):
+    _, prompts, histories = _run(monkeypatch)
+
+    assert len(prompts) >= 2 * len(LEADS) * 3
+    for prompt in prompts:
+        notes = [m for m in prompt if m.text.startswith(CONTEXT_TAG)]
+        assert len(notes) == 1, prompt
+        # Logo antes da última mensagem do lead.
+        last_human = max(i for i, m in enumerate(prompt) if isinstance(m, HumanMessage) and m is not notes[0])
+        assert prompt.index(notes[0]) == last_human - 1
+        assert "/10/2026" in notes[0].text and "lead_id: lead-" in notes[0].text
+        for message in prompt:
+            if message is not notes[0]:
+                assert "/10/2026" not in message.text and "lead-" not in message.text
+
+    # O bloco do turno não é gravado no histórico.
+    assert not any(CONTEXT_TAG in m.text for history in histories for m in history)
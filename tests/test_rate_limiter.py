@@ -0,0 +1,46 @@
+import time
+import threading
+
+from API import calendar_client
+from API.calendar_client import TokenBucket, execute_batch
+
+
+def test_large_request_is_charged_in_full():
+    bucket = TokenBucket(rate=100, capacity=10)
+    start = time.perf_counter()
+    bucket.acquire(50)
+    # 10 fichas do saldo inicial; as outras 40 levam 0,4 s para acumular.
+    assert 0.38 <= time.perf_counter() - start < 0.6
+
+
+def test_requests_after_a_batch_wait_for_its_debt():
+    bucket = TokenBucket(rate=100, capacity=10)
+    bucket.acquire(50)
+    start = time.perf_counter()
+    bucket.acquire(1)
+    assert 0.005 <= time.perf_counter() - start < 0.1
+
+
+def test_rate_holds_across_threads():
+    bucket = TokenBucket(rate=200, capacity=10)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=bucket.acquire, args=(5,)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 100 fichas: 10 do saldo inicial e 90 a 200/s.
+    assert time.perf_counter() - start >= 0.44
+
+
+def test_fifty_item_batch_waits_for_fifty_tokens(fake_calendar, monkeypatch):
+    fake_calendar.latency = 0.0
+    monkeypatch.setattr(calendar_client, "rate_limiter", TokenBucket(rate=100, capacity=10))
+    requests = [fake_calendar.events().delete(calendarId="primary", eventId=f"e{i}") for i in range(50)]
+
+    start = time.perf_counter()
+    results = execute_batch(fake_calendar, requests)
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 50
+    assert 0.38 <= elapsed < 0.6
@@ -0,0 +1,38 @@
+import io
+import asyncio
+import contextlib
+
+from langchain_core.messages import HumanMessage
+
+import agent as agent_module
+from bench.fakes import FakeChatModel, fake_context_cache
+from storage.checkpointer import open_checkpointer
+from streaming.events import agent_events
+
+
+LIGHT_REPLY = "Oi! Tudo bem? Você quer comprar ou alugar?"
+
+
+def _streamed_text(tmp_path, text, light_model):
+    async def run():
+        async with open_checkpointer(str(tmp_path / "db.sqlite"), maintenance_interval=0) as saver:
+            graph = agent_module.build_agent(
+                saver, model=FakeChatModel(), cache_factory=fake_context_cache, light_model=light_model,
+            )
+            config = {"configurable": {"thread_id": "lead-1"}}
+            payload = {"messages": [HumanMessage(content=text)]}
+            with contextlib.redirect_stdout(io.StringIO()):
+                return "".join([e.text async for e in agent_events(graph, payload, config, {"token"})])
+
+    return asyncio.run(run())
+
+
+def test_light_model_reply_is_streamed_once(tmp_path):
+    light_model = FakeChatModel(reply=LIGHT_REPLY, stream_chunk=8)
+    assert _streamed_text(tmp_path, "oi, tudo bem?", light_model) == LIGHT_REPLY
+
+
+def test_main_model_reply_is_streamed_once(tmp_path):
+    main_reply = FakeChatModel().reply
+    light_model = FakeChatModel(reply=LIGHT_REPLY, stream_chunk=8)
+    assert _streamed_text(tmp_path, "quero comprar um apartamento no centro", light_model) == main_reply
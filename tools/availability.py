@@ -0,0 +1,112 @@
+from bisect import bisect_right
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+try:
+    LOCAL_TZ = ZoneInfo("America/Sao_Paulo")
+except ZoneInfoNotFoundError:
+    LOCAL_TZ = timezone(timedelta(hours=-3))
+
+# Regras de negócio de agendamento (as mesmas validadas em 'create_calendar_event').
+BUSINESS_START = time(8, 0)
+BUSINESS_END = time(18, 0)
+BUFFER_MINUTES = 15
+
+
+class BusyIndex:
+    """
+    Índice de horários ocupados como um vetor de intervalos já mesclados e ordenados.
+    Cada consulta de disponibilidade é uma busca binária (O(log n)).
+    """
+
+    def __init__(self, intervals):
+        starts, ends = [], []
+        for start, end in sorted(intervals):
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def is_free(self, start, end):
+        """True se [start, end) não se sobrepõe a nenhum intervalo ocupado."""
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and self.ends[i] > start:
+            return False
+        return i + 1 >= len(self.starts) or self.starts[i + 1] >= end
+
+    def free_gaps(self, start, end):
+        """Intervalos livres dentro de [start, end), em ordem."""
+        i = max(bisect_right(self.starts, start) - 1, 0)
+        cursor = start
+        while cursor < end and i < len(self.starts):
+            busy_start, busy_end = self.starts[i], self.ends[i]
+            if busy_start >= end:
+                break
+            if busy_end > cursor:
+                if busy_start > cursor:
+                    yield cursor, busy_start
+                cursor = busy_end
+            i += 1
+        if cursor < end:
+            yield cursor, end
+
+
+def build_busy_index(intervals, buffer_minutes=BUFFER_MINUTES):
+    """
+    Monta o índice a partir de (início, fim) em timestamp.
+    Cada evento é estendido 'buffer_minutes' para trás: assim um horário livre no índice também
+    respeita o intervalo obrigatório entre o fim da reunião nova e o próximo compromisso.
+    """
+    buffer = buffer_minutes * 60
+    return BusyIndex((start - buffer, end) for start, end in intervals)
+
+
+def find_free_slots(
+    busy,
+    range_start,
+    range_end,
+    duration_minutes=60,
+    step_minutes=30,
+    max_slots=10,
+    now=None,
+):
+    """
+    Retorna até 'max_slots' horários (início, fim) livres entre 'range_start' e 'range_end'
+    (datetimes com fuso), apenas de segunda a sexta, começando e terminando dentro do horário
+    comercial e alinhados a 'step_minutes' a partir das 08:00.
+    """
+    duration = duration_minutes * 60
+    step = step_minutes * 60
+    earliest = max(range_start, now) if now else range_start
+
+    slots = []
+    day = range_start.astimezone(LOCAL_TZ).date()
+    last_day = range_end.astimezone(LOCAL_TZ).date()
+    while day <= last_day and len(slots) < max_slots:
+        if day.weekday() < 5:
+            opening = datetime.combine(day, BUSINESS_START, LOCAL_TZ).timestamp()
+            closing = datetime.combine(day, BUSINESS_END, LOCAL_TZ).timestamp()
+            window_start = max(opening, earliest.timestamp())
+            window_end = min(closing, range_end.timestamp())
+
+            for gap_start, gap_end in busy.free_gaps(window_start, window_end):
+                # Alinha o início à grade de 'step_minutes' contada a partir da abertura.
+                offset = (gap_start - opening) % step
+                slot_start = gap_start if offset == 0 else gap_start + (step - offset)
+                while slot_start + duration <= gap_end and len(slots) < max_slots:
+                    slots.append((
+                        datetime.fromtimestamp(slot_start, LOCAL_TZ),
+                        datetime.fromtimestamp(slot_start + duration, LOCAL_TZ),
+                    ))
+                    slot_start += step
+                if len(slots) >= max_slots:
+                    break
+        day += timedelta(days=1)
+    return slots
@@ -1,112 +1,79 @@
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 from googleapiclient.errors import HttpError
 
+import threading
 from typing import List
+from typing_extensions import TypedDict
+from functools import partial, wraps
 
 import pytz
-from datetime import datetime, time, timedelta, timezone
-
-
-try:
-    from API.google_auth import service
-except ImportError:
-    print("ERRO: Não foi possível encontrar o arquivo 'google_calendar.py'")
-
-try:
-    print("Serviço do Google Calendar carregado em calendar_tools.py")
-except Exception as e:
-    print(f"Erro grave ao inicializar o serviço do Google Calendar: {e}")
-    service = None
-
-
-@tool
-def list_upcoming_events(max_results: int = 10):
-    """ Recupera listas de calendários da conta do Google Calendar, respeitando o limite definido por max_capacity.
-
-    Parâmetros:
-      max_capacity (int, opcional): Número máximo de calendários a serem recuperados. Se fornecido como string, a função a converte para inteiro. O padrão é 200.
-
-    Retorno:
-      list: Uma lista de dicionários. Cada dicionário contém os dados formatados do calendário, com as seguintes chaves:
-            - 'id': Identificador único do calendário.
-            - 'name': Nome ou resumo do calendário.
-            - 'description': Descrição do calendário (pode ser vazia).
-            - 'primary': Indica se é o calendário principal (True ou False).
-            - 'time_zone': Fuso horário associado ao calendário.
-            - 'etag': Identificador de versão do calendário.
-            - 'access_role': Papel de acesso do usuário ao calendário.
-
-    Funcionamento:
-      A função realiza chamadas paginadas à API do Google Calendar. Em cada iteração, são recuperados até 200 itens
-      ou o número restante definido por max_capacity. O loop é interrompido quando o número total de itens recuperados
-      atinge max_capacity ou quando não há mais páginas de resultados. Após a coleta, os dados de cada calendário são
-      "limpos" para conter apenas os campos relevantes e retornados em uma lista."""
-    
-    if not service:
-        return "Erro: O serviço do Google Calendar não foi inicializado."
-        
-    try:
-        now = datetime.now(timezone.utc).isoformat()
-        events_result = (
-            service.events()
-            .list(
-                calendarId="primary",
-                timeMin=now,
-                maxResults=max_results,
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-        )
-        events = events_result.get("items", [])
-        
-        if not events:
-            return "Nenhum evento encontrado."
-        
-        safe_events = []
-        for event in events:
-            safe_events.append({
-                "start": event.get("start", {}).get("dateTime"),
-                "end": event.get("end", {}).get("dateTime"),
-                "status": event.get("status", "confirmed"),
-                "title": event.get("summary", "Compromisso"),
-            })
-
-        return safe_events 
-        
-    except HttpError as error:
-        return f"Erro ao acessar a API do Google Calendar: {error}"
-    except Exception as e:
-        return f"Erro inesperado ao listar eventos: {e}"
+from datetime import datetime, time, timedelta
 
-@tool
-def create_calendar_event(
-    summary: str,
-    start_time: str,
-    end_time: str = None,
-    attendees: List[str] = None,
-    location: str = None,
-    description: str = None,
-    **kwargs
-):
+from API.calendar_client import get_service, run_in_calendar_executor, execute, execute_batch
+from API.event_cache import get_event_cache
+from API.brokers import get_broker, get_brokers, query_busy, invalidate_busy, choose_broker
+from tools.availability import BUFFER_MINUTES, build_busy_index, find_free_slots
+from tools.output_format import EVENT_OUTPUT, SEARCH_OUTPUT, SLOT_OUTPUT, BROKER_OUTPUT, BATCH_OUTPUT, shape_output
+
+
+def calendar_tool(func=None, *, output=None):
     """
-    Cria um novo evento no Google Calendar, APENAS SE O HORÁRIO ESTIVER LIVRE.
-    - 'start_time' pode ser 'AAAA-MM-DDTHH:MM:SS' ou 'HH:MM:SS' (usa hoje).
-    - Se 'end_time' não for fornecido, dura 1h.
-    - 'attendees' é lista de e-mails.
-    
-    REGRAS DE NEGÓCIO:
-    - Agendamentos permitidos apenas de Segunda a Sexta, das 08:00 às 18:00.
-    - Título (summary) deve ser: "[Nome] - [Assunto/Palavras-chave]"
-    - Descrição deve conter: Nome, O que procura, E-mail e detalhes extras.
+    Registra 'func' como ferramenta do agente com duas implementações:
+    a síncrona (a própria função) e uma assíncrona, que roda a mesma função no
+    executor do Google Calendar para não bloquear o event loop durante a chamada HTTP.
+    O retorno passa pela camada de saída comum (tools/output_format.py): os itens são projetados
+    nas colunas de 'output' e serializados como tabela compacta, com teto de tokens.
     """
-    if not service:
-        return "Erro: O serviço do Google Calendar não foi inicializado."
+    if func is None:
+        return partial(calendar_tool, output=output)
+
+    @wraps(func)
+    def _run(*args, **kwargs):
+        return shape_output(func(*args, **kwargs), output)
 
+    async def _arun(*args, **kwargs):
+        return await run_in_calendar_executor(_run, *args, **kwargs)
+
+    return StructuredTool.from_function(func=_run, coroutine=_arun)
+
+
+class NewEvent(TypedDict, total=False):
+    """Um evento a ser criado em lote (mesmos campos de 'create_calendar_event')."""
+    summary: str
+    start_time: str
+    end_time: str
+    attendees: List[str]
+    location: str
+    description: str
+
+
+class EventChanges(TypedDict, total=False):
+    """Alterações de um evento em lote: 'event_id' e apenas os campos que mudam."""
+    event_id: str
+    summary: str
+    start_time: str
+    end_time: str
+    location: str
+    description: str
+    attendees: List[str]
+
+
+def _calendar_for(broker_id):
+    """Agenda do corretor informado; sem 'broker_id', usa a agenda principal. None se o corretor não existe."""
+    if not broker_id:
+        return "primary"
+    broker = get_broker(broker_id)
+    return broker.calendar_id if broker else None
+
+
+def _resolve_event_times(start_time, end_time=None):
+    """
+    Converte 'start_time'/'end_time' para datetimes no fuso de São Paulo e aplica as regras de horário
+    (segunda a sexta, início entre 08:00 e 18:00). Levanta ValueError com a mensagem para o agente.
+    """
     local_tz = pytz.timezone("America/Sao_Paulo")
- 
-    try:
 
+    try:
         try:
             start_dt_naive = datetime.fromisoformat(start_time)
         except ValueError:
@@ -114,7 +81,7 @@ def create_calendar_event(
             today = datetime.now(local_tz).date()
             start_dt_naive = datetime.combine(today, time_obj)
     except Exception:
-        return (
+        raise ValueError(
             "Formato de 'start_time' inválido. "
             "Use 'AAAA-MM-DDTHH:MM:SS' ou 'HH:MM:SS' (para hoje)."
         )
@@ -127,12 +94,12 @@ def create_calendar_event(
     # --- VALIDAÇÃO DE HORÁRIO COMERCIAL E DIAS ÚTEIS ---
     # Dias da semana: 0=Segunda, 1=Terça, ..., 5=Sábado, 6=Domingo
     if start_dt.weekday() >= 5:
-        return "Erro: Não é permitido agendar reuniões aos sábados e domingos. Por favor, escolha um dia de segunda a sexta-feira."
+        raise ValueError("Erro: Não é permitido agendar reuniões aos sábados e domingos. Por favor, escolha um dia de segunda a sexta-feira.")
 
     # Horário comercial: 08:00 às 18:00
     # Verifica se o início é antes das 08:00 ou se é a partir das 18:00
     if start_dt.hour < 8 or start_dt.hour >= 18:
-        return "Erro: O agendamento deve ser feito apenas em horário comercial (entre 08:00 e 18:00)."
+        raise ValueError("Erro: O agendamento deve ser feito apenas em horário comercial (entre 08:00 e 18:00).")
     # ---------------------------------------------------
 
     if end_time:
@@ -143,7 +110,7 @@ def create_calendar_event(
                 time_obj = time.fromisoformat(end_time)
                 end_dt_naive = datetime.combine(start_dt.date(), time_obj)
         except Exception:
-            return (
+            raise ValueError(
                 "Formato de 'end_time' inválido. "
                 "Use 'AAAA-MM-DDTHH:MM:SS' ou 'HH:MM:SS'."
             )
@@ -155,55 +122,37 @@ def create_calendar_event(
     else:
         end_dt = start_dt + timedelta(hours=1)
 
-    try:
-        buffer_minutes = 15
-        conflict_check_end_dt = end_dt + timedelta(minutes=buffer_minutes)
+    return start_dt, end_dt
 
-        print(
-            f"Verificando conflitos ({start_dt.strftime('%H:%M')} "
-            f"às {end_dt.strftime('%H:%M')})"
-        )
 
-        events_result = (
-            service.events()
-            .list(
-                calendarId="primary",
-                timeMin=start_dt.isoformat(),
-                timeMax=conflict_check_end_dt.isoformat(),
-                singleEvents=True,
-                maxResults=1,
-            )
-            .execute()
-        )
+# Um lock por agenda: a verificação de conflito e a inserção de um agendamento rodam juntas, para
+# que dois leads atendidos ao mesmo tempo não reservem o mesmo horário a partir do mesmo espelho.
+_booking_locks = {}
+_booking_locks_lock = threading.Lock()
 
-        conflicting_events = events_result.get("items", [])
 
-        if conflicting_events:
-            event_summary = conflicting_events[0].get("summary", "desconhecido")
-            return (
-                "Erro: Horário indisponível. "
-                f"Já existe um outro evento ('{event_summary}') "
-                "que impede o intervalo automático de 15 minutos após o término."
-            )
+def _booking_lock(calendar_id):
+    with _booking_locks_lock:
+        return _booking_locks.setdefault(calendar_id, threading.Lock())
 
-    except HttpError as error:
-        return f"Erro ao verificar conflitos na API: {error}"
-    except Exception as e:
-        return f"Erro inesperado ao verificar conflitos: {e}"
-
-    print("\n[HITL] Solicitação para CRIAR evento no Google Calendar:")
-    print(f"  Título : {summary}")
-    print(f"  Início : {start_time}")
-    print(f"  Fim    : {end_time}")
-    if kwargs:
-        print(f"  Extras : {kwargs}")
-
-    resp = input("[HITL] Confirmar criação desse evento? (s/N): ").strip().lower()
-    if resp not in ("s", "sim", "y", "yes"):
-        print("[HITL] Criação de evento CANCELADA pelo humano.")
-        return "Criação de evento cancelada por intervenção humana."
-    
-    event = {
+
+def _find_conflict(calendar_id, start_dt, end_dt, fresh=False):
+    """
+    Primeiro evento que impede o horário (incluindo o intervalo de 15 minutos após o término), ou None.
+    Com 'fresh', sincroniza o espelho com a API antes (ele pode estar até EVENT_CACHE_SYNC_INTERVAL
+    atrasado em relação a eventos criados fora deste processo); use dentro de _booking_lock.
+    """
+    if fresh:
+        get_event_cache(calendar_id).refresh(force=True)
+    conflict_check_end_dt = end_dt + timedelta(minutes=BUFFER_MINUTES)
+    conflicting_events = get_event_cache(calendar_id).events_between(
+        start_dt, conflict_check_end_dt, limit=1
+    )
+    return conflicting_events[0] if conflicting_events else None
+
+
+def _event_body(summary, start_dt, end_dt, attendees=None, location=None, description=None):
+    return {
         "summary": summary,
         "location": location,
         "description": description,
@@ -218,41 +167,142 @@ def create_calendar_event(
         "attendees": [{"email": email} for email in attendees] if attendees else [],
     }
 
+
+def _patch_body(summary=None, start_time=None, end_time=None, location=None, description=None, attendees=None):
+    """Corpo de um events().patch apenas com os campos alterados."""
+    changes = {}
+    if summary is not None:
+        changes['summary'] = summary
+    if location is not None:
+        changes['location'] = location
+    if description is not None:
+        changes['description'] = description
+    if start_time is not None:
+        changes['start'] = {'dateTime': start_time, 'timeZone': "America/Sao_Paulo"}
+    if end_time is not None:
+        changes['end'] = {'dateTime': end_time, 'timeZone': "America/Sao_Paulo"}
+    if attendees is not None:
+        changes['attendees'] = [{'email': email} for email in attendees]
+    return changes
+
+
+@calendar_tool(output=EVENT_OUTPUT)
+def list_upcoming_events(max_results: int = 10, broker_id: str = None):
+    """
+    Lista os próximos eventos da agenda (no máximo 'max_results').
+    Retorna uma tabela 'id|inicio|fim|titulo', com horários de Brasília; use o 'id' para
+    alterar ou excluir um evento.
+    Informe 'broker_id' para consultar a agenda de um corretor específico.
+    """
+    
+    if not get_service():
+        return "Erro: O serviço do Google Calendar não foi inicializado."
+
+    calendar_id = _calendar_for(broker_id)
+    if not calendar_id:
+        return f"Erro: Corretor '{broker_id}' não encontrado."
+        
     try:
-        created_event = (
-            service.events().insert(calendarId="primary", body=event).execute()
-        )
-        return f"Evento criado com sucesso! Link: {created_event.get('htmlLink')}"
+        events = get_event_cache(calendar_id).upcoming(max_results=max_results)
+        
+        if not events:
+            return "Nenhum evento encontrado."
+
+        return events
+        
     except HttpError as error:
-        return f"Erro ao criar evento na API: {error}"
+        return f"Erro ao acessar a API do Google Calendar: {error}"
     except Exception as e:
-        return f"Erro inesperado ao criar evento: {e}"
+        return f"Erro inesperado ao listar eventos: {e}"
 
-@tool
-def search_calendar_events(query: str, max_results: int = 10):
+@calendar_tool
+def create_calendar_event(
+    summary: str,
+    start_time: str,
+    end_time: str = None,
+    attendees: List[str] = None,
+    location: str = None,
+    description: str = None,
+    broker_id: str = None,
+    **kwargs
+):
     """
-    Pesquisa por eventos no Google Calendar que correspondam a uma 'query' (ex: 'Dentista', 'Reunião com Equipe').
-    Retorna uma lista de eventos, incluindo o 'id' de cada evento.
+    Cria um novo evento no Google Calendar, APENAS SE O HORÁRIO ESTIVER LIVRE.
+    - 'start_time' pode ser 'AAAA-MM-DDTHH:MM:SS' ou 'HH:MM:SS' (usa hoje).
+    - Se 'end_time' não for fornecido, dura 1h.
+    - 'attendees' é lista de e-mails.
+    - 'broker_id' é o corretor escolhido por 'assign_broker' (sem ele, usa a agenda principal).
+    
+    REGRAS DE NEGÓCIO:
+    - Agendamentos permitidos apenas de Segunda a Sexta, das 08:00 às 18:00.
+    - Título (summary) deve ser: "[Nome] - [Assunto/Palavras-chave]"
+    - Descrição deve conter: Nome, O que procura, E-mail e detalhes extras.
     """
+    service = get_service()
     if not service:
         return "Erro: O serviço do Google Calendar não foi inicializado."
 
+    calendar_id = _calendar_for(broker_id)
+    if not calendar_id:
+        return f"Erro: Corretor '{broker_id}' não encontrado."
+
     try:
-        now = datetime.now(timezone.utc).isoformat()
-        events_result = (
-            service.events()
-            .list(
-                calendarId="primary",
-                q=query, 
-                timeMin=now,
-                maxResults=max_results,
-                singleEvents=True,
-                orderBy="startTime",
+        start_dt, end_dt = _resolve_event_times(start_time, end_time)
+    except ValueError as e:
+        return str(e)
+
+    with _booking_lock(calendar_id):
+        try:
+            print(
+                f"Verificando conflitos ({start_dt.strftime('%H:%M')} "
+                f"às {end_dt.strftime('%H:%M')})"
             )
-            .execute()
-        )
-    
-        events = events_result.get("items", [])
+
+            conflict = _find_conflict(calendar_id, start_dt, end_dt, fresh=True)
+
+            if conflict:
+                event_summary = conflict.get("summary", "desconhecido")
+                return (
+                    "Erro: Horário indisponível. "
+                    f"Já existe um outro evento ('{event_summary}') "
+                    "que impede o intervalo automático de 15 minutos após o término."
+                )
+
+        except HttpError as error:
+            return f"Erro ao verificar conflitos na API: {error}"
+        except Exception as e:
+            return f"Erro inesperado ao verificar conflitos: {e}"
+
+        event = _event_body(summary, start_dt, end_dt, attendees, location, description)
+
+        try:
+            created_event = execute(
+                service.events().insert(calendarId=calendar_id, body=event)
+            )
+            get_event_cache(calendar_id).apply(created_event)
+            invalidate_busy(calendar_id)
+            return f"Evento criado com sucesso! Link: {created_event.get('htmlLink')}"
+        except HttpError as error:
+            return f"Erro ao criar evento na API: {error}"
+        except Exception as e:
+            return f"Erro inesperado ao criar evento: {e}"
+
+@calendar_tool(output=SEARCH_OUTPUT)
+def search_calendar_events(query: str, max_results: int = 10, broker_id: str = None):
+    """
+    Pesquisa por eventos no Google Calendar que correspondam a uma 'query' (ex: 'Dentista', 'Reunião com Equipe').
+    Retorna uma tabela 'id|inicio|fim|titulo|local', incluindo o 'id' de cada evento.
+    Informe 'broker_id' para pesquisar na agenda de um corretor específico.
+    """
+    if not get_service():
+        return "Erro: O serviço do Google Calendar não foi inicializado."
+
+    calendar_id = _calendar_for(broker_id)
+    if not calendar_id:
+        return f"Erro: Corretor '{broker_id}' não encontrado."
+
+    try:
+        events = get_event_cache(calendar_id).upcoming(max_results=max_results, query=query)
 
         if not events:
             return f"Nenhum evento encontrado com o termo de busca: '{query}'."
@@ -264,7 +314,7 @@ def search_calendar_events(query: str, max_results: int = 10):
     except Exception as e:
         return f"Erro inesperado ao pesquisar eventos: {e}"
 
-@tool
+@calendar_tool
 def update_calendar_event(
     event_id: str,
     summary: str = None,
@@ -273,48 +323,28 @@ def update_calendar_event(
     location: str = None,
     description: str = None,
     attendees: List[str] = None,
-    kwargs = None,
+    broker_id: str = None,
 ):
     """
     Atualiza um evento existente usando seu 'event_id'.
     Forneça apenas os campos que deseja alterar.
+    Informe 'broker_id' se o evento estiver na agenda de um corretor específico.
     """
+    service = get_service()
     if not service:
         return "Erro: O serviço do Google Calendar não foi inicializado."
 
-    print("\n[HITL] Solicitação para ALTERAR evento no Google Calendar:")
-    print(f"  Título : {summary}")
-    print(f"  Início : {start_time}")
-    print(f"  Fim    : {end_time}")
-    if kwargs:
-        print(f"  Extras : {kwargs}")
-
-    resp = input("[HITL] Confirmar alteração desse evento? (s/N): ").strip().lower()
-    if resp not in ("s", "sim", "y", "yes"):
-        print("[HITL] Alteração de evento CANCELADA pelo humano.")
-        return "Alteração de evento cancelada por intervenção humana."
-    
+    calendar_id = _calendar_for(broker_id)
+    if not calendar_id:
+        return f"Erro: Corretor '{broker_id}' não encontrado."
+
     try:
-        event = service.events().get(calendarId='primary', eventId=event_id).execute()
-
-        if summary is not None:
-            event['summary'] = summary
-        if location is not None:
-            event['location'] = location
-        if description is not None:
-            event['description'] = description
-        if start_time is not None:
-            event['start']['dateTime'] = start_time
-        if end_time is not None:
-            event['end']['dateTime'] = end_time
-        if attendees is not None:
-            event['attendees'] = [{'email': email} for email in attendees]
-
-        updated_event = (
-            service.events()
-            .update(calendarId='primary', eventId=event_id, body=event)
-            .execute()
+        changes = _patch_body(summary, start_time, end_time, location, description, attendees)
+        updated_event = execute(
+            service.events().patch(calendarId=calendar_id, eventId=event_id, body=changes)
         )
+        get_event_cache(calendar_id).apply(updated_event)
+        invalidate_busy(calendar_id)
         return f"Evento atualizado com sucesso! Link: {updated_event.get('htmlLink')}"
         
     except HttpError as error:
@@ -324,22 +354,334 @@ def update_calendar_event(
     except Exception as e:
         return f"Erro inesperado ao atualizar evento: {e}"
 
-@tool
-def delete_calendar_event(event_id: str):
+@calendar_tool
+def delete_calendar_event(event_id: str, broker_id: str = None):
     """
     Exclui permanentemente um evento do Google Calendar usando seu 'event_id'.
     Use 'search_calendar_events' ou 'list_upcoming_events' para encontrar o 'event_id' primeiro.
+    Informe 'broker_id' se o evento estiver na agenda de um corretor específico.
     """
+    service = get_service()
     if not service:
         return "Erro: O serviço do Google Calendar não foi inicializado."
 
+    calendar_id = _calendar_for(broker_id)
+    if not calendar_id:
+        return f"Erro: Corretor '{broker_id}' não encontrado."
+
     try:
-        service.events().delete(calendarId='primary', eventId=event_id).execute()
+        execute(service.events().delete(calendarId=calendar_id, eventId=event_id))
+        get_event_cache(calendar_id).remove(event_id)
+        invalidate_busy(calendar_id)
         return f"Evento com ID '{event_id}' foi excluído com sucesso."
         
     except HttpError as error:
-        if error.resp.status == 404:
+        if error.resp.status in (404, 410):
+            get_event_cache(calendar_id).remove(event_id)
             return f"Erro: Evento com ID '{event_id}' não encontrado ou já excluído."
         return f"Erro ao excluir evento na API: {error}"
     except Exception as e:
-        return f"Erro inesperado ao excluir evento: {e}"
\ No newline at end of file
+        return f"Erro inesperado ao excluir evento: {e}"
+
+
+@calendar_tool(output=SLOT_OUTPUT)
+def find_available_slots(
+    start_date: str = None,
+    end_date: str = None,
+    duration_minutes: int = 60,
+    max_slots: int = 10,
+    broker_id: str = None,
+):
+    """
+    Lista horários LIVRES para agendar com o corretor, já respeitando todas as regras de agendamento
+    (segunda a sexta, entre 08:00 e 18:00, sem conflito e com 15 minutos livres após o término).
+    Use ANTES de 'create_calendar_event' para oferecer opções de horário ao cliente.
+    - 'start_date' e 'end_date' no formato 'AAAA-MM-DD' (ou 'AAAA-MM-DDTHH:MM:SS').
+      Se 'start_date' não for informado, busca a partir de agora; se 'end_date' não for informado, busca 7 dias.
+    - 'duration_minutes' é a duração da reunião (padrão 60).
+    - 'broker_id' consulta a agenda de um corretor específico (sem ele, usa a agenda principal).
+    """
+    if not get_service():
+        return "Erro: O serviço do Google Calendar não foi inicializado."
+
+    calendar_id = _calendar_for(broker_id)
+    if not calendar_id:
+        return f"Erro: Corretor '{broker_id}' não encontrado."
+
+    local_tz = pytz.timezone("America/Sao_Paulo")
+    now = datetime.now(local_tz)
+
+    def _parse(value, default):
+        if not value:
+            return default
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            return local_tz.localize(parsed)
+        return parsed.astimezone(local_tz)
+
+    try:
+        range_start = _parse(start_date, now)
+        if end_date:
+            range_end = _parse(end_date, None)
+            if len(end_date) == 10:
+                # Data sem horário: inclui o dia inteiro.
+                range_end += timedelta(days=1)
+        else:
+            range_end = range_start + timedelta(days=7)
+    except ValueError:
+        return "Formato de data inválido. Use 'AAAA-MM-DD' ou 'AAAA-MM-DDTHH:MM:SS'."
+
+    if range_end <= range_start:
+        return "Erro: 'end_date' deve ser posterior a 'start_date'."
+
+    try:
+        busy = build_busy_index(
+            get_event_cache(calendar_id).busy_intervals(
+                range_start, range_end + timedelta(minutes=BUFFER_MINUTES)
+            )
+        )
+        slots = find_free_slots(
+            busy,
+            range_start,
+            range_end,
+            duration_minutes=duration_minutes,
+            max_slots=max_slots,
+            now=now,
+        )
+    except HttpError as error:
+        return f"Erro ao consultar a disponibilidade na API: {error}"
+    except Exception as e:
+        return f"Erro inesperado ao buscar horários livres: {e}"
+
+    if not slots:
+        return "Nenhum horário livre encontrado nesse período. Sugira outro intervalo de datas ao cliente."
+
+    return [
+        {"start": start.isoformat(), "end": end.isoformat()}
+        for start, end in slots
+    ]
+
+@calendar_tool(output=BROKER_OUTPUT)
+def assign_broker(start_time: str, end_time: str = None, region: str = None):
+    """
+    Escolhe, em uma única consulta, o corretor que vai atender o lead no horário pedido.
+    Verifica a agenda de todos os corretores ao mesmo tempo e retorna um corretor livre
+    (com os 15 minutos de intervalo após o término), seguindo a política de distribuição da imobiliária.
+    - 'start_time' e 'end_time' no formato 'AAAA-MM-DDTHH:MM:SS'. Se 'end_time' não for fornecido, dura 1h.
+    - 'region' é o bairro/região de interesse do cliente (opcional), usado para preferir corretores da região.
+    Use o 'broker_id' retornado em 'create_calendar_event'.
+    """
+    if not get_service():
+        return "Erro: O serviço do Google Calendar não foi inicializado."
+
+    local_tz = pytz.timezone("America/Sao_Paulo")
+
+    def _parse(value):
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            return local_tz.localize(parsed)
+        return parsed.astimezone(local_tz)
+
+    try:
+        start_dt = _parse(start_time)
+        end_dt = _parse(end_time) if end_time else start_dt + timedelta(hours=1)
+    except ValueError:
+        return "Formato de horário inválido. Use 'AAAA-MM-DDTHH:MM:SS'."
+
+    if start_dt.weekday() >= 5:
+        return "Erro: Não é permitido agendar reuniões aos sábados e domingos. Por favor, escolha um dia de segunda a sexta-feira."
+    if start_dt.hour < 8 or start_dt.hour >= 18:
+        return "Erro: O agendamento deve ser feito apenas em horário comercial (entre 08:00 e 18:00)."
+
+    # A ocupação é consultada para o dia inteiro: a mesma janela atende vários pedidos
+    # do mesmo dia pelo cache e também mede a carga de cada corretor.
+    day_start = local_tz.localize(datetime.combine(start_dt.date(), time(0, 0)))
+    day_end = day_start + timedelta(days=1)
+
+    brokers = get_brokers()
+    try:
+        busy = query_busy([b.calendar_id for b in brokers], day_start, day_end)
+    except HttpError as error:
+        return f"Erro ao consultar a agenda dos corretores na API: {error}"
+    except Exception as e:
+        return f"Erro inesperado ao consultar a agenda dos corretores: {e}"
+
+    slot_start = start_dt.timestamp()
+    slot_end = end_dt.timestamp()
+    candidates = [
+        broker for broker in brokers
+        if busy.get(broker.calendar_id) is not None
+        and build_busy_index(busy[broker.calendar_id]).is_free(slot_start, slot_end)
+    ]
+
+    broker = choose_broker(candidates, busy, region=region)
+    if not broker:
+        return "Nenhum corretor está livre nesse horário. Use 'find_available_slots' para sugerir outro horário ao cliente."
+
+    return {
+        "broker_id": broker.id,
+        "broker_name": broker.name,
+        "start": start_dt.isoformat(),
+        "end": end_dt.isoformat(),
+    }
+
+
+def _batch_error(error):
+    if isinstance(error, HttpError) and error.resp.status in (404, 410):
+        return "Evento não encontrado ou já excluído."
+    return f"Erro na API: {error}"
+
+
+@calendar_tool(output=BATCH_OUTPUT)
+def bulk_create_calendar_events(events: List[NewEvent], broker_id: str = None):
+    """
+    Cria vários eventos de uma vez, enviando todos em uma única requisição em lote.
+    Cada item segue as mesmas regras de 'create_calendar_event' (dias úteis, 08:00-18:00, sem conflito
+    e com 15 minutos livres após o término, inclusive entre os próprios itens do lote).
+    Retorna uma tabela com o resultado de cada item na ordem enviada ('index|ok|event_id|erro').
+    """
+    service = get_service()
+    if not service:
+        return "Erro: O serviço do Google Calendar não foi inicializado."
+
+    calendar_id = _calendar_for(broker_id)
+    if not calendar_id:
+        return f"Erro: Corretor '{broker_id}' não encontrado."
+
+    # Verificação e inserção sob o lock da agenda, como em create_calendar_event.
+    with _booking_lock(calendar_id):
+        results = [{"index": i, "ok": False} for i in range(len(events))]
+        pending, accepted = [], []
+        try:
+            get_event_cache(calendar_id).refresh(force=True)
+            for i, item in enumerate(events):
+                try:
+                    start_dt, end_dt = _resolve_event_times(item.get("start_time"), item.get("end_time"))
+                except ValueError as e:
+                    results[i]["error"] = str(e)
+                    continue
+
+                conflict_end = end_dt + timedelta(minutes=BUFFER_MINUTES)
+                conflict = _find_conflict(calendar_id, start_dt, end_dt) or next(
+                    (other for other in accepted if other[0] < conflict_end and other[1] > start_dt),
+                    None,
+                )
+                if conflict:
+                    results[i]["error"] = "Erro: Horário indisponível (conflito com outro evento ou com o intervalo de 15 minutos)."
+                    continue
+
+                accepted.append((start_dt, end_dt))
+                pending.append((i, _event_body(
+                    item.get("summary"),
+                    start_dt,
+                    end_dt,
+                    item.get("attendees"),
+                    item.get("location"),
+                    item.get("description"),
+                )))
+        except HttpError as error:
+            return f"Erro ao verificar conflitos na API: {error}"
+        except Exception as e:
+            return f"Erro inesperado ao verificar conflitos: {e}"
+
+        if not pending:
+            return results
+
+        try:
+            responses = execute_batch(
+                service,
+                [service.events().insert(calendarId=calendar_id, body=body) for _, body in pending],
+            )
+        except Exception as e:
+            return f"Erro inesperado ao criar eventos em lote: {e}"
+
+        cache = get_event_cache(calendar_id)
+        for (i, _), (created_event, error) in zip(pending, responses):
+            if error is not None:
+                results[i]["error"] = _batch_error(error)
+                continue
+            cache.apply(created_event)
+            results[i].update(ok=True, event_id=created_event.get("id"))
+        invalidate_busy(calendar_id)
+        return results
+
+
+@calendar_tool(output=BATCH_OUTPUT)
+def bulk_update_calendar_events(changes: List[EventChanges], broker_id: str = None):
+    """
+    Altera vários eventos de uma vez, em uma única requisição em lote.
+    Cada item tem o 'event_id' e apenas os campos que devem mudar.
+    Retorna uma tabela com o resultado de cada item na ordem enviada ('index|ok|event_id|erro').
+    """
+    service = get_service()
+    if not service:
+        return "Erro: O serviço do Google Calendar não foi inicializado."
+
+    calendar_id = _calendar_for(broker_id)
+    if not calendar_id:
+        return f"Erro: Corretor '{broker_id}' não encontrado."
+
+    try:
+        responses = execute_batch(service, [
+            service.events().patch(
+                calendarId=calendar_id,
+                eventId=item.get("event_id"),
+                body=_patch_body(
+                    item.get("summary"),
+                    item.get("start_time"),
+                    item.get("end_time"),
+                    item.get("location"),
+                    item.get("description"),
+                    item.get("attendees"),
+                ),
+            )
+            for item in changes
+        ])
+    except Exception as e:
+        return f"Erro inesperado ao alterar eventos em lote: {e}"
+
+    cache = get_event_cache(calendar_id)
+    results = []
+    for i, (item, (updated_event, error)) in enumerate(zip(changes, responses)):
+        if error is not None:
+            results.append({"index": i, "ok": False, "event_id": item.get("event_id"), "error": _batch_error(error)})
+            continue
+        cache.apply(updated_event)
+        results.append({"index": i, "ok": True, "event_id": updated_event.get("id")})
+    invalidate_busy(calendar_id)
+    return results
+
+
+@calendar_tool(output=BATCH_OUTPUT)
+def bulk_delete_calendar_events(event_ids: List[str], broker_id: str = None):
+    """
+    Exclui permanentemente vários eventos de uma vez, em uma única requisição em lote.
+    Retorna uma tabela com o resultado de cada item na ordem enviada ('index|ok|event_id|erro').
+    """
+    service = get_service()
+    if not service:
+        return "Erro: O serviço do Google Calendar não foi inicializado."
+
+    calendar_id = _calendar_for(broker_id)
+    if not calendar_id:
+        return f"Erro: Corretor '{broker_id}' não encontrado."
+
+    try:
+        responses = execute_batch(
+            service,
+            [service.events().delete(calendarId=calendar_id, eventId=event_id) for event_id in event_ids],
+        )
+    except Exception as e:
+        return f"Erro inesperado ao excluir eventos em lote: {e}"
+
+    cache = get_event_cache(calendar_id)
+    results = []
+    for i, (event_id, (_, error)) in enumerate(zip(event_ids, responses)):
+        if error is None or (isinstance(error, HttpError) and error.resp.status in (404, 410)):
+            cache.remove(event_id)
+        if error is not None:
+            results.append({"index": i, "ok": False, "event_id": event_id, "error": _batch_error(error)})
+        else:
+            results.append({"index": i, "ok": True, "event_id": event_id})
+    invalidate_busy(calendar_id)
+    return results
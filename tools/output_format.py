@@ -0,0 +1,151 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime
+
+from tools.availability import LOCAL_TZ
+
+
+# Limite padrão, em tokens aproximados (~4 caracteres por token), do texto que uma ferramenta
+# devolve ao modelo. Linhas além do limite são omitidas com um aviso.
+TOOL_OUTPUT_MAX_TOKENS = int(os.getenv("TOOL_OUTPUT_MAX_TOKENS", "800"))
+# Tamanho máximo de cada célula da tabela; textos maiores são cortados com "…".
+TOOL_OUTPUT_MAX_CELL = 80
+
+CHARS_PER_TOKEN = 4
+
+
+def local_time(value):
+    """'2026-10-20T14:00:00-03:00' (ou {'dateTime': ...}/{'date': ...} do Google) -> '2026-10-20 14:00'."""
+    if isinstance(value, dict):
+        value = value.get("dateTime") or value.get("date")
+    if not value:
+        return ""
+    if isinstance(value, str):
+        if len(value) == 10:
+            return value  # evento de dia inteiro
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(LOCAL_TZ)
+    return value.strftime("%Y-%m-%d %H:%M")
+
+
+def _field(name, default=""):
+    return lambda row: row.get(name, default)
+
+
+def _event_time(name):
+    return lambda event: local_time(event.get(name))
+
+
+def _event_end(event):
+    """Término do evento; quando é no mesmo dia do início, só 'HH:MM'."""
+    start, end = local_time(event.get("start")), local_time(event.get("end"))
+    if start[:10] == end[:10] and len(end) > 10:
+        return end[11:]
+    return end
+
+
+@dataclass(frozen=True)
+class ToolOutput:
+    """
+    Formato do retorno de uma ferramenta: 'columns' é a projeção fixa de cada item, uma sequência de
+    (nome da coluna, função que extrai o valor do item); 'max_tokens' é o teto do texto final.
+    """
+    columns: tuple
+    max_tokens: int = TOOL_OUTPUT_MAX_TOKENS
+
+
+EVENT_OUTPUT = ToolOutput(columns=(
+    ("id", _field("id")),
+    ("inicio", _event_time("start")),
+    ("fim", _event_end),
+    ("titulo", _field("summary", "Compromisso")),
+))
+
+SEARCH_OUTPUT = ToolOutput(columns=EVENT_OUTPUT.columns + (
+    ("local", _field("location")),
+))
+
+SLOT_OUTPUT = ToolOutput(columns=(
+    ("inicio", _event_time("start")),
+    ("fim", _event_end),
+), max_tokens=400)
+
+BROKER_OUTPUT = ToolOutput(columns=(
+    ("broker_id", _field("broker_id")),
+    ("corretor", _field("broker_name")),
+    ("inicio", _event_time("start")),
+    ("fim", _event_end),
+))
+
+
+def _price(row):
+    """480000.0 -> 'R$ 480.000'; aluguel com '/mês'."""
+    text = "R$ " + f"{row.get('price', 0):,.0f}".replace(",", ".")
+    return text + "/mês" if row.get("transaction") == "aluguel" else text
+
+
+PROPERTY_OUTPUT = ToolOutput(columns=(
+    ("id", _field("id")),
+    ("titulo", _field("title")),
+    ("bairro", _field("neighborhood")),
+    ("negocio", _field("transaction")),
+    ("preco", _price),
+    ("quartos", _field("bedrooms")),
+    ("area_m2", lambda row: f"{row.get('area_m2', 0):.0f}"),
+    ("pet", lambda row: "sim" if row.get("pet_friendly") else "não"),
+))
+
+BATCH_OUTPUT = ToolOutput(columns=(
+    ("index", _field("index")),
+    ("ok", lambda row: "sim" if row.get("ok") else "não"),
+    ("event_id", _field("event_id")),
+    ("erro", _field("error")),
+), max_tokens=1200)
+
+
+def _cell(value):
+    text = "" if value is None else str(value)
+    text = text.replace("|", "/").replace("\r", " ").replace("\n", " ")
+    if len(text) > TOOL_OUTPUT_MAX_CELL:
+        text = text[:TOOL_OUTPUT_MAX_CELL - 1] + "…"
+    return text
+
+
+def format_table(rows, output):
+    """
+    Serializa 'rows' como tabela compacta: uma linha de cabeçalho e uma linha por item, com as colunas
+    separadas por '|'. Para no teto de tokens e avisa quantas linhas ficaram de fora.
+    """
+    lines = ["|".join(name for name, _ in output.columns)]
+    budget = output.max_tokens * CHARS_PER_TOKEN - len(lines[0])
+    for position, row in enumerate(rows):
+        line = "|".join(_cell(getter(row)) for _, getter in output.columns)
+        if len(line) + 1 > budget:
+            omitted = len(rows) - position
+            lines.append(f"[… {omitted} de {len(rows)} linhas omitidas; refine a busca ou reduza max_results]")
+            break
+        lines.append(line)
+        budget -= len(line) + 1
+    return "\n".join(lines)
+
+
+def truncate_text(text, max_tokens=TOOL_OUTPUT_MAX_TOKENS):
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n[… texto cortado: {len(text) - limit} caracteres omitidos]"
+
+
+def shape_output(result, output=None):
+    """
+    Camada de saída comum das ferramentas de calendário.
+    Listas de itens viram tabela com a projeção de 'output'; um item sozinho vira tabela de uma linha;
+    textos (mensagens e erros) passam como estão, respeitando o teto de tokens.
+    """
+    output = output or ToolOutput(columns=())
+    if isinstance(result, dict):
+        result = [result]
+    if isinstance(result, list) and output.columns:
+        return format_table(result, output)
+    return truncate_text(result if isinstance(result, str) else str(result), output.max_tokens)
@@ -0,0 +1,78 @@
+from functools import wraps
+
+from langchain_core.tools import StructuredTool
+
+from API.inventory import TRANSACTIONS, get_inventory, normalize
+from tools.output_format import PROPERTY_OUTPUT, shape_output
+
+
+# Máximo de imóveis devolvidos por busca, qualquer que seja o 'max_results' pedido.
+MAX_PROPERTY_RESULTS = 20
+
+
+def inventory_tool(func):
+    """
+    Registra 'func' como ferramenta do agente. A busca roda em memória, sem I/O, e o retorno passa pela
+    camada de saída comum (tools/output_format.py) com a projeção PROPERTY_OUTPUT.
+    """
+    @wraps(func)
+    def _run(*args, **kwargs):
+        return shape_output(func(*args, **kwargs), PROPERTY_OUTPUT)
+
+    return StructuredTool.from_function(func=_run)
+
+
+@inventory_tool
+def search_properties(
+    neighborhood: str = None,
+    transaction: str = None,
+    min_price: float = None,
+    max_price: float = None,
+    min_bedrooms: int = None,
+    pet_friendly: bool = None,
+    max_results: int = 5,
+):
+    """
+    Busca imóveis no estoque da imobiliária. Use para apresentar opções reais ao cliente:
+    NUNCA ofereça um imóvel que não veio desta ferramenta.
+    - 'neighborhood' é o bairro (ou vários, separados por vírgula, ex.: 'Centro, Jardins').
+    - 'transaction' é 'venda' (compra) ou 'aluguel'.
+    - 'min_price' e 'max_price' em reais (para aluguel, o valor mensal).
+    - 'min_bedrooms' é o número mínimo de quartos; 'pet_friendly' = true filtra os que aceitam animais.
+    - 'max_results' é quantos imóveis retornar (padrão 5), os mais aderentes ao orçamento primeiro.
+    """
+    index = get_inventory().get()
+    if index is None:
+        return "Erro: O estoque de imóveis não está disponível no momento."
+
+    neighborhoods = None
+    if neighborhood:
+        names = [name for name in neighborhood.split(",") if name.strip()]
+        neighborhoods = [index.neighborhood_code(name) for name in names]
+        unknown = [name.strip() for name, code in zip(names, neighborhoods) if code is None]
+        if unknown and len(unknown) == len(names):
+            known = ", ".join(sorted(index.neighborhood_names)[:30])
+            return f"Nenhum imóvel no bairro '{', '.join(unknown)}'. Bairros com imóveis no estoque: {known}."
+        neighborhoods = [code for code in neighborhoods if code is not None]
+
+    transaction_code = None
+    if transaction:
+        transaction_code = TRANSACTIONS.get(normalize(transaction))
+        if transaction_code is None:
+            return "Erro: 'transaction' deve ser 'venda' ou 'aluguel'."
+
+    if min_price is not None and max_price is not None and min_price > max_price:
+        return "Erro: 'min_price' deve ser menor ou igual a 'max_price'."
+
+    _, rows = index.search(
+        neighborhoods=neighborhoods,
+        transaction=transaction_code,
+        min_price=min_price,
+        max_price=max_price,
+        min_bedrooms=min_bedrooms,
+        pet_friendly=pet_friendly,
+        top_k=max(1, min(max_results, MAX_PROPERTY_RESULTS)),
+    )
+    if not rows:
+        return "Nenhum imóvel encontrado com esses filtros. Sugira ao cliente ampliar o orçamento, o bairro ou o número de quartos."
+    return rows